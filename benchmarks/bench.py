@@ -0,0 +1,472 @@
+"""Benchmark suite for the stlog hot paths.
+
+Each scenario measures (per logged/formatted record):
+
+- `ns_per_record`: wall time (best of `--repeat` runs of `--number` records)
+- `peak_bytes_per_record`: peak of transient memory allocated (tracemalloc) while
+  emitting one record
+- `net_blocks_per_record`: memory blocks still allocated after the record
+  (should be 0, anything else is a leak or a growing cache)
+
+Usage:
+
+    python benchmarks/bench.py                              # run all scenarios
+    python benchmarks/bench.py --filter 'formatter.*'       # run some scenarios
+    python benchmarks/bench.py --output results.json        # save results as JSON
+    python benchmarks/bench.py --compare results.json --threshold 20
+        # exit with code 1 if a scenario is more than 20% slower (or allocates more)
+        # than the given previous run
+
+Note: python >= 3.9 is required (for `tracemalloc.reset_peak()`).
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import functools
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from stlog import LogContext, getLogger, setup  # noqa: E402
+from stlog.base import (  # noqa: E402
+    GLOBAL_LOGGING_CONFIG,
+    RICH_AVAILABLE,
+    STLOG_EXTRA_KEY,
+)
+from stlog.formatter import (  # noqa: E402
+    AnsiHumanFormatter,
+    Formatter,
+    HumanFormatter,
+    JsonFormatter,
+    LogFmtFormatter,
+    RichHumanFormatter,
+)
+from stlog.kvformatter import (  # noqa: E402
+    EmptyKVFormatter,
+    JsonKVFormatter,
+    LogFmtKVFormatter,
+    TemplateKVFormatter,
+)
+from stlog.output import (  # noqa: E402
+    Output,
+    Route,
+    RoutingOutput,
+    StreamOutput,
+    make_stream_or_rich_stream_output,
+)
+from tests.utils import NullStream  # noqa: E402
+
+# a scenario is a function which prepares everything and returns a callable
+# emitting (or formatting) exactly one record
+Scenario = Callable[[], Callable[[], Any]]
+SCENARIOS: dict[str, Scenario] = {}
+
+
+def scenario(name: str) -> Callable[[Scenario], Scenario]:
+    def decorator(func: Scenario) -> Scenario:
+        SCENARIOS[name] = func
+        return func
+
+    return decorator
+
+
+def make_record() -> logging.LogRecord:
+    record = logging.LogRecord(
+        name="bench.logger",
+        level=logging.INFO,
+        pathname=__file__,
+        lineno=42,
+        msg="user %s logged in from %s",
+        args=("john", "127.0.0.1"),
+        exc_info=None,
+    )
+    record.request_id = "f7c1a2b3"
+    record.duration_ms = 12.5
+    record.status = 200
+    setattr(record, STLOG_EXTRA_KEY, {"request_id", "duration_ms", "status"})
+    return record
+
+
+def _setup_outputs(outputs: list[Output], level: str = "INFO") -> None:
+    setup(
+        level=level,
+        outputs=outputs,
+        capture_warnings=False,
+        logging_excepthook=None,
+    )
+
+
+def _format_scenario(formatter: Formatter) -> Callable[[], Any]:
+    record = make_record()
+    return lambda: formatter.format(record)
+
+
+FORMATTERS: dict[str, Callable[[], Formatter]] = {
+    "human.logfmt": lambda: HumanFormatter(kv_formatter=LogFmtKVFormatter()),
+    "human.template": lambda: HumanFormatter(kv_formatter=TemplateKVFormatter()),
+    "human.json": lambda: HumanFormatter(kv_formatter=JsonKVFormatter()),
+    "human.empty": lambda: HumanFormatter(kv_formatter=EmptyKVFormatter()),
+    "ansi_human.logfmt": lambda: AnsiHumanFormatter(),
+    "logfmt.logfmt": lambda: LogFmtFormatter(),
+    "logfmt.empty": lambda: LogFmtFormatter(kv_formatter=EmptyKVFormatter()),
+    "json.json": lambda: JsonFormatter(),
+    "json.json_sorted_indent": lambda: JsonFormatter(indent=4),
+    "json.empty": lambda: JsonFormatter(kv_formatter=EmptyKVFormatter()),
+}
+if RICH_AVAILABLE:
+    FORMATTERS["rich_human.logfmt"] = lambda: RichHumanFormatter()
+
+
+def _formatter_scenario(factory: Callable[[], Formatter]) -> Callable[[], Any]:
+    return _format_scenario(factory())
+
+
+def _register_formatter_scenarios() -> None:
+    for name, factory in FORMATTERS.items():
+        scenario(f"formatter.{name}")(functools.partial(_formatter_scenario, factory))
+
+
+_register_formatter_scenarios()
+
+
+def _rich_message_scenario(msg: str) -> Callable[[], Any]:
+    # static message (no args), with or without possible rich markup
+    record = make_record()
+    record.msg = msg
+    record.args = ()
+    formatter = RichHumanFormatter()
+    return lambda: formatter.format(record)
+
+
+if RICH_AVAILABLE:
+    scenario("formatter.rich_human.static")(
+        lambda: _rich_message_scenario("user logged in")
+    )
+    scenario("formatter.rich_human.static_brackets")(
+        lambda: _rich_message_scenario("user [john] logged in [/admin]")
+    )
+
+
+@scenario("logger.raw_logging")
+def _raw_logging() -> Callable[[], Any]:
+    _setup_outputs([StreamOutput(stream=NullStream(), formatter=JsonFormatter())])
+    logger = logging.getLogger("bench.raw")
+    return lambda: logger.info("user %s logged in", "john")
+
+
+@scenario("logger.stlog_adapter")
+def _stlog_adapter() -> Callable[[], Any]:
+    _setup_outputs([StreamOutput(stream=NullStream(), formatter=JsonFormatter())])
+    logger = getLogger("bench.stlog")
+    return lambda: logger.info("user %s logged in", "john")
+
+
+@scenario("logger.stlog_adapter_kwargs")
+def _stlog_adapter_kwargs() -> Callable[[], Any]:
+    _setup_outputs([StreamOutput(stream=NullStream(), formatter=JsonFormatter())])
+    logger = getLogger("bench.stlog")
+    return lambda: logger.info("user logged in", user="john", status=200)
+
+
+@scenario("logger.filtered_by_level")
+def _filtered_by_level() -> Callable[[], Any]:
+    _setup_outputs([StreamOutput(stream=NullStream(), formatter=JsonFormatter())])
+    logger = getLogger("bench.stlog")
+    return lambda: logger.debug("ignored", user="john")
+
+
+def _context_scenario(depth: int) -> Callable[[], Any]:
+    _setup_outputs([StreamOutput(stream=NullStream(), formatter=JsonFormatter())])
+    LogContext.reset_context()
+    LogContext.add(**{f"context_key{i}": f"value{i}" for i in range(depth)})
+    logger = getLogger("bench.context")
+    return lambda: logger.info("message", foo="bar")
+
+
+for _depth in (0, 5, 15, 50):
+    scenario(f"context.depth{_depth}")(functools.partial(_context_scenario, _depth))
+
+
+def _exception_scenario(formatter: Formatter) -> Callable[[], Any]:
+    _setup_outputs([StreamOutput(stream=NullStream(), formatter=formatter)])
+    logger = getLogger("bench.exception")
+    try:
+        raise ValueError("bench exception")
+    except ValueError:
+        exc_info = sys.exc_info()
+    return lambda: logger.error("error", exc_info=exc_info)
+
+
+scenario("exception.human")(lambda: _exception_scenario(HumanFormatter()))
+scenario("exception.logfmt")(lambda: _exception_scenario(LogFmtFormatter()))
+scenario("exception.json")(lambda: _exception_scenario(JsonFormatter()))
+scenario("exception.json_dedup")(
+    lambda: _exception_scenario(JsonFormatter(exc_dedup_window=60))
+)
+
+
+def _rich_exception_scenario(**kwargs: Any) -> Callable[[], Any]:
+    # the same exception logged again and again (retry loop) on a rich console
+    _setup_outputs(
+        [
+            make_stream_or_rich_stream_output(
+                stream=NullStream(), use_rich=True, force_terminal=True, **kwargs
+            )
+        ]
+    )
+    logger = getLogger("bench.exception")
+    try:
+        raise ValueError("bench exception")
+    except ValueError:
+        exc_info = sys.exc_info()
+    return lambda: logger.error("error", exc_info=exc_info)
+
+
+if RICH_AVAILABLE:
+    scenario("exception.rich_console")(lambda: _rich_exception_scenario())
+    scenario("exception.rich_console_dedup")(
+        lambda: _rich_exception_scenario(traceback_dedup_window=60)
+    )
+
+
+def _fanout_scenario(n: int) -> Callable[[], Any]:
+    _setup_outputs(
+        [StreamOutput(stream=NullStream(), formatter=JsonFormatter()) for _ in range(n)]
+    )
+    logger = getLogger("bench.fanout")
+    return lambda: logger.info("message", foo="bar")
+
+
+for _n in (1, 4, 8):
+    scenario(f"fanout.outputs{_n}")(functools.partial(_fanout_scenario, _n))
+
+
+def _devnull_scenario(batch_size: int) -> Callable[[], Any]:
+    # real file descriptor (but no disk I/O) => one write() syscall per record
+    # vs one writev() syscall per batch
+    stream = open(os.devnull, "w")
+    _setup_outputs(
+        [StreamOutput(stream=stream, formatter=JsonFormatter(), batch_size=batch_size)]
+    )
+    logger = getLogger("bench.devnull")
+    return lambda: logger.info("message", foo="bar")
+
+
+scenario("devnull.stream")(lambda: _devnull_scenario(0))
+scenario("devnull.batch")(lambda: _devnull_scenario(256))
+
+
+def _console_scenario(use_rich: bool) -> Callable[[], Any]:
+    # colored console output: rich (console rendering) vs plain ANSI sequences
+    rich_kwargs: dict[str, Any] = {"force_terminal": True} if use_rich else {}
+    _setup_outputs(
+        [
+            make_stream_or_rich_stream_output(
+                stream=NullStream(), use_rich=use_rich, use_ansi=True, **rich_kwargs
+            )
+        ]
+    )
+    logger = getLogger("bench.console")
+    return lambda: logger.info("user %s logged in", "john", status=200)
+
+
+scenario("console.ansi")(lambda: _console_scenario(False))
+if RICH_AVAILABLE:
+    scenario("console.rich")(lambda: _console_scenario(True))
+
+
+def _routing_scenario(n: int, table: bool) -> Callable[[], Any]:
+    # n outputs, each one for a logger name prefix (the record matches only one)
+    # => n filter chains vs one dispatch table lookup
+    outputs = [
+        StreamOutput(stream=NullStream(), formatter=JsonFormatter()) for _ in range(n)
+    ]
+    if table:
+        routes = [
+            Route(output, loggers=[f"bench.route{i}"])
+            for i, output in enumerate(outputs)
+        ]
+        _setup_outputs([RoutingOutput(routes=routes)])
+    else:
+        for i, output in enumerate(outputs):
+            output.set_filters([logging.Filter(f"bench.route{i}")])
+        _setup_outputs(outputs)  # type: ignore
+    logger = getLogger("bench.route0.foo")
+    return lambda: logger.info("message", foo="bar")
+
+
+scenario("routing.filters8")(lambda: _routing_scenario(8, False))
+scenario("routing.table8")(lambda: _routing_scenario(8, True))
+
+
+def measure_time(func: Callable[[], Any], number: int, repeat: int) -> float:
+    best = None
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            before = time.perf_counter_ns()
+            for _ in range(number):
+                func()
+            elapsed = time.perf_counter_ns() - before
+            if best is None or elapsed < best:
+                best = elapsed
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    assert best is not None
+    return best / number
+
+
+def measure_allocations(func: Callable[[], Any], number: int) -> tuple[float, float]:
+    # warmup (caches, lazy properties...)
+    func()
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    for _ in range(number):
+        func()
+    gc.collect()
+    blocks_after = sys.getallocatedblocks()
+    peak_total = 0
+    tracemalloc.start()
+    try:
+        for _ in range(number):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            peak_total += max(peak - current, 0)
+    finally:
+        tracemalloc.stop()
+    return peak_total / number, (blocks_after - blocks_before) / number
+
+
+def run_scenario(name: str, number: int, repeat: int) -> dict[str, float]:
+    func = SCENARIOS[name]()
+    for _ in range(min(number, 100)):  # warmup
+        func()
+    ns_per_record = measure_time(func, number, repeat)
+    peak_bytes, net_blocks = measure_allocations(func, min(number, 1000))
+    LogContext.reset_context()
+    return {
+        "ns_per_record": round(ns_per_record, 1),
+        "peak_bytes_per_record": round(peak_bytes, 1),
+        "net_blocks_per_record": round(net_blocks, 3),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=ROOT_DIR,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    threshold: float,
+) -> list[str]:
+    """Return a list of regression descriptions (empty list => no regression)."""
+    regressions: list[str] = []
+    for name, values in results.items():
+        if name not in baseline:
+            continue
+        for metric in ("ns_per_record", "peak_bytes_per_record"):
+            old = baseline[name].get(metric)
+            new = values[metric]
+            if not old:
+                continue
+            delta = (new - old) / old * 100.0
+            if delta > threshold:
+                regressions.append(
+                    f"{name}: {metric} {old} => {new} (+{delta:.1f}% > {threshold}%)"
+                )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="stlog benchmark suite")
+    parser.add_argument("--filter", default="*", help="fnmatch pattern on names")
+    parser.add_argument("--number", type=int, default=5000, help="records per run")
+    parser.add_argument("--repeat", type=int, default=5, help="runs (best is kept)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare with this previous JSON file")
+    parser.add_argument(
+        "--threshold", type=float, default=20.0, help="regression threshold (in %%)"
+    )
+    parser.add_argument("--list", action="store_true", help="list scenarios")
+    args = parser.parse_args(argv)
+
+    names = [x for x in SCENARIOS if fnmatch.fnmatch(x, args.filter)]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    GLOBAL_LOGGING_CONFIG._unit_tests_mode = False
+    results: dict[str, dict[str, float]] = {}
+    print(
+        f"{'scenario':<36s} {'ns/record':>12s} {'peak B/rec':>12s} {'blocks/rec':>12s}"
+    )
+    for name in names:
+        res = run_scenario(name, args.number, args.repeat)
+        results[name] = res
+        print(
+            f"{name:<36s} {res['ns_per_record']:>12.1f} "
+            f"{res['peak_bytes_per_record']:>12.1f} {res['net_blocks_per_record']:>12.3f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "meta": {
+                        "commit": _git_commit(),
+                        "python": platform.python_version(),
+                        "implementation": platform.python_implementation(),
+                        "platform": platform.platform(),
+                        "time": time.time(),
+                        "number": args.number,
+                        "repeat": args.repeat,
+                    },
+                    "results": results,
+                },
+                f,
+                indent=4,
+                sort_keys=True,
+            )
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for regression in regressions:
+                print(f"- {regression}")
+            return 1
+        print(f"\nno regression (threshold: {args.threshold}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""Benchmark of the compact binary output (`stlog.binary`) against `JsonFormatter`.
+
+For the same records (with a 15 keys `LogContext` and some extras), we measure:
+
+- `encode`: the CPU cost of the formatter only (ns/record)
+- `write`: the cost of a full `logger.info()` call to a file output (ns/record)
+- `size`: the on-disk size (bytes/record)
+- `decode`: the cost to read the file back as `LogEntry` objects (ns/record)
+
+Usage: python benchmarks/bench_binary.py [--records 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Callable
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from stlog import LogContext, getLogger, setup  # noqa: E402
+from stlog.base import STLOG_EXTRA_KEY  # noqa: E402
+from stlog.binary import BinaryFormatter, SegmentState  # noqa: E402
+from stlog.formatter import JsonFormatter  # noqa: E402
+from stlog.output import BinaryFileOutput, FileOutput, Output  # noqa: E402
+from stlog.reader import read_files  # noqa: E402
+
+CONTEXT = {f"context_key{i}": f"context_value{i}" for i in range(15)}
+
+
+def _make_record(i: int) -> logging.LogRecord:
+    extras = {**CONTEXT, "request_id": f"req{i}", "duration_ms": 12.5, "status": 200}
+    return logging.makeLogRecord(
+        {
+            "name": "bench.binary",
+            "levelname": "INFO",
+            "levelno": logging.INFO,
+            "msg": "user %s logged in",
+            "args": ("john",),
+            STLOG_EXTRA_KEY: set(extras.keys()),
+            **extras,
+        }
+    )
+
+
+def _ns_per_record(func: Callable[[int], object], records: int) -> float:
+    before = time.perf_counter_ns()
+    for i in range(records):
+        func(i)
+    return (time.perf_counter_ns() - before) / records
+
+
+def _write(output: Output, records: int) -> float:
+    setup(outputs=[output], capture_warnings=False, logging_excepthook=None)
+    LogContext.reset_context()
+    LogContext.add(**CONTEXT)
+    logger = getLogger("bench.binary")
+    res = _ns_per_record(
+        lambda i: logger.info(
+            "user %s logged in",
+            "john",
+            request_id=f"req{i}",
+            duration_ms=12.5,
+            status=200,
+        ),
+        records,
+    )
+    output.get_handler().close()
+    LogContext.reset_context()
+    return res
+
+
+def _decode(path: str, records: int) -> float:
+    before = time.perf_counter_ns()
+    n = sum(1 for _ in read_files([path]))
+    assert n == records
+    return (time.perf_counter_ns() - before) / records
+
+
+def _print(label: str, value: float, unit: str) -> None:
+    print(f"{label:<16s} {value:>10.1f} {unit}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100_000)
+    args = parser.parse_args()
+    records = [_make_record(i) for i in range(1000)]
+    json_formatter = JsonFormatter()
+    binary_formatter = BinaryFormatter()
+    state = SegmentState()
+    _print(
+        "json.encode",
+        _ns_per_record(
+            lambda i: json_formatter.format(records[i % 1000]), args.records
+        ),
+        "ns/record",
+    )
+    _print(
+        "binary.encode",
+        _ns_per_record(
+            lambda i: binary_formatter.encode(records[i % 1000], state), args.records
+        ),
+        "ns/record",
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        json_path = os.path.join(tmpdir, "bench.json")
+        binary_path = os.path.join(tmpdir, "bench.bin")
+        for name, path, output in (
+            (
+                "json",
+                json_path,
+                FileOutput(filename=json_path, formatter=JsonFormatter()),
+            ),
+            ("binary", binary_path, BinaryFileOutput(filename=binary_path)),
+        ):
+            _print(f"{name}.write", _write(output, args.records), "ns/record")
+            _print(f"{name}.size", os.path.getsize(path) / args.records, "bytes/record")
+            _print(f"{name}.decode", _decode(path, args.records), "ns/record")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark of the gzip compressed output (`stlog.compressed`) against `FileOutput`.
+
+The same JSON logs (with a 15 keys `LogContext` and some extras) are written to a
+plain file and to compressed files (with several compression levels). For each
+output, we measure:
+
+- `cpu`: the CPU cost per MB of (uncompressed) logs (ms/MB)
+- `size`: the on-disk size (bytes/record)
+- `saved`: the percentage of bytes saved compared to the plain file
+
+Usage: python benchmarks/bench_compressed.py [--records 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from stlog import LogContext, getLogger, setup  # noqa: E402
+from stlog.formatter import JsonFormatter  # noqa: E402
+from stlog.output import CompressedFileOutput, FileOutput, Output  # noqa: E402
+
+CONTEXT = {f"context_key{i}": f"context_value{i}" for i in range(15)}
+
+
+def _write(output: Output, records: int) -> float:
+    setup(outputs=[output], capture_warnings=False, logging_excepthook=None)
+    LogContext.reset_context()
+    LogContext.add(**CONTEXT)
+    logger = getLogger("bench.compressed")
+    rnd = random.Random(42)  # (not too compressible) random values
+    values = [f"{rnd.getrandbits(64):016x}" for _ in range(records)]
+    before = time.process_time()
+    for i in range(records):
+        logger.info(
+            "user %s logged in",
+            "john",
+            request_id=values[i],
+            duration_ms=12.5,
+            status=200,
+        )
+    output.get_handler().close()
+    elapsed = time.process_time() - before
+    LogContext.reset_context()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100_000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        plain_path = os.path.join(tmpdir, "bench.json")
+        plain_cpu = _write(
+            FileOutput(filename=plain_path, formatter=JsonFormatter()), args.records
+        )
+        plain_size = os.path.getsize(plain_path)
+        plain_mb = plain_size / 1_000_000
+        outputs: list[tuple[str, str, float]] = [("plain", plain_path, plain_cpu)]
+        for level in (1, 6, 9):
+            path = os.path.join(tmpdir, f"bench{level}.json.gz")
+            cpu = _write(
+                CompressedFileOutput(
+                    filename=path, formatter=JsonFormatter(), compress_level=level
+                ),
+                args.records,
+            )
+            outputs.append((f"gzip{level}", path, cpu))
+        for label, path, cpu in outputs:
+            size = os.path.getsize(path)
+            print(
+                f"{label:<8s} cpu: {cpu * 1000 / plain_mb:>8.1f} ms/MB "
+                f"({(cpu - plain_cpu) * 1000 / plain_mb:>+7.1f}) "
+                f"size: {size / args.records:>7.1f} bytes/record "
+                f"saved: {100 - size * 100 / plain_size:>5.1f}%"
+            )
+
+
+if __name__ == "__main__":
+    main()
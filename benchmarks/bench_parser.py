@@ -0,0 +1,77 @@
+"""Throughput benchmark of the incremental stlog parsers (`stlog.parser`).
+
+Lines are generated with stlog formatters (logfmt and JSON lines) then fed to the
+incremental parsers by chunks of 64 KiB (dicts and compact tuples forms).
+
+Usage: python benchmarks/bench_parser.py [--lines 200000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from stlog.base import STLOG_EXTRA_KEY  # noqa: E402
+from stlog.formatter import Formatter, JsonFormatter, LogFmtFormatter  # noqa: E402
+from stlog.parser import IncrementalParser, JsonParser, LogFmtParser  # noqa: E402
+
+CHUNK_SIZE = 64 * 1024
+
+
+def generate(formatter: Formatter, lines: int) -> bytes:
+    res: list[str] = []
+    for i in range(lines):
+        extras = {
+            "request_id": f"req{i}",
+            "path": "C:\\temp\\foo",
+            "query": 'name="john doe"',
+            "duration_ms": 12.5,
+        }
+        record = logging.makeLogRecord(
+            {
+                "name": "bench.parser",
+                "levelname": "INFO",
+                "levelno": logging.INFO,
+                "msg": "user %s logged in",
+                "args": ("john",),
+                STLOG_EXTRA_KEY: set(extras.keys()),
+                **extras,
+            }
+        )
+        res.append(formatter.format(record))
+    res.append("")
+    return "\n".join(res).encode("utf-8")
+
+
+def bench(label: str, parser: IncrementalParser, data: bytes) -> None:
+    before = time.perf_counter()
+    n = 0
+    for pos in range(0, len(data), CHUNK_SIZE):
+        n += len(parser.feed(data[pos : pos + CHUNK_SIZE]))
+    n += len(parser.close())
+    elapsed = time.perf_counter() - before
+    print(
+        f"{label:<24s} {n:>9d} lines {elapsed:>7.2f}s {len(data) / elapsed / 1_000_000:>8.1f} MB/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=200_000)
+    args = parser.parse_args()
+    data = generate(LogFmtFormatter(), args.lines)
+    bench("logfmt.dict", LogFmtParser(), data)
+    bench("logfmt.tuples", LogFmtParser(as_tuples=True), data)
+    data = generate(JsonFormatter(), args.lines)
+    bench("json.dict", JsonParser(), data)
+    bench("json.tuples", JsonParser(as_tuples=True), data)
+
+
+if __name__ == "__main__":
+    main()
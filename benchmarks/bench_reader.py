@@ -0,0 +1,113 @@
+"""Throughput benchmark of the stlog log reader (`python -m stlog`).
+
+A log file is generated (JSON lines and logfmt) then read with:
+
+- `parse`: parse all lines (no filter, no rendering)
+- `filter_level`: parse + filter on level (1 line out of 10 kept)
+- `filter_where`: filter on an extras value (cheap rejection before parsing)
+- `render_human`: parse + render all lines with `HumanFormatter`
+- `indexed_where`: same filter as `filter_where` but with a sidecar index (`stlog.index`)
+
+Targets for JSON lines (CPython 3.12, one core of a recent x86_64 CPU):
+`parse` >= 25 MB/s, `filter_level` >= 80 MB/s, `filter_where` >= 200 MB/s.
+
+Usage: python benchmarks/bench_reader.py [--lines 200000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from typing import Callable
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from stlog import getLogger, setup  # noqa: E402
+from stlog.__main__ import render  # noqa: E402
+from stlog.formatter import Formatter, JsonFormatter, LogFmtFormatter  # noqa: E402
+from stlog.index import build_index, read_indexed_file  # noqa: E402
+from stlog.output import FileOutput  # noqa: E402
+from stlog.reader import EntryFilter, read_files  # noqa: E402
+
+
+def generate(path: str, formatter: Formatter, lines: int) -> None:
+    setup(
+        outputs=[FileOutput(filename=path, formatter=formatter)],
+        level="DEBUG",
+        capture_warnings=False,
+        logging_excepthook=None,
+    )
+    logger = getLogger("bench.reader")
+    for i in range(lines):
+        if i % 10 == 0:
+            logger.warning("something is wrong", request_id=f"req{i}", retry=i % 3)
+        else:
+            logger.info(
+                "user %s logged in", "john", request_id=f"req{i}", duration_ms=12.5
+            )
+    setup(outputs=[], capture_warnings=False, logging_excepthook=None)
+
+
+def _bench(label: str, path: str, func: Callable[[], int]) -> None:
+    size = os.path.getsize(path)
+    before = time.perf_counter()
+    n = func()
+    elapsed = time.perf_counter() - before
+    print(
+        f"{label:<24s} {n:>9d} entries {elapsed:>7.2f}s {size / elapsed / 1_000_000:>8.1f} MB/s"
+    )
+
+
+def bench_format(name: str, formatter: Formatter, path: str, lines: int) -> None:
+    generate(path, formatter, lines)
+    size = os.path.getsize(path) / 1_000_000
+    print(f"=== {name} ({lines} lines, {size:.1f} MB) ===")
+    _bench(f"{name}.parse", path, lambda: sum(1 for _ in read_files([path])))
+    level_filter = EntryFilter(level="WARNING")
+    _bench(
+        f"{name}.filter_level",
+        path,
+        lambda: sum(1 for _ in read_files([path], entry_filter=level_filter)),
+    )
+    where_filter = EntryFilter(where={"request_id": "req1234"})
+    _bench(
+        f"{name}.filter_where",
+        path,
+        lambda: sum(1 for _ in read_files([path], entry_filter=where_filter)),
+    )
+    _bench(
+        f"{name}.render_human",
+        path,
+        lambda: render(read_files([path]), "human", io.StringIO()),
+    )
+    build_index(path, ["request_id"])
+    _bench(
+        f"{name}.indexed_where",
+        path,
+        lambda: sum(1 for _ in read_indexed_file(path, entry_filter=where_filter)),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=200_000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bench_format(
+            "json", JsonFormatter(), os.path.join(tmpdir, "bench.json"), args.lines
+        )
+        bench_format(
+            "logfmt",
+            LogFmtFormatter(),
+            os.path.join(tmpdir, "bench.logfmt"),
+            args.lines,
+        )
+
+
+if __name__ == "__main__":
+    main()
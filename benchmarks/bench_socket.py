@@ -0,0 +1,109 @@
+"""Throughput benchmark of the socket outputs (`stlog.net`) with a local collector.
+
+For each protocol (TCP, UDP, Unix socket), records are logged (JSON lines) to a local
+collector stand-in (which only counts received lines) and we measure:
+
+- `log`: the rate of the logging calls (records/s)
+- `end-to-end`: the rate until the last line is received by the collector (records/s)
+
+Usage: python benchmarks/bench_socket.py [--records 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from stlog import getLogger, setup  # noqa: E402
+from stlog.output import SocketOutput  # noqa: E402
+
+
+class Collector(threading.Thread):
+    def __init__(self, family: int, kind: int, address):
+        super().__init__(daemon=True)
+        self.sock = socket.socket(family, kind)
+        if kind == socket.SOCK_DGRAM:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+        self.sock.bind(address)
+        self.address = self.sock.getsockname()
+        self.kind = kind
+        self.lines = 0
+
+    def run(self) -> None:
+        if self.kind == socket.SOCK_DGRAM:
+            self._read(self.sock)
+            return
+        self.sock.listen()
+        conn, _ = self.sock.accept()
+        self._read(conn)
+
+    def _read(self, sock: socket.socket) -> None:
+        while True:
+            chunk = sock.recv(1024 * 1024)
+            if not chunk:
+                return
+            self.lines += chunk.count(b"\n")
+
+
+def bench(label: str, collector: Collector, output: SocketOutput, records: int):
+    collector.start()
+    setup(outputs=[output], capture_warnings=False, logging_excepthook=None)
+    logger = getLogger("bench.socket")
+    before = time.perf_counter()
+    for i in range(records):
+        logger.info("user %s logged in", "john", request_id=i, duration_ms=12.5)
+    log_elapsed = time.perf_counter() - before
+    output.get_handler().flush()
+    deadline = time.monotonic() + 10
+    while collector.lines < records and time.monotonic() < deadline:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - before
+    output.get_handler().close()
+    stats = output.get_handler().backpressure_stats  # type: ignore
+    print(
+        f"{label:<6s} log: {records / log_elapsed:>9.0f} records/s "
+        f"end-to-end: {collector.lines / elapsed:>9.0f} records/s "
+        f"(received: {collector.lines}, dropped: {stats.dropped_records})"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100_000)
+    args = parser.parse_args()
+    max_queue_bytes = 1024 * 1024 * 1024  # (to measure without drops)
+    collector = Collector(socket.AF_INET, socket.SOCK_STREAM, ("127.0.0.1", 0))
+    output = SocketOutput(
+        port=collector.address[1], max_queue_bytes=max_queue_bytes, flush_timeout=60
+    )
+    bench("tcp", collector, output, args.records)
+    collector = Collector(socket.AF_INET, socket.SOCK_DGRAM, ("127.0.0.1", 0))
+    output = SocketOutput(
+        protocol="udp",
+        port=collector.address[1],
+        max_queue_bytes=max_queue_bytes,
+        flush_timeout=60,
+    )
+    bench("udp", collector, output, args.records)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "bench.sock")
+        collector = Collector(socket.AF_UNIX, socket.SOCK_STREAM, path)
+        output = SocketOutput(
+            protocol="unix",
+            path=path,
+            max_queue_bytes=max_queue_bytes,
+            flush_timeout=60,
+        )
+        bench("unix", collector, output, args.records)
+
+
+if __name__ == "__main__":
+    main()
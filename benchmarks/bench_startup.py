@@ -0,0 +1,61 @@
+"""Startup benchmark: program name detection and `import stlog` time.
+
+Usage: python benchmarks/bench_startup.py
+"""
+
+from __future__ import annotations
+
+import inspect
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from stlog.base import _guess_program_name  # noqa: E402
+
+STACK_DEPTH = 100  # simulate a deep import chain (django, pytest, plugin loaders...)
+NUMBER = 200
+
+
+def _old_program_name() -> str:
+    return os.path.basename(inspect.stack()[-1][1])
+
+
+def _in_deep_stack(depth: int, func):
+    if depth == 0:
+        return func()
+    return _in_deep_stack(depth - 1, func)
+
+
+def _bench(label: str, func) -> None:
+    seconds = timeit.timeit(lambda: _in_deep_stack(STACK_DEPTH, func), number=NUMBER)
+    print(f"{label:<40s} {seconds / NUMBER * 1_000_000:10.1f} us/call")
+
+
+def _import_time_us() -> int:
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import stlog"],
+        capture_output=True,
+        text=True,
+        cwd=ROOT_DIR,
+        check=True,
+    )
+    for line in res.stderr.splitlines():
+        if line.endswith("| stlog"):
+            return int(line.split("|")[1])
+    raise Exception("can't find stlog import time")
+
+
+def main() -> None:
+    print(f"program name detection (stack depth: {STACK_DEPTH})")
+    _bench("inspect.stack() (old)", _old_program_name)
+    _bench("_guess_program_name() (new)", _guess_program_name)
+    print()
+    print(f"{'import stlog (cumulative)':<40s} {_import_time_us():10d} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from stlog.adapter import getLogger
 from stlog.context import LogContext
+from stlog.metrics import stats
 from stlog.setup import (
     critical,
     debug,
@@ -10,6 +11,7 @@ from stlog.setup import (
     fatal,
     info,
     log,
+    reconfigure,
     setup,
     warn,
     warning,
@@ -25,7 +27,9 @@ __all__ = [
     "getLogger",
     "info",
     "log",
+    "reconfigure",
     "setup",
+    "stats",
     "warn",
     "warning",
 ]
@@ -35,6 +39,7 @@ __pdoc__ = {
     "handler": False,
     "filter": False,
     "context": False,
+    "__main__": False,
     "warn": False,
     "fatal": False,
 }
@@ -0,0 +1,282 @@
+"""Read, filter and convert stlog JSON / logfmt logs.
+
+Examples:
+
+    python -m stlog app.log                          # JSON or logfmt => human
+    python -m stlog --level WARNING --logger myapp app.log
+    python -m stlog --since 2023-03-29T10:00:00Z --until 2023-03-29T10:05:00Z app.log
+    python -m stlog --where request_id=1234 --output json - < app.log
+    python -m stlog --build-index --index-key request_id app.log  # => app.log.idx
+    python -m stlog --merge --with-rotated app.log worker1.log worker2.log
+    python -m stlog --follow app.log worker1.log
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import sys
+from typing import Iterable, Iterator, TextIO
+
+from stlog.base import StlogError
+from stlog.formatter import (
+    DEFAULT_STLOG_GCP_JSON_FORMAT,
+    Formatter,
+    HumanFormatter,
+    JsonFormatter,
+    LogFmtFormatter,
+)
+from stlog.index import build_index, get_index_path, read_indexed_file
+from stlog.output import Output, RichStreamOutput, make_stream_or_rich_stream_output
+from stlog.reader import (
+    EntryFilter,
+    LogEntry,
+    follow_files,
+    get_rotated_paths,
+    merge_entries,
+    parse_time,
+    read_files,
+)
+
+OUTPUTS = ("console", "human", "rich", "logfmt", "json", "json-human", "json-gcp")
+WRITE_BATCH_SIZE = 1000
+
+
+def _make_formatter(output: str) -> Formatter:
+    if output == "logfmt":
+        return LogFmtFormatter()
+    elif output == "json":
+        return JsonFormatter()
+    elif output == "json-human":
+        return JsonFormatter(indent=4)
+    elif output == "json-gcp":
+        return JsonFormatter(fmt=DEFAULT_STLOG_GCP_JSON_FORMAT)
+    return HumanFormatter()
+
+
+def render(
+    entries: Iterable[LogEntry],
+    output: str,
+    stream: TextIO,
+    batch_size: int = WRITE_BATCH_SIZE,
+) -> int:
+    """Render entries through a stlog formatter (or through rich) on the given stream.
+
+    Lines are written (and flushed) by batches of `batch_size` lines.
+
+    Returns:
+        The number of rendered entries.
+
+    """
+    out: Output | None = None
+    if output == "rich":
+        # explicit rich output => let's force it (even if stream is not a terminal)
+        out = RichStreamOutput(stream=stream, force_terminal=True)
+    elif output == "console":
+        out = make_stream_or_rich_stream_output(stream=stream)
+    if isinstance(out, RichStreamOutput):
+        handler = out.get_handler()
+        n = 0
+        for entry in entries:
+            handler.handle(entry.to_log_record())
+            n += 1
+        return n
+    formatter = _make_formatter(output)
+    batch: list[str] = []
+    n = 0
+    for entry in entries:
+        batch.append(formatter.format(entry.to_log_record()))
+        n += 1
+        if len(batch) >= batch_size:
+            batch.append("")
+            stream.write("\n".join(batch))
+            stream.flush()
+            batch = []
+    if batch:
+        batch.append("")
+        stream.write("\n".join(batch))
+    stream.flush()
+    return n
+
+
+def _parse_time_or_raise(value: str | None) -> float | None:
+    if value is None:
+        return None
+    res = parse_time(value)
+    if res is None:
+        raise StlogError(f"can't parse time: {value}")
+    return res
+
+
+def _parse_where(values: list[str]) -> dict[str, str]:
+    res: dict[str, str] = {}
+    for value in values:
+        if "=" not in value:
+            raise StlogError(f"bad --where value: {value} (must be key=value)")
+        key, val = value.split("=", 1)
+        res[key] = val
+    return res
+
+
+def _level(value: str) -> str | int:
+    # (argparse type: an unknown level is a command line error)
+    level: str | int = int(value) if value.isdigit() else value.upper()
+    try:
+        EntryFilter(level=level)
+    except StlogError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+    return level
+
+
+def make_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m stlog",
+        description="read, filter and convert stlog JSON / logfmt logs",
+    )
+    parser.add_argument(
+        "files", nargs="*", default=["-"], help="log files ('-' means stdin)"
+    )
+    parser.add_argument(
+        "--input-format",
+        choices=("auto", "json", "logfmt", "binary"),
+        default="auto",
+        help="input format (default: auto detection for each line)",
+    )
+    parser.add_argument(
+        "--output", choices=OUTPUTS, default="console", help="output format"
+    )
+    parser.add_argument("--level", type=_level, help="minimal level (example: WARNING)")
+    parser.add_argument(
+        "--logger",
+        action="append",
+        default=[],
+        help="keep only this logger (and its children), can be used multiple times",
+    )
+    parser.add_argument("--since", help="minimal time (ISO 8601, included)")
+    parser.add_argument("--until", help="maximal time (ISO 8601, excluded)")
+    parser.add_argument(
+        "--where",
+        action="append",
+        default=[],
+        help="keep only entries with this extra key=value, can be used multiple times",
+    )
+    parser.add_argument(
+        "--with-rotated",
+        action="store_true",
+        help="read also rotated files (FILE.N... FILE.1) of each given file",
+    )
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="merge entries of all files ordered by time (each file must be time ordered)",
+    )
+    parser.add_argument(
+        "-f",
+        "--follow",
+        action="store_true",
+        help="output new entries as the files grow (across rotations)",
+    )
+    parser.add_argument(
+        "--build-index",
+        action="store_true",
+        help="build the sidecar index (FILE.idx) of each given file, then exit",
+    )
+    parser.add_argument(
+        "--index-key",
+        action="append",
+        default=[],
+        help="extra key to index (with --build-index), can be used multiple times",
+    )
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="don't use sidecar indexes (FILE.idx) even if they exist",
+    )
+    return parser
+
+
+def _read_file(
+    path: str, input_format: str, entry_filter: EntryFilter, use_index: bool
+) -> Iterator[LogEntry]:
+    if use_index and path != "-" and os.path.exists(get_index_path(path)):
+        return read_indexed_file(path, input_format, entry_filter)
+    return read_files([path], input_format, entry_filter)
+
+
+def read(
+    paths: list[str],
+    input_format: str,
+    entry_filter: EntryFilter,
+    use_index: bool = True,
+    merge: bool = False,
+) -> Iterator[LogEntry]:
+    """Read (and filter) entries of the given files (with their sidecar index if any).
+
+    If `merge` is True, entries of all files are merged by time.
+    """
+    sources = [_read_file(x, input_format, entry_filter, use_index) for x in paths]
+    if merge:
+        return merge_entries(sources)
+    return itertools.chain.from_iterable(sources)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = make_argument_parser()
+    args = parser.parse_args(argv)
+    for path in args.files:
+        # (followed files may not exist yet)
+        if path != "-" and not args.follow and not os.path.exists(path):
+            parser.error(f"no such file: {path}")
+    try:
+        entry_filter = EntryFilter(
+            level=args.level,
+            loggers=args.logger,
+            since=_parse_time_or_raise(args.since),
+            until=_parse_time_or_raise(args.until),
+            where=_parse_where(args.where),
+        )
+    except StlogError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 2
+    if args.build_index:
+        for path in args.files:
+            if path == "-":
+                print("ERROR: can't build an index for stdin", file=sys.stderr)
+                return 2
+            print(build_index(path, args.index_key, input_format=args.input_format))
+        return 0
+    if args.follow:
+        if "-" in args.files:
+            print("ERROR: can't follow stdin", file=sys.stderr)
+            return 2
+        entries = follow_files(args.files, args.input_format, entry_filter)
+        batch_size = 1
+    else:
+        paths = args.files
+        if args.with_rotated:
+            paths = [y for x in paths for y in get_rotated_paths(x)]
+        entries = read(
+            paths, args.input_format, entry_filter, not args.no_index, args.merge
+        )
+        batch_size = WRITE_BATCH_SIZE
+    return _render_to_stdout(entries, args.output, batch_size)
+
+
+def _render_to_stdout(entries: Iterable[LogEntry], output: str, batch_size: int) -> int:
+    try:
+        render(entries, output, sys.stdout, batch_size)
+    except (BrokenPipeError, KeyboardInterrupt):
+        # for example: python -m stlog app.log | head
+        # or: python -m stlog --follow app.log (stopped by Ctrl+C)
+        return 0
+    except OSError as e:
+        # for example: a file which is not readable
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""asyncio-native output which never blocks the event loop.
+
+The log call (on the event loop thread) only enqueues the record (with a copy of the
+current `contextvars` context, so `stlog.LogContext` values and bindings are the ones
+of the call time) without any cross-thread lock. A writer task (lazily started on the
+running loop) drains the queue by batches in a dedicated thread (executor) where the
+wrapped handler formats and writes the records.
+
+The queue is bounded (`max_queue_records` and `max_queue_bytes`): when the writer can't
+keep up (stalled consumer), new records are dropped (and counted in the backpressure
+metrics) instead of growing the memory without limit.
+
+Note: as records are formatted later, mutable objects passed as logging `args` or
+extras must not be modified after the log call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import logging
+import threading
+
+from stlog.base import GLOBAL_LOGGING_CONFIG
+from stlog.metrics import BackpressureStats
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_MAX_QUEUE_RECORDS = 100000
+DEFAULT_MAX_QUEUE_BYTES = 64 * 1024 * 1024
+# (estimate) memory used by a queued record besides its message and string args
+_RECORD_OVERHEAD_BYTES = 512
+
+
+def _estimate_size(record: logging.LogRecord) -> int:
+    # cheap estimate (the record is not formatted yet)
+    size = _RECORD_OVERHEAD_BYTES
+    if isinstance(record.msg, str):
+        size += len(record.msg)
+    if isinstance(record.args, tuple):
+        for arg in record.args:
+            if isinstance(arg, str):
+                size += len(arg)
+    return size
+
+
+class AsyncioHandler(logging.Handler):
+    """A logging handler which enqueues records for a writer task (see `stlog.aio`).
+
+    If there is no running event loop (when the record is emitted), the record is
+    written synchronously (after the already queued ones).
+
+    Attributes:
+        target: the wrapped handler (which formats and writes the records).
+        batch_size: the maximum number of records written by the executor in one go.
+        max_queue_records: the maximum number of queued records (new records are
+            dropped when the queue is full), 0 means "no limit".
+        max_queue_bytes: the maximum (estimated) size of the queued records in bytes
+            (the message and the string args plus a fixed overhead per record, as the
+            records are not formatted yet), 0 means "no limit".
+        backpressure_stats: queue (backlog) and dropped records metrics.
+
+    """
+
+    def __init__(
+        self,
+        target: logging.Handler,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_queue_records: int = DEFAULT_MAX_QUEUE_RECORDS,
+        max_queue_bytes: int = DEFAULT_MAX_QUEUE_BYTES,
+    ):
+        super().__init__()
+        self.target = target
+        self.batch_size = max(batch_size, 1)
+        self.max_queue_records = max_queue_records
+        self.max_queue_bytes = max_queue_bytes
+        self.backpressure_stats = BackpressureStats()
+        self._queue: collections.deque[
+            tuple[contextvars.Context, logging.LogRecord, int]
+        ] = collections.deque()
+        # (only held to update the metrics, never during a write)
+        self._stats_lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._executor: concurrent.futures.ThreadPoolExecutor | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._event: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def handle(self, record: logging.LogRecord) -> bool:  # type: ignore
+        # same as logging.Handler.handle() but without the handler lock
+        # (emit() is loop/thread-safe)
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        if rv:
+            self.emit(record)
+        return bool(rv)
+
+    def _enqueue(self, record: logging.LogRecord) -> bool:
+        # (returns False if the record is dropped because the queue is full)
+        size = _estimate_size(record)
+        stats = self.backpressure_stats
+        with self._stats_lock:
+            if (
+                self.max_queue_records > 0
+                and len(self._queue) >= self.max_queue_records
+            ) or (
+                self.max_queue_bytes > 0
+                and stats.backlog_bytes + size > self.max_queue_bytes
+            ):
+                stats.dropped_records += 1
+                stats.dropped_bytes += size
+                return False
+            stats.backlog_bytes += size
+            stats.max_backlog_bytes = max(stats.max_backlog_bytes, stats.backlog_bytes)
+            self._queue.append((contextvars.copy_context(), record, size))
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            loop = self._loop
+            if loop is None or not loop.is_running():
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    # no event loop to protect => synchronous write
+                    if self._enqueue(record):
+                        self._drain()
+                    return
+                self._start(loop)
+            if not self._enqueue(record):
+                return
+            event = self._event
+            assert event is not None
+            if threading.get_ident() == self._loop_thread_id:
+                if not event.is_set():
+                    event.set()
+            else:
+                loop.call_soon_threadsafe(event.set)
+        except Exception:
+            self.handleError(record)
+
+    def _start(self, loop: asyncio.AbstractEventLoop) -> None:
+        # (called in the loop thread)
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._event = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="stlog-asyncio-writer"
+            )
+        return self._executor
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        event = self._event
+        assert event is not None
+        try:
+            while True:
+                await event.wait()
+                event.clear()
+                while self._queue:
+                    await loop.run_in_executor(
+                        self._get_executor(), self._drain, self.batch_size
+                    )
+        finally:
+            # cancelled (end of the loop...) => let's detach and write what remains
+            if self._loop is loop:
+                self._loop = None
+            self._drain()
+
+    def _drain(self, limit: int = 0) -> None:
+        # write (at most `limit`, 0 means "all") queued records
+        # (the lock keeps the order between the executor and synchronous drains)
+        with self._drain_lock:
+            queue = self._queue
+            target = self.target
+            stats = self.backpressure_stats
+            n = 0
+            while queue and (limit == 0 or n < limit):
+                context, record, size = queue.popleft()
+                with self._stats_lock:
+                    stats.backlog_bytes -= size
+                context.run(target.handle, record)
+                n += 1
+            if n > 0:
+                target.flush()
+
+    def flush(self) -> None:
+        """Write synchronously all the queued records (in the calling thread).
+
+        In a coroutine, prefer `await drain()` (which doesn't block the event loop).
+        """
+        self._drain()
+
+    async def drain(self) -> None:
+        """Wait until all the records queued before the call are written (and flushed)."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._get_executor(), self._drain)
+
+    def close(self) -> None:
+        loop, task = self._loop, self._task
+        self._loop = None
+        self._task = None
+        if loop is not None and task is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(task.cancel)
+        self._drain()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.target.close()
+        super().close()
+
+
+async def drain() -> None:
+    """Wait until all the records queued in the configured asyncio outputs are written.
+
+    To be used for a graceful shutdown (see `stlog.output.AsyncioOutput`).
+    """
+    for output in GLOBAL_LOGGING_CONFIG._outputs:
+        handler = output.get_handler()
+        if isinstance(handler, AsyncioHandler):
+            await handler.drain()
@@ -1,24 +1,26 @@
 from __future__ import annotations
 
-import inspect
+import hashlib
+import importlib.util
 import json
 import numbers
 import os
 import re
 import string
+import sys
 import types
 from dataclasses import dataclass, field
 from string import Template
 from typing import Any, Callable, Match
 
 STLOG_EXTRA_KEY = "_stlog_extra"
-RICH_AVAILABLE = False
-try:
-    from rich.traceback import Traceback
-
-    RICH_AVAILABLE = True
-except ImportError:
-    pass
+# keys of the dictionary-encoded context in JSON outputs (see `JsonFormatter.context_refs`)
+STLOG_CONTEXT_REF_KEY = "ctx"
+STLOG_CONTEXT_DEF_KEY = "ctx_def"
+STLOG_CONTEXT_VALUES_KEY = "ctx_values"
+# note: rich is imported lazily (only when a rich output or a rich exception dump
+# is really used) to keep `import stlog` cheap
+RICH_AVAILABLE: bool = importlib.util.find_spec("rich") is not None
 
 
 TRUE_VALUES = ("1", "true", "yes")
@@ -36,17 +38,44 @@ class StlogError(Exception):
     pass
 
 
+def _guess_program_name() -> str:
+    # note: we don't use inspect.stack() here because it's very slow
+    # (it reads the source context of every frame)
+    main_module = sys.modules.get("__main__")
+    main_file = getattr(main_module, "__file__", None)
+    if main_file:
+        return os.path.basename(main_file)
+    if sys.argv and sys.argv[0] and sys.argv[0] != "-c":
+        return os.path.basename(sys.argv[0])
+    frame = sys._getframe()
+    while frame.f_back is not None:
+        frame = frame.f_back
+    return os.path.basename(frame.f_code.co_filename)
+
+
 @dataclass
 class GlobalLoggingConfig:
     setup: bool = False
-    program_name: str = field(
-        default_factory=lambda: os.path.basename(inspect.stack()[-1][1])
-    )
     reinject_context_in_standard_logging: bool | None = None
     read_extra_kwargs_from_standard_logging: bool | None = None
     _unit_tests_mode: bool = (
         os.environ.get("STLOG_UNIT_TESTS_MODE", "0").lower() in TRUE_VALUES
     )
+    _program_name: str | None = field(default=None, repr=False)
+    # configured outputs and extra levels (set by setup() and used by reconfigure())
+    _outputs: list[Any] = field(default_factory=list, repr=False)
+    _extra_levels: dict[str, str | int] = field(default_factory=dict, repr=False)
+
+    @property
+    def program_name(self) -> str:
+        # lazy evaluation (on first access) to keep `import stlog` cheap
+        if self._program_name is None:
+            self._program_name = _guess_program_name()
+        return self._program_name
+
+    @program_name.setter
+    def program_name(self, value: str) -> None:
+        self._program_name = value
 
 
 GLOBAL_LOGGING_CONFIG = GlobalLoggingConfig()
@@ -105,9 +134,13 @@ def check_json_types_or_raise(to_check: Any) -> None:
 
 # Adapted from https://github.com/jteppinette/python-logfmter/blob/main/logfmter/formatter.py
 def logfmt_format_string(value: str) -> str:
+    needs_backslash_escaping = "\\" in value
     needs_dquote_escaping = '"' in value
     needs_newline_escaping = "\n" in value
     needs_quoting = not set(value).issubset(ALLOWED_CHARS_WITHOUT_LOGFMT_QUOTING)
+    if needs_backslash_escaping:
+        # (must be done first, see stlog.parser for the inverse)
+        value = value.replace("\\", "\\\\")
     if needs_dquote_escaping:
         value = value.replace('"', '\\"')
     if needs_newline_escaping:
@@ -196,6 +229,8 @@ def rich_dump_exception_on_console(
     value: BaseException,
     tb: types.TracebackType | None,
 ) -> None:
+    from rich.traceback import Traceback
+
     console.print(
         Traceback.from_exception(
             exc_type,
@@ -217,23 +252,63 @@ def rich_dump_exception_on_console(
     )
 
 
+def exception_fingerprint(
+    exc_type: type[BaseException],
+    value: BaseException | None,
+    tb: types.TracebackType | None,
+) -> str:
+    """Compute a short fingerprint of an exception.
+
+    The fingerprint depends on the exception type and on the code locations (module
+    names, not file paths, line numbers and function names) of the traceback (chained
+    exceptions included) but not on the exception message, so the same error raised
+    again at the same place gets the same fingerprint (on any host or install path).
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    seen: set[int] = set()
+    while True:
+        digest.update(f"{exc_type.__module__}.{exc_type.__qualname__}".encode())
+        while tb is not None:
+            frame = tb.tb_frame
+            code = frame.f_code
+            module = frame.f_globals.get("__name__") or os.path.basename(
+                code.co_filename
+            )
+            digest.update(f"|{module}:{tb.tb_lineno}:{code.co_name}".encode())
+            tb = tb.tb_next
+        if value is None:
+            break
+        seen.add(id(value))
+        chained = value.__cause__
+        if chained is None and not value.__suppress_context__:
+            chained = value.__context__
+        if chained is None or id(chained) in seen:
+            break
+        value, exc_type, tb = chained, type(chained), chained.__traceback__
+        digest.update(b"<")
+    return digest.hexdigest()
+
+
 _ReStringMatch = Match[str]  # regex match object
 _ReSubCallable = Callable[[_ReStringMatch], str]  # Callable invoked by re.sub
 _EscapeSubMethod = Callable[[_ReSubCallable, str], str]  # Sub method of a compiled re
 
 
+def _escape_backslashes(match: Match[str]) -> str:
+    """Called by re.sub replace matches."""
+    backslashes, text = match.groups()
+    return f"{backslashes}{backslashes}\\{text}"
+
+
 # Stolen from https://github.com/Textualize/rich/blob/master/rich/markup.py
 def rich_markup_escape(
     markup: str,
     _escape: _EscapeSubMethod = re.compile(r"(\\*)(\[[a-z#/@][^[]*?])").sub,
 ) -> str:
-    def escape_backslashes(match: Match[str]) -> str:
-        """Called by re.sub replace matches."""
-        backslashes, text = match.groups()
-        return f"{backslashes}{backslashes}\\{text}"
-
-    markup = _escape(escape_backslashes, markup)
-    return markup
+    if "[" not in markup:
+        # fast path: no markup is possible (most log messages)
+        return markup
+    return _escape(_escape_backslashes, markup)
 
 
 # Adapted from https://github.com/madzak/python-json-logger/blob/master/src/pythonjsonlogger/jsonlogger.py
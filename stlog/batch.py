@@ -0,0 +1,360 @@
+"""Batched (and optionally non-blocking) output of bytes records to a file descriptor.
+
+Records are formatted to `bytes` (see `stlog.formatter.Formatter.format_bytes`: a `str`
+formatting followed by an UTF-8 encoding) and kept in a small batch. The batch is handed
+to the file descriptor with a single `os.writev()` call (no concatenation, one syscall
+for many records) when it is full, when the handler is flushed (`logging.shutdown()`
+does it at exit) or every `flush_interval` seconds (by a lazily started daemon thread).
+
+`NonBlockingFdHandler` does the same with a non-blocking file descriptor and a bounded
+backlog (for consumers which can stall, like the log agent reading a container stdout).
+"""
+
+from __future__ import annotations
+
+import codecs
+import logging
+import os
+import select
+import threading
+import time
+import weakref
+from typing import IO
+
+from stlog.base import StlogError
+from stlog.metrics import BackpressureStats
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_FLUSH_INTERVAL = 0.1
+DEFAULT_MAX_BACKLOG_BYTES = 1024 * 1024
+DEFAULT_BLOCK_TIMEOUT = 1.0
+OVERFLOW_POLICIES = ("drop", "block", "spill")
+_IOV_MAX = os.sysconf("SC_IOV_MAX") if hasattr(os, "sysconf") else 1024
+_DEFAULT_FORMATTER = logging.Formatter()
+_HANDLERS: weakref.WeakSet[BatchFdHandler] = weakref.WeakSet()
+
+
+def _consume(buffers: list[bytes], written: int) -> None:
+    # remove (in place) the first `written` bytes of the buffers list
+    i = 0
+    while i < len(buffers) and written >= len(buffers[i]):
+        written -= len(buffers[i])
+        i += 1
+    del buffers[0:i]
+    if written:
+        buffers[0] = memoryview(buffers[0])[written:]  # type: ignore
+
+
+def _write_once(fd: int, buffers: list[bytes]) -> int:
+    # one syscall (with at most IOV_MAX buffers), written bytes are removed from the list
+    chunk = buffers[0:_IOV_MAX]
+    if hasattr(os, "writev"):
+        written = os.writev(fd, chunk)
+    else:  # windows
+        written = os.write(fd, b"".join(chunk))
+    _consume(buffers, written)
+    return written
+
+
+def writev_all(fd: int, buffers: list[bytes]) -> None:
+    """Write all the given buffers to the file descriptor (in as few syscalls as possible).
+
+    Partial writes are retried and the number of buffers per call is limited to `IOV_MAX`.
+    Note: the given list is consumed.
+    """
+    while buffers:
+        _write_once(fd, buffers)
+
+
+def _is_utf8(encoding: str) -> bool:
+    return codecs.lookup(encoding).name == "utf-8"
+
+
+class _Flusher(threading.Thread):
+    def __init__(self, handler: BatchFdHandler):
+        super().__init__(name="stlog-batch-flusher", daemon=True)
+        # (weak reference to not keep alive a handler which is not used anymore)
+        self._handler_ref = weakref.ref(handler)
+        self.interval = handler.flush_interval
+        self.stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            handler = self._handler_ref()
+            if handler is None:
+                return
+            handler.flush()
+            del handler
+
+
+class BatchFdHandler(logging.Handler):
+    """A logging handler writing batches of bytes records to a file descriptor.
+
+    Attributes:
+        fd: the file descriptor to write to.
+        batch_size: the maximum number of records in a batch.
+        flush_interval: the maximum time (in seconds) a record can wait in a batch
+            (0 means "no periodic flush").
+        encoding: the encoding to use (if the formatter does not produce bytes).
+        errors: the encoding error handler to use.
+        close_fd: if True, the file descriptor is closed with the handler.
+
+    """
+
+    terminator = "\n"
+
+    def __init__(  # noqa: PLR0913
+        self,
+        fd: int,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        encoding: str | None = None,
+        errors: str | None = None,
+        close_fd: bool = False,
+    ):
+        super().__init__()
+        self.fd = fd
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self.encoding = encoding or "utf-8"
+        self.errors = errors or "strict"
+        self.close_fd = close_fd
+        self._bytes_formatter = _is_utf8(self.encoding) and self.errors == "strict"
+        self._terminator = self.terminator.encode(self.encoding)
+        self._buffers: list[bytes] = []
+        self._last_record: logging.LogRecord | None = None
+        self._flusher: _Flusher | None = None
+        _HANDLERS.add(self)
+
+    def format_bytes(self, record: logging.LogRecord) -> bytes:
+        """Format the record to bytes (without the terminator)."""
+        formatter = self.formatter or _DEFAULT_FORMATTER
+        if self._bytes_formatter and hasattr(formatter, "format_bytes"):
+            return formatter.format_bytes(record)  # type: ignore
+        return formatter.format(record).encode(self.encoding, self.errors)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            buffers = self._buffers
+            buffers.append(self.format_bytes(record))
+            buffers.append(self._terminator)
+            self._last_record = record
+            if len(buffers) >= 2 * self.batch_size:
+                self._write()
+            elif self._flusher is None and self.flush_interval > 0:
+                self._flusher = _Flusher(self)
+                self._flusher.start()
+        except Exception:
+            self.handleError(record)
+
+    def _write(self) -> None:
+        buffers = self._buffers
+        if not buffers:
+            return
+        self._buffers = []
+        try:
+            writev_all(self.fd, buffers)
+        except Exception:
+            self.handleError(self._last_record)  # type: ignore
+
+    def flush(self) -> None:
+        """Write the current batch (if any)."""
+        self.acquire()
+        try:
+            self._write()
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            self._write()
+            if self._flusher is not None:
+                self._flusher.stop_event.set()
+                self._flusher = None
+            if self.close_fd and self.fd >= 0:
+                os.close(self.fd)
+                self.fd = -1
+        finally:
+            self.release()
+        super().close()
+
+
+def _after_fork_in_child() -> None:
+    # the flusher threads do not exist anymore in the child process
+    # and the pending records belong to the parent (which writes them)
+    for handler in list(_HANDLERS):
+        handler._flusher = None
+        handler._buffers = []
+        handler._last_record = None
+        if isinstance(handler, NonBlockingFdHandler):
+            handler.backpressure_stats.backlog_bytes = 0
+            handler._stall_start = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class NonBlockingFdHandler(BatchFdHandler):
+    """A logging handler writing to a non-blocking file descriptor (through a bounded backlog).
+
+    The file descriptor is set to `O_NONBLOCK` (and restored at close) so a stalled
+    consumer (for example a log agent reading the container stdout) never blocks
+    the logging threads: what can't be written immediately is kept in an in-memory
+    backlog (written later by the next records, by `flush()` or by the flusher thread).
+
+    When the backlog is full, the `overflow_policy` is applied to the new record:
+
+    - `drop`: the record is dropped
+    - `block`: we wait (at most `block_timeout` seconds) for the consumer, then drop the record
+    - `spill`: the record is written to the `spill_path` local file
+
+    Note: `O_NONBLOCK` is a property of the open file description (shared with the
+    other writers of this fd, `print()` included).
+
+    Attributes:
+        max_backlog_bytes: the maximum number of bytes in the backlog.
+        overflow_policy: what to do with a new record when the backlog is full
+            (`drop`, `block` or `spill`).
+        block_timeout: the maximum time (in seconds) to wait for the consumer
+            (`block` policy, and at close).
+        spill_path: the path of the spill file (`spill` policy).
+        backpressure_stats: backpressure metrics.
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        fd: int,
+        batch_size: int = 1,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        encoding: str | None = None,
+        errors: str | None = None,
+        close_fd: bool = False,
+        max_backlog_bytes: int = DEFAULT_MAX_BACKLOG_BYTES,
+        overflow_policy: str = "drop",
+        block_timeout: float = DEFAULT_BLOCK_TIMEOUT,
+        spill_path: str | None = None,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise StlogError(
+                f"bad overflow policy: {overflow_policy} (must be in {OVERFLOW_POLICIES})"
+            )
+        if overflow_policy == "spill" and not spill_path:
+            raise StlogError("spill_path is not set (mandatory with the spill policy)")
+        if os.name != "posix":
+            raise StlogError("non-blocking outputs are only supported on POSIX systems")
+        super().__init__(
+            fd,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            encoding=encoding,
+            errors=errors,
+            close_fd=close_fd,
+        )
+        self.max_backlog_bytes = max_backlog_bytes
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.spill_path = spill_path
+        self.backpressure_stats = BackpressureStats()
+        self._spill_file: IO[bytes] | None = None
+        self._stall_start: int | None = None
+        self._was_blocking = os.get_blocking(fd)
+        os.set_blocking(fd, False)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            data = self.format_bytes(record)
+            stats = self.backpressure_stats
+            size = len(data) + len(self._terminator)
+            if stats.backlog_bytes + size > self.max_backlog_bytes:
+                self._write()  # let's try to make some room
+                if stats.backlog_bytes + size > self.max_backlog_bytes:
+                    self._overflow(data, size)
+                    return
+            self._buffers.append(data)
+            self._buffers.append(self._terminator)
+            self._last_record = record
+            stats.backlog_bytes += size
+            stats.max_backlog_bytes = max(stats.max_backlog_bytes, stats.backlog_bytes)
+            if len(self._buffers) >= 2 * self.batch_size:
+                self._write()
+            if self._buffers and self._flusher is None and self.flush_interval > 0:
+                self._flusher = _Flusher(self)
+                self._flusher.start()
+        except Exception:
+            self.handleError(record)
+
+    def _overflow(self, data: bytes, size: int) -> None:
+        stats = self.backpressure_stats
+        if self.overflow_policy == "block":
+            deadline = time.monotonic() + self.block_timeout
+            while stats.backlog_bytes + size > self.max_backlog_bytes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                select.select([], [self.fd], [], remaining)
+                self._write()
+            else:
+                self._buffers.append(data)
+                self._buffers.append(self._terminator)
+                stats.backlog_bytes += size
+                return
+        elif self.overflow_policy == "spill":
+            if self._spill_file is None:
+                self._spill_file = open(self.spill_path, "ab")  # type: ignore
+            self._spill_file.write(data + self._terminator)
+            self._spill_file.flush()
+            stats.spilled_records += 1
+            stats.spilled_bytes += size
+            return
+        stats.dropped_records += 1
+        stats.dropped_bytes += size
+
+    def _write(self) -> None:
+        buffers = self._buffers
+        if not buffers:
+            return
+        stats = self.backpressure_stats
+        try:
+            while buffers:
+                stats.backlog_bytes -= _write_once(self.fd, buffers)
+        except BlockingIOError:
+            pass
+        except Exception:
+            stats.dropped_bytes += stats.backlog_bytes
+            stats.backlog_bytes = 0
+            buffers.clear()
+            self.handleError(self._last_record)  # type: ignore
+        if buffers:
+            if self._stall_start is None:
+                self._stall_start = time.perf_counter_ns()
+                stats.stalls += 1
+        elif self._stall_start is not None:
+            stats.stall_time.add(time.perf_counter_ns() - self._stall_start)
+            self._stall_start = None
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            if self.fd >= 0:
+                # let's try to write the backlog (with a deadline)
+                deadline = time.monotonic() + self.block_timeout
+                while self._buffers and time.monotonic() < deadline:
+                    select.select(
+                        [], [self.fd], [], max(deadline - time.monotonic(), 0)
+                    )
+                    self._write()
+                stats = self.backpressure_stats
+                stats.dropped_bytes += stats.backlog_bytes
+                stats.backlog_bytes = 0
+                self._buffers = []
+                if self._was_blocking:
+                    os.set_blocking(self.fd, True)
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+        finally:
+            self.release()
+        super().close()
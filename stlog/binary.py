@@ -0,0 +1,488 @@
+"""Compact binary output (and its streaming decoder).
+
+A binary stream is a sequence of length-prefixed frames (`varint(length) + type + payload`):
+
+- a `SEGMENT` frame starts each file segment (magic + version) and resets the decoder state
+- a `STRING` frame defines a string of the string table (logger names, level names, extras
+    keys, source paths...): each string is emitted only once per segment
+- a `RECORD` frame is a log record: varint (zigzag) delta of the timestamp (in microseconds)
+    with the previous record of the segment, varint level, string table references and typed
+    values
+
+The decoder returns `stlog.reader.LogEntry` objects which can be rendered back through any
+stlog formatter (see `python -m stlog` which detects binary files automatically).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import logging.handlers
+import os
+import struct
+from dataclasses import dataclass, field
+from typing import IO, Any, Iterator
+
+from stlog.base import STLOG_EXTRA_KEY, StlogError, exception_fingerprint
+from stlog.formatter import Formatter, json_formatter_default_extra_key_rename_fn
+from stlog.reader import DEFAULT_CHUNK_SIZE, EntryFilter, LogEntry
+
+VERSION = 1
+_SEGMENT = 0
+_STRING = 1
+_RECORD = 2
+BINARY_MAGIC = b"STLB"
+# the segment frame (which starts each file)
+_SEGMENT_FRAME = (
+    bytes([len(BINARY_MAGIC) + 2, _SEGMENT]) + BINARY_MAGIC + bytes([VERSION])
+)
+
+_FLAG_SOURCE = 1
+_FLAG_EXC_INFO = 2
+_FLAG_STACK_INFO = 4
+
+_T_NONE = 0
+_T_TRUE = 1
+_T_FALSE = 2
+_T_INT = 3
+_T_FLOAT = 4
+_T_STR = 5
+_T_JSON = 6
+
+_DOUBLE = struct.Struct("<d")
+# (LogRecord attribute, is a string) => source information (in this order)
+_SOURCE_ATTRS = (
+    ("pathname", True),
+    ("lineno", False),
+    ("module", True),
+    ("funcName", True),
+    ("process", False),
+    ("processName", True),
+    ("thread", False),
+    ("threadName", True),
+)
+_RECORD_ATTR_TO_SOURCE_KEY = {"pathname": "path"}
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def _read_varint(buf: bytes | bytearray, pos: int) -> tuple[int, int]:
+    # raise IndexError if the varint is not complete
+    byte = buf[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    value = byte & 0x7F
+    shift = 7
+    while True:
+        pos += 1
+        byte = buf[pos]
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos + 1
+        shift += 7
+
+
+def _write_value(out: bytearray, value: Any) -> None:
+    if value is None:
+        out.append(_T_NONE)
+    elif value is True:
+        out.append(_T_TRUE)
+    elif value is False:
+        out.append(_T_FALSE)
+    elif isinstance(value, int):
+        out.append(_T_INT)
+        _write_varint(out, _zigzag(value))
+    elif isinstance(value, float):
+        out.append(_T_FLOAT)
+        out += _DOUBLE.pack(value)
+    elif isinstance(value, str):
+        out.append(_T_STR)
+        _write_str(out, value)
+    else:
+        out.append(_T_JSON)
+        _write_str(out, json.dumps(value, default=str))
+
+
+def _write_str(out: bytearray, value: str) -> None:
+    encoded = value.encode("utf-8", errors="replace")
+    _write_varint(out, len(encoded))
+    out += encoded
+
+
+def _read_str(buf: bytes, pos: int) -> tuple[str, int]:
+    length, pos = _read_varint(buf, pos)
+    return buf[pos : pos + length].decode("utf-8", errors="replace"), pos + length
+
+
+class SegmentState:
+    """Encoder state of a file segment (string table and last timestamp)."""
+
+    __slots__ = ("last_time_us", "strings")
+
+    def __init__(self):
+        self.strings: dict[str, int] = {}
+        self.last_time_us: int = 0
+
+
+@dataclass
+class BinaryFormatter(Formatter):
+    """Formatter for the compact binary output (see `BinaryFileOutput`).
+
+    Note: this formatter returns `bytes` (and not `str`), it can only be used with
+    a `BinaryFileOutput`.
+
+    Attributes:
+        include_source: if True (default), include source information (path, lineno,
+            module, funcName, process, thread...) as in the default JSON output.
+        exc_fingerprint_key: if set, the extras key of the exception fingerprint (see
+            `stlog.base.exception_fingerprint`), default to None (no fingerprint).
+
+    """
+
+    include_source: bool = True
+    exc_fingerprint_key: str | None = None
+    _key_names: dict[str, str | None] = field(
+        init=False, default_factory=dict, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        if self.extra_key_max_length is None:
+            self.extra_key_max_length = 0
+        if self.extra_key_rename_fn is None:
+            self.extra_key_rename_fn = json_formatter_default_extra_key_rename_fn
+        super().__post_init__()
+
+    def _get_key_name(self, key: str) -> str | None:
+        # (cached because include/exclude/rename are quite expensive)
+        try:
+            return self._key_names[key]
+        except KeyError:
+            res = self._make_extra_key_name(key)
+            if len(self._key_names) < 10000:
+                self._key_names[key] = res
+            return res
+
+    def _make_kvs(self, record: logging.LogRecord) -> list[tuple[str, Any]]:
+        kvs: list[tuple[str, Any]] = []
+        for k in list(getattr(record, STLOG_EXTRA_KEY, ())) + list(
+            self.include_reserved_attrs_in_extras
+        ):
+            key = self._get_key_name(k)
+            if key:
+                kvs.append((key, getattr(record, k)))
+        if self.exc_fingerprint_key and record.exc_info and record.exc_info[0]:
+            kvs.append(
+                (self.exc_fingerprint_key, exception_fingerprint(*record.exc_info))
+            )
+        return kvs
+
+    def format(self, record: logging.LogRecord) -> str:
+        raise StlogError(
+            "BinaryFormatter can only be used with a BinaryFileOutput (see encode())"
+        )
+
+    def _make_flags(self, record: logging.LogRecord) -> tuple[int, str | None]:
+        # => (flags, formatted exception)
+        flags = 0
+        exc_text: str | None = None
+        if record.exc_info:
+            exc_text = self.formatException(record.exc_info)
+        elif record.exc_text:
+            exc_text = record.exc_text
+        if exc_text:
+            flags |= _FLAG_EXC_INFO
+        if record.stack_info:
+            flags |= _FLAG_STACK_INFO
+        if self.include_source:
+            flags |= _FLAG_SOURCE
+        return flags, exc_text
+
+    def encode(self, record: logging.LogRecord, state: SegmentState) -> bytes:
+        """Encode a record as bytes (string table frames + record frame).
+
+        The segment state is updated only if the encoding succeeds.
+        """
+        out = bytearray()
+        strings = state.strings
+        new_strings: dict[str, int] = {}
+
+        def ref(value: str) -> int:
+            try:
+                return strings[value]
+            except KeyError:
+                index = new_strings.get(value)
+                if index is not None:
+                    return index
+                index = len(strings) + len(new_strings)
+                new_strings[value] = index
+                payload = bytearray((_STRING,))
+                _write_varint(payload, index)
+                payload += value.encode("utf-8", errors="replace")
+                _write_varint(out, len(payload))
+                out.extend(payload)
+                return index
+
+        flags, exc_text = self._make_flags(record)
+        time_us = round(record.created * 1_000_000)
+        payload = bytearray((_RECORD,))
+        _write_varint(payload, _zigzag(time_us - state.last_time_us))
+        _write_varint(payload, record.levelno)
+        _write_varint(payload, ref(record.levelname))
+        _write_varint(payload, ref(record.name))
+        _write_varint(payload, flags)
+        _write_str(payload, record.getMessage())
+        if flags & _FLAG_SOURCE:
+            for attr, is_str in _SOURCE_ATTRS:
+                value = getattr(record, attr)
+                _write_varint(payload, ref(value or "") if is_str else value or 0)
+        if exc_text:
+            _write_str(payload, exc_text)
+        if record.stack_info:
+            _write_str(payload, self.formatStack(record.stack_info))
+        kvs = self._make_kvs(record)
+        _write_varint(payload, len(kvs))
+        for key, value in kvs:
+            _write_varint(payload, ref(key))
+            _write_value(payload, value)
+        _write_varint(out, len(payload))
+        out += payload
+        strings.update(new_strings)
+        state.last_time_us = time_us
+        return bytes(out)
+
+
+class BinaryFileHandler(logging.handlers.RotatingFileHandler):
+    """A (optionally rotating) file handler for the compact binary output.
+
+    Each file (or each reopening in append mode) starts a new segment. After a write
+    error, the file is truncated back to the end of the last complete frame (if
+    possible) and a new segment is started (as the file does not match the encoder
+    state anymore).
+    """
+
+    terminator = b""  # type: ignore
+    # (the base class is typed for text streams only)
+    stream: IO[bytes] | None  # type: ignore[assignment]
+
+    def __init__(
+        self,
+        filename: str,
+        mode: str = "a",
+        maxBytes: int = 0,  # noqa: N803
+        backupCount: int = 0,  # noqa: N803
+        delay: bool = False,
+    ):
+        self._state = SegmentState()
+        self._segment_started = False
+        super().__init__(
+            filename, mode="a", maxBytes=maxBytes, backupCount=backupCount, delay=True
+        )
+        self.mode = "wb" if "w" in mode else "ab"
+        if not delay:
+            self.stream = self._open()
+
+    def _open(self) -> IO[bytes]:  # type: ignore
+        stream = open(self.baseFilename, self.mode)
+        # (the next writes must be in "append" mode to not truncate again on rotation)
+        self.mode = "ab"
+        self._state = SegmentState()
+        self._segment_started = False
+        return stream
+
+    def format(self, record: logging.LogRecord) -> bytes:  # type: ignore
+        formatter = self.formatter
+        if not isinstance(formatter, BinaryFormatter):
+            raise StlogError("BinaryFileHandler must be used with a BinaryFormatter")
+        return formatter.encode(record, self._state)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            data = self.format(record)
+            if (
+                self.maxBytes > 0
+                and self._segment_started
+                and self.stream.tell() + len(data) >= self.maxBytes
+            ):
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+                data = self.format(record)  # new segment => new string table
+            position = self.stream.tell()
+            try:
+                if not self._segment_started:
+                    self.stream.write(_SEGMENT_FRAME)
+                    self._segment_started = True
+                self.stream.write(data)
+                self.flush()
+            except Exception:
+                self._abort_segment(position)
+                raise
+        except Exception:
+            self.handleError(record)
+
+    def _abort_segment(self, position: int) -> None:
+        # (the stream is reopened, with a new segment, by the next emit)
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            with contextlib.suppress(Exception):
+                stream.close()
+        with contextlib.suppress(OSError):
+            os.truncate(self.baseFilename, position)
+
+
+def _read_value(buf: bytes, pos: int) -> tuple[Any, int]:  # noqa: PLR0911
+    tag = buf[pos]
+    pos += 1
+    if tag == _T_STR:
+        return _read_str(buf, pos)
+    elif tag == _T_INT:
+        value, pos = _read_varint(buf, pos)
+        return _unzigzag(value), pos
+    elif tag == _T_FLOAT:
+        return _DOUBLE.unpack_from(buf, pos)[0], pos + 8
+    elif tag == _T_TRUE:
+        return True, pos
+    elif tag == _T_FALSE:
+        return False, pos
+    elif tag == _T_NONE:
+        return None, pos
+    elif tag == _T_JSON:
+        text, pos = _read_str(buf, pos)
+        return json.loads(text), pos
+    raise StlogError(f"unknown value type: {tag}")
+
+
+class BinaryDecoder:
+    """Streaming decoder of the compact binary output.
+
+    Data can be fed in arbitrary chunks (partial frames are kept until they are completed).
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._strings: list[str] = []
+        self._last_time_us = 0
+        self._segment_started = False
+
+    def feed(self, data: bytes) -> list[LogEntry]:
+        """Feed a chunk of data and return decoded entries."""
+        buf = self._buffer
+        buf += data
+        res: list[LogEntry] = []
+        pos = 0
+        length = len(buf)
+        while pos < length:
+            try:
+                size, start = _read_varint(buf, pos)
+            except IndexError:
+                break  # partial length
+            end = start + size
+            if end > length:
+                break  # partial frame
+            entry = self._decode_frame(bytes(buf[start:end]))
+            if entry is not None:
+                res.append(entry)
+            pos = end
+        del buf[0:pos]
+        return res
+
+    def _decode_frame(self, frame: bytes) -> LogEntry | None:
+        frame_type = frame[0]
+        if frame_type == _SEGMENT:
+            if frame[1:-1] != BINARY_MAGIC:
+                raise StlogError("bad stlog binary segment")
+            if frame[-1] > VERSION:
+                raise StlogError(f"unsupported stlog binary version: {frame[-1]}")
+            self._strings = []
+            self._last_time_us = 0
+            self._segment_started = True
+            return None
+        if not self._segment_started:
+            raise StlogError("not a stlog binary stream")
+        if frame_type == _STRING:
+            index, pos = _read_varint(frame, 1)
+            if index != len(self._strings):
+                raise StlogError("corrupted stlog binary string table")
+            self._strings.append(frame[pos:].decode("utf-8", errors="replace"))
+            return None
+        if frame_type == _RECORD:
+            return self._decode_record(frame)
+        raise StlogError(f"unknown stlog binary frame type: {frame_type}")
+
+    def _decode_record(self, frame: bytes) -> LogEntry:
+        strings = self._strings
+        delta, pos = _read_varint(frame, 1)
+        self._last_time_us += _unzigzag(delta)
+        _, pos = _read_varint(frame, pos)  # levelno (the level name is used)
+        level, pos = _read_varint(frame, pos)
+        logger, pos = _read_varint(frame, pos)
+        flags, pos = _read_varint(frame, pos)
+        message, pos = _read_str(frame, pos)
+        entry = LogEntry(
+            time=self._last_time_us / 1_000_000,
+            level=strings[level],
+            logger=strings[logger],
+            message=message,
+        )
+        if flags & _FLAG_SOURCE:
+            source: dict[str, Any] = {}
+            for attr, is_str in _SOURCE_ATTRS:
+                value, pos = _read_varint(frame, pos)
+                source[_RECORD_ATTR_TO_SOURCE_KEY.get(attr, attr)] = (
+                    strings[value] if is_str else value
+                )
+            entry.source = source
+        if flags & _FLAG_EXC_INFO:
+            entry.exc_info, pos = _read_str(frame, pos)
+        if flags & _FLAG_STACK_INFO:
+            entry.stack_info, pos = _read_str(frame, pos)
+        count, pos = _read_varint(frame, pos)
+        extras: dict[str, Any] = {}
+        for _ in range(count):
+            key, pos = _read_varint(frame, pos)
+            extras[strings[key]], pos = _read_value(frame, pos)
+        entry.extras = extras
+        return entry
+
+
+def is_binary(fileobj: IO[bytes]) -> bool:
+    """Return True if the given (buffered) binary file object starts with a stlog binary segment."""
+    peek = getattr(fileobj, "peek", None)
+    if peek is None:
+        return False
+    return peek(len(_SEGMENT_FRAME))[0 : len(_SEGMENT_FRAME) - 1] == _SEGMENT_FRAME[:-1]
+
+
+def read_binary(
+    fileobj: IO[bytes],
+    entry_filter: EntryFilter | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[LogEntry]:
+    """Read (and filter) `LogEntry` objects from a binary file object.
+
+    Note: an incomplete last frame (crash during a write...) is ignored.
+    """
+    decoder = BinaryDecoder()
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        for entry in decoder.feed(chunk):
+            if entry_filter is None or entry_filter.match(entry):
+                yield entry
@@ -0,0 +1,207 @@
+"""On-the-fly gzip compressed file output.
+
+Log lines are written through a streaming gzip compressor (stdlib `zlib`). The
+compressor is "sync flushed" periodically (see `flush_interval`, by a lazily started
+daemon thread, so during quiet periods too) so the file is always decodable up to the
+last flush (even if the process is killed and the gzip
+trailer is never written).
+
+Each opening of the file (and each rotation) starts a new gzip member, so the files
+can be read with standard tools (`zcat`, `gzip -dc`...) or with `python -m stlog`
+(which also accepts truncated files).
+"""
+
+from __future__ import annotations
+
+import logging
+import logging.handlers
+import os
+import time
+import weakref
+import zlib
+from typing import IO
+
+from stlog.base import StlogError
+from stlog.batch import _Flusher
+
+GZIP_MAGIC = b"\x1f\x8b"
+DEFAULT_COMPRESS_LEVEL = 6
+DEFAULT_FLUSH_INTERVAL = 1.0
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+_HANDLERS: weakref.WeakSet[CompressedFileHandler] = weakref.WeakSet()
+
+
+class CompressedFileHandler(logging.handlers.RotatingFileHandler):
+    """A (optionally rotating) file handler which gzip-compresses its output on the fly.
+
+    Rotation can be triggered by the size of the compressed file (`maxBytes`, checked
+    approximately as the compressor buffers some data) and/or by its age
+    (`rotationInterval` in seconds).
+    """
+
+    terminator = "\n"
+    # (the base class is typed for text streams only)
+    stream: IO[bytes] | None  # type: ignore[assignment]
+
+    def __init__(  # noqa: PLR0913
+        self,
+        filename: str,
+        mode: str = "a",
+        maxBytes: int = 0,  # noqa: N803
+        backupCount: int = 0,  # noqa: N803
+        encoding: str | None = None,
+        delay: bool = False,
+        errors: str | None = None,
+        compressLevel: int = DEFAULT_COMPRESS_LEVEL,  # noqa: N803
+        flushInterval: float = DEFAULT_FLUSH_INTERVAL,  # noqa: N803
+        rotationInterval: float = 0,  # noqa: N803
+    ):
+        if not (0 <= compressLevel <= 9):
+            raise StlogError(f"bad compress level: {compressLevel} (must be in 0..9)")
+        self.compress_level = compressLevel
+        self.flush_interval = flushInterval
+        self.rotation_interval = rotationInterval
+        self._compressor = self._make_compressor()
+        self._last_flush = time.monotonic()
+        self._dirty = False
+        self._flusher: _Flusher | None = None
+        self._rollover_at = 0.0
+        self._text_encoding = encoding or "utf-8"
+        self._text_errors = errors or "strict"
+        super().__init__(
+            filename, mode="a", maxBytes=maxBytes, backupCount=backupCount, delay=True
+        )
+        self.mode = "wb" if "w" in mode else "ab"
+        if not delay:
+            self.stream = self._open()
+        _HANDLERS.add(self)
+
+    def _make_compressor(self):
+        return zlib.compressobj(self.compress_level, zlib.DEFLATED, _GZIP_WBITS)
+
+    def _open(self) -> IO[bytes]:  # type: ignore
+        stream = open(self.baseFilename, self.mode)
+        # (the next writes must be in "append" mode to not truncate again on rotation)
+        self.mode = "ab"
+        self._compressor = self._make_compressor()
+        self._last_flush = time.monotonic()
+        self._dirty = False
+        if self.rotation_interval > 0:
+            self._rollover_at = time.time() + self.rotation_interval
+        return stream
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:  # noqa: N802
+        if self.stream is None:
+            return False
+        if self.rotation_interval > 0 and time.time() >= self._rollover_at:
+            return True
+        return self.maxBytes > 0 and self.stream.tell() >= self.maxBytes
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            msg = self.format(record) + self.terminator
+            data = self._compressor.compress(
+                msg.encode(self._text_encoding, self._text_errors)
+            )
+            if data:
+                self.stream.write(data)
+            self._dirty = True
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+            elif self._flusher is None and self.flush_interval > 0:
+                self._flusher = _Flusher(self)  # type: ignore
+                self._flusher.start()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        """Sync flush the compressor (the file is decodable up to this point)."""
+        self.acquire()
+        try:
+            if self._dirty and self.stream is not None and not self.stream.closed:
+                self.stream.write(self._compressor.flush(zlib.Z_SYNC_FLUSH))
+                self.stream.flush()
+                self._dirty = False
+            self._last_flush = time.monotonic()
+        finally:
+            self.release()
+
+    def _close_stream(self) -> None:
+        if self.stream is not None:
+            if not self.stream.closed:
+                # end of the gzip member (with its trailer)
+                self.stream.write(self._compressor.flush(zlib.Z_FINISH))
+                self.stream.flush()
+                self.stream.close()
+            self.stream = None
+
+    def doRollover(self) -> None:  # noqa: N802
+        self._close_stream()
+        super().doRollover()
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            self._close_stream()
+            if self._flusher is not None:
+                self._flusher.stop_event.set()
+                self._flusher = None
+        finally:
+            self.release()
+        super().close()
+
+
+def _after_fork_in_child() -> None:
+    # the flusher threads do not exist anymore in the child process
+    for handler in list(_HANDLERS):
+        handler._flusher = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def is_gzip(fileobj: IO[bytes]) -> bool:
+    """Return True if the given (buffered) binary file object starts with a gzip header."""
+    peek = getattr(fileobj, "peek", None)
+    if peek is None:
+        return False
+    return peek(len(GZIP_MAGIC))[0 : len(GZIP_MAGIC)] == GZIP_MAGIC
+
+
+class GzipReader:
+    """Minimal file-like object decompressing a (multi-member) gzip stream.
+
+    Contrary to `gzip.GzipFile`, a truncated stream (still written or not properly
+    closed) is not an error: the data is returned up to the last (sync) flush.
+    """
+
+    def __init__(self, fileobj: IO[bytes]):
+        self._fileobj = fileobj
+        self._decompressor = zlib.decompressobj(_GZIP_WBITS)
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            return b"".join(iter(lambda: self.read(65536), b""))
+        while True:
+            chunk = self._fileobj.read(size)
+            if not chunk:
+                return b""
+            res: list[bytes] = []
+            while chunk:
+                res.append(self._decompressor.decompress(chunk))
+                if not self._decompressor.eof:
+                    break
+                # next gzip member (if any)
+                chunk = self._decompressor.unused_data
+                self._decompressor = zlib.decompressobj(_GZIP_WBITS)
+            data = b"".join(res)
+            if data:
+                return data
+
+    def close(self) -> None:
+        self._fileobj.close()
@@ -1,21 +1,29 @@
 from __future__ import annotations
 
 import fnmatch
+import functools
 import json
 import logging
+import os
 import re
 import time
+import traceback
 from dataclasses import dataclass, field
-from typing import Any, Callable, Sequence
+from typing import Any, Callable, Container, Sequence
 
 from stlog.base import (
     GLOBAL_LOGGING_CONFIG,
+    STLOG_CONTEXT_DEF_KEY,
+    STLOG_CONTEXT_REF_KEY,
+    STLOG_CONTEXT_VALUES_KEY,
     STLOG_EXTRA_KEY,
+    exception_fingerprint,
     format_string,
     logfmt_format_value,
     parse_format,
     rich_markup_escape,
 )
+from stlog.context import _LOGGING_CONTEXT_VAR
 from stlog.kvformatter import (
     JsonKVFormatter,
     KVFormatter,
@@ -26,6 +34,7 @@ from stlog.kvformatter import (
 
 DEFAULT_STLOG_HUMAN_FORMAT = "{asctime} {name} [{levelname:^10s}] {message}{extras}"
 DEFAULT_STLOG_RICH_HUMAN_FORMAT = ":arrow_forward: [log.time]{asctime}[/log.time] {name} [{rich_level_style}]{levelname:^8s}[/{rich_level_style}] [bold]{rich_escaped_message}[/bold]{extras}"
+DEFAULT_STLOG_ANSI_HUMAN_FORMAT = "\x1b[2;36m{asctime}\x1b[0m {name} {ansi_level_style}{levelname:^8s}\x1b[0m \x1b[1m{message}\x1b[0m{extras}"
 DEFAULT_STLOG_LOGFMT_FORMAT = (
     "time={asctime} logger={name} level={levelname} message={message}{extras}"
 )
@@ -112,6 +121,9 @@ class Formatter(logging.Formatter):
     _placeholders_in_fmt: list[str] | None = field(
         init=False, default=None, repr=False, compare=False
     )
+    _exc_last_full: dict[str, float] = field(
+        init=False, default_factory=dict, repr=False, compare=False
+    )
 
     def __post_init__(self):
         if self.datefmt is None:
@@ -147,7 +159,10 @@ class Formatter(logging.Formatter):
         return self._placeholders_in_fmt
 
     def _make_extras_string(
-        self, record: logging.LogRecord, extra_kvs: dict[str, Any] | None = None
+        self,
+        record: logging.LogRecord,
+        extra_kvs: dict[str, Any] | None = None,
+        exclude_keys: Container[str] = (),
     ) -> str:
         if self.kv_formatter is None:
             return ""
@@ -157,6 +172,8 @@ class Formatter(logging.Formatter):
         for k in list(getattr(record, STLOG_EXTRA_KEY)) + list(
             self.include_reserved_attrs_in_extras
         ):
+            if k in exclude_keys:
+                continue
             key = self._make_extra_key_name(k)
             if key:
                 kvs[key] = getattr(record, k)
@@ -164,6 +181,44 @@ class Formatter(logging.Formatter):
             kvs.update(extra_kvs)
         return self.kv_formatter.format(kvs)
 
+    def _make_exception_kvs(
+        self,
+        record: logging.LogRecord,
+        exc_info_key: str | None,
+        exc_fingerprint_key: str | None,
+        exc_dedup_window: float,
+    ) -> dict[str, Any]:
+        # exception key/values for "structured" formatters (JSON, LogFmt)
+        res: dict[str, Any] = {}
+        if not record.exc_info:
+            if exc_info_key and record.exc_text:
+                res[exc_info_key] = record.exc_text
+            return res
+        exc_type, exc_value, exc_traceback = record.exc_info
+        if exc_type is None or (not exc_fingerprint_key and exc_dedup_window <= 0):
+            if exc_info_key:
+                res[exc_info_key] = self.formatException(record.exc_info)
+            return res
+        fingerprint = exception_fingerprint(exc_type, exc_value, exc_traceback)
+        if exc_fingerprint_key:
+            res[exc_fingerprint_key] = fingerprint
+        if not exc_info_key:
+            return res
+        if exc_dedup_window > 0:
+            last_full = self._exc_last_full.get(fingerprint)
+            if last_full is not None and record.created - last_full < exc_dedup_window:
+                # already dumped recently => only the exception type and message
+                summary = "".join(
+                    traceback.format_exception_only(exc_type, exc_value)
+                ).strip()
+                res[exc_info_key] = f"{summary} (traceback omitted)"
+                return res
+            if len(self._exc_last_full) >= 10000:
+                self._exc_last_full = {}  # (bounded memory)
+            self._exc_last_full[fingerprint] = record.created
+        res[exc_info_key] = self.formatException(record.exc_info)
+        return res
+
     def _make_extra_key_name(self, extra_key: str) -> str | None:
         new_extra_key: str | None = extra_key
         if self.extra_key_rename_fn is not None:
@@ -206,6 +261,17 @@ class Formatter(logging.Formatter):
             record.msecs = 0
         return super().format(record)
 
+    def format_bytes(self, record: logging.LogRecord) -> bytes:
+        """Format the record to UTF-8 encoded bytes (without line terminator).
+
+        This is the entry point of bytes-native handlers (see `stlog.batch`).
+
+        Note: this is `format()` followed by an UTF-8 encoding (there is no bytes-only
+        formatting path). For `JsonFormatter`, the output is pure ASCII (escaped non-ASCII
+        characters) so the encoding is a plain copy (well under 1% of the formatting time).
+        """
+        return self.format(record).encode("utf-8")
+
 
 # Adapted from https://github.com/Mergifyio/daiquiri/blob/main/daiquiri/formatter.py
 @dataclass
@@ -255,6 +321,22 @@ class HumanFormatter(Formatter):
         return s
 
 
+_RICH_LEVEL_STYLES: dict[str, str] = {
+    "NOTSET": "logging.level.notset",
+    "DEBUG": "logging.level.debug",
+    "INFO": "logging.level.info",
+    "WARNING": "logging.level.error",
+    "ERROR": "logging.level.critical",
+    "CRITICAL": "logging.level.critical",
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def _cached_rich_markup_escape(msg: str) -> str:
+    # (for static messages, so the number of distinct values is bounded)
+    return rich_markup_escape(msg)
+
+
 @dataclass
 class RichHumanFormatter(HumanFormatter):
     def __post_init__(self):
@@ -270,24 +352,34 @@ class RichHumanFormatter(HumanFormatter):
 
     def _add_extras(self, record: logging.LogRecord) -> None:
         super()._add_extras(record)
-        record.rich_escaped_message = rich_markup_escape(record.getMessage())
-        record.rich_escaped_extras = rich_markup_escape(record.extras)  # type: ignore
-        level = record.levelname.lower()
-        if level in ["notset", "debug", "info", "critical"]:
-            record.rich_level_style = f"logging.level.{level}"
-        elif level == "warning":
-            record.rich_level_style = "logging.level.error"
-        elif level == "error":
-            record.rich_level_style = "logging.level.critical"
+        msg = record.msg
+        if not record.args and isinstance(msg, str):
+            # static message (no formatting) => cached escaping
+            record.rich_escaped_message = _cached_rich_markup_escape(msg)
         else:
-            record.rich_level_style = "logging.level.none"
+            record.rich_escaped_message = rich_markup_escape(record.getMessage())
+        if "rich_escaped_extras" in self.placeholders_in_fmt:
+            record.rich_escaped_extras = rich_markup_escape(record.extras)  # type: ignore
+        record.rich_level_style = _RICH_LEVEL_STYLES.get(
+            record.levelname, "logging.level.none"
+        )
 
     def _remove_extras(self, record: logging.LogRecord) -> None:
         delattr(record, "rich_escaped_message")
         delattr(record, "rich_level_style")
-        delattr(record, "rich_escaped_extras")
+        if hasattr(record, "rich_escaped_extras"):
+            delattr(record, "rich_escaped_extras")
         super()._remove_extras(record)
 
+    def format(self, record: logging.LogRecord) -> str:
+        if "extras" in self.placeholders_in_fmt:
+            return super().format(record)
+        # the rich placeholders are also available without {extras}
+        self._add_extras(record)
+        s = Formatter.format(self, record)
+        self._remove_extras(record)
+        return s
+
     def formatException(self, ei):  # noqa: N802
         return ""
 
@@ -295,6 +387,58 @@ class RichHumanFormatter(HumanFormatter):
         return ""
 
 
+# precomputed ANSI escape sequences (same colors as the rich default theme)
+ANSI_RESET = "\x1b[0m"
+ANSI_LEVEL_STYLES: dict[int, str] = {
+    logging.DEBUG: "\x1b[32m",
+    logging.INFO: "\x1b[34m",
+    logging.WARNING: "\x1b[31m",
+    logging.ERROR: "\x1b[1;7;31m",
+    logging.CRITICAL: "\x1b[1;7;31m",
+}
+ANSI_KV_TEMPLATE = "\x1b[33m{key}\x1b[0m\x1b[1;31m=\x1b[0m\x1b[35m{value}\x1b[0m"
+
+
+@dataclass
+class AnsiHumanFormatter(HumanFormatter):
+    """Formatter for a colored "human" output (plain ANSI escape sequences, without rich).
+
+    Escape sequences are precomputed (per level and in the extras template) so the
+    cost is the one of a plain `stlog.formatter.HumanFormatter`. The level style is
+    available through the `{ansi_level_style}` placeholder.
+
+    """
+
+    def __post_init__(self):
+        if self.kv_formatter is None:
+            self.kv_formatter = LogFmtKVFormatter(
+                prefix="\n    \u21aa ", suffix="", template=ANSI_KV_TEMPLATE
+            )
+        if self.fmt is None:
+            self.fmt = DEFAULT_STLOG_ANSI_HUMAN_FORMAT
+        super().__post_init__()
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.ansi_level_style = ANSI_LEVEL_STYLES.get(record.levelno, "")
+        try:
+            return super().format(record)
+        finally:
+            delattr(record, "ansi_level_style")
+
+
+# random token (per process) prefixing the context ids (see `JsonFormatter.context_refs`)
+# (in a list to be replaced in place after a fork)
+_PROCESS_TOKEN = [os.urandom(4).hex()]
+
+
+def _new_process_token() -> None:
+    _PROCESS_TOKEN[0] = os.urandom(4).hex()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_new_process_token)
+
+
 def json_formatter_default_extra_key_rename_fn(key: str) -> str | None:
     """Simple "extra_key_rename" function to remove leading underscores."""
     if key.startswith("_"):
@@ -304,8 +448,24 @@ def json_formatter_default_extra_key_rename_fn(key: str) -> str | None:
 
 @dataclass
 class LogFmtFormatter(Formatter):
+    """Formatter for a LogFmt output.
+
+    Attributes:
+        exc_info_key: the key of the formatted exception (None to ignore exceptions).
+        stack_info_key: the key of the formatted stack (None to ignore stacks).
+        exc_fingerprint_key: if set, the key of the exception fingerprint (same value for
+            the same exception type raised at the same code locations, see
+            `stlog.base.exception_fingerprint`), default to None (no fingerprint).
+        exc_dedup_window: if > 0, the full traceback of an exception is included only
+            the first time per fingerprint in this time window (in seconds), other
+            records only get the exception type and message.
+
+    """
+
     exc_info_key: str | None = "exc_info"
     stack_info_key: str | None = "stack_info"
+    exc_fingerprint_key: str | None = None
+    exc_dedup_window: float = 0
 
     def __post_init__(self):
         if self.kv_formatter is None:
@@ -325,12 +485,12 @@ class LogFmtFormatter(Formatter):
             for k in self.placeholders_in_fmt
             if k != "extras"
         }
-        extra_kvs: dict[str, Any] = {}
-        if self.exc_info_key:
-            if record.exc_info:
-                extra_kvs[self.exc_info_key] = self.formatException(record.exc_info)
-            elif record.exc_text:
-                extra_kvs[self.exc_info_key] = record.exc_text
+        extra_kvs = self._make_exception_kvs(
+            record,
+            self.exc_info_key,
+            self.exc_fingerprint_key,
+            self.exc_dedup_window,
+        )
         if self.stack_info_key and record.stack_info:
             extra_kvs[self.stack_info_key] = self.formatStack(record.stack_info)
         if "extras" in self.placeholders_in_fmt:
@@ -342,13 +502,45 @@ class LogFmtFormatter(Formatter):
 
 @dataclass
 class JsonFormatter(Formatter):
-    """Formatter for a JSON / parsing friendly output."""
+    """Formatter for a JSON / parsing friendly output.
+
+    Attributes:
+        context_refs: if True, the `stlog.LogContext` is dictionary-encoded: each distinct
+            context is written once as a definition line
+            (`{"ctx_def": "3f2a9c1d-1", "ctx_values": {...}}`) and records only carry a
+            reference (`"ctx": "3f2a9c1d-1"`) plus their own extras (see `stlog.reader` to
+            re-expand them). Context ids are prefixed by a random token per process, so
+            several processes can append to the same file. Note: a formatter instance
+            must not be shared between several outputs in this mode.
+        exc_fingerprint_key: if set, the key of the exception fingerprint (same value for
+            the same exception type raised at the same code locations, see
+            `stlog.base.exception_fingerprint`), default to None (no fingerprint).
+        exc_dedup_window: if > 0, the full traceback of an exception is included only
+            the first time per fingerprint in this time window (in seconds), other
+            records only get the exception type and message.
+
+    """
 
     indent: int | None = None
     sort_keys: bool = True
     include_extras_in_key: str | None = ""
     exc_info_key: str | None = "exc_info"
     stack_info_key: str | None = "stack_info"
+    context_refs: bool = False
+    exc_fingerprint_key: str | None = None
+    exc_dedup_window: float = 0
+    _context: Any = field(init=False, default=None, repr=False, compare=False)
+    _context_id: str = field(init=False, default="", repr=False, compare=False)
+    _context_token: str = field(init=False, default="", repr=False, compare=False)
+    _context_ids: dict[str, str] = field(
+        init=False, default_factory=dict, repr=False, compare=False
+    )
+    _context_values: dict[str, dict[str, Any]] = field(
+        init=False, default_factory=dict, repr=False, compare=False
+    )
+    _context_defined: set[str] = field(
+        init=False, default_factory=set, repr=False, compare=False
+    )
 
     def __post_init__(self):
         if self.datefmt is None:
@@ -372,6 +564,64 @@ class JsonFormatter(Formatter):
             default=_truncate_serialize,
         )
 
+    def reset_context_refs(self) -> None:
+        """Forget already written context definitions (for example after a file rotation)."""
+        self._context_defined = set()
+
+    def _get_context_id(self) -> str:
+        if self._context_token is not _PROCESS_TOKEN[0]:
+            # first call or new (forked) process => new context ids
+            self._context_token = _PROCESS_TOKEN[0]
+            self._context = None
+            self._context_ids = {}
+            self._context_values = {}
+            self._context_defined = set()
+        # note: the context dict is replaced (and never modified) at each change
+        # so we can cache the last one by identity
+        context = _LOGGING_CONTEXT_VAR.get()
+        if context is self._context:
+            return self._context_id
+        context_id = ""
+        if context:
+            values: dict[str, Any] = {}
+            for k, v in context.items():
+                key = self._make_extra_key_name(k)
+                if key:
+                    values[key] = v
+            fingerprint = json.dumps(values, sort_keys=True, default=str)
+            context_id = self._context_ids.get(fingerprint, "")
+            if not context_id:
+                if len(self._context_ids) >= 10000:
+                    # let's restart from scratch (bounded memory)
+                    self._context_ids = {}
+                    self._context_values = {}
+                    self._context_defined = set()
+                context_id = f"{self._context_token}-{len(self._context_values) + 1}"
+                self._context_ids[fingerprint] = context_id
+                self._context_values[context_id] = values
+        self._context = context
+        self._context_id = context_id
+        return context_id
+
+    def _get_context_ref(
+        self, record: logging.LogRecord
+    ) -> tuple[str, set[str] | None]:
+        # return the context id and the record extras keys which can be replaced
+        # by the context reference (None if the record does not contain the whole
+        # current context)
+        context_id = self._get_context_id()
+        if not context_id:
+            return "", None
+        extra_keys = getattr(record, STLOG_EXTRA_KEY, ())
+        res: set[str] = set()
+        for k, v in self._context.items():
+            if k not in extra_keys:
+                return "", None
+            if getattr(record, k, None) == v:
+                res.add(k)
+            # else: overridden value => kept in the record
+        return context_id, res
+
     def format(self, record: logging.LogRecord) -> str:
         record.message = record.getMessage()
         if self.usesTime():
@@ -383,8 +633,16 @@ class JsonFormatter(Formatter):
         }
         s = format_string(self.fmt, self.style, record_dict)
         obj = json.loads(s)
+        context_id = ""
+        context_keys: set[str] | None = None
+        if self.context_refs and self.include_extras_in_key is not None:
+            context_id, context_keys = self._get_context_ref(record)
+        if context_keys is not None:
+            obj[STLOG_CONTEXT_REF_KEY] = context_id
         if self.include_extras_in_key is not None:
-            extras_str = self._make_extras_string(record)
+            extras_str = self._make_extras_string(
+                record, exclude_keys=context_keys or ()
+            )
             if extras_str:
                 extras_obj = json.loads(extras_str)
                 if self.include_extras_in_key == "":
@@ -393,11 +651,26 @@ class JsonFormatter(Formatter):
                             obj[key] = value
                 else:
                     obj[self.include_extras_in_key] = extras_obj
-        if self.exc_info_key:
-            if record.exc_info:
-                obj[self.exc_info_key] = self.formatException(record.exc_info)
-            elif record.exc_text:
-                obj[self.exc_info_key] = record.exc_text
+        obj.update(
+            self._make_exception_kvs(
+                record,
+                self.exc_info_key,
+                self.exc_fingerprint_key,
+                self.exc_dedup_window,
+            )
+        )
         if self.stack_info_key and record.stack_info:
             obj[self.stack_info_key] = self.formatStack(record.stack_info)
+        if context_keys is not None and context_id not in self._context_defined:
+            return self._format_context_definition(context_id) + self.json_serialize(
+                obj
+            )
         return self.json_serialize(obj)
+
+    def _format_context_definition(self, context_id: str) -> str:
+        self._context_defined.add(context_id)
+        definition = {
+            STLOG_CONTEXT_DEF_KEY: context_id,
+            STLOG_CONTEXT_VALUES_KEY: self._context_values[context_id],
+        }
+        return self.json_serialize(definition) + "\n"
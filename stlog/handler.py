@@ -1,20 +1,50 @@
 from __future__ import annotations
 
+import collections
+import itertools
 import logging
 import sys
+import types
 
 from stlog.base import (
+    RICH_AVAILABLE,
+    RICH_DUMP_EXCEPTION_ON_CONSOLE_SHOW_LOCALS,
+    exception_fingerprint,
     rich_dump_exception_on_console,
 )
 from stlog.formatter import HumanFormatter, RichHumanFormatter
 
-RICH_INSTALLED: bool = False
-try:
-    from rich.console import Console
+RICH_INSTALLED: bool = RICH_AVAILABLE
+DEFAULT_TRACEBACK_DEDUP_WINDOW = 0.0
+DEFAULT_TRACEBACK_CACHE_SIZE = 128
 
-    RICH_INSTALLED = True
-except ImportError:
-    pass
+
+class _SeenTraceback:
+    __slots__ = ("id", "last_full", "messages", "rendered", "repeats")
+
+    def __init__(self, id: int):
+        self.id = id
+        self.repeats = 0
+        self.last_full: float | None = None
+        self.messages: tuple[str, ...] | None = None
+        self.rendered: str | None = None
+
+
+def _exception_messages(value: BaseException) -> tuple[str, ...]:
+    # messages (and notes) of the exception and of its chained exceptions
+    # (not part of the fingerprint but of the rendered traceback)
+    res: list[str] = []
+    seen: set[int] = set()
+    current: BaseException | None = value
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        res.append(f"{type(current).__name__}: {current}")
+        res.extend(str(x) for x in getattr(current, "__notes__", ()))
+        chained = current.__cause__
+        if chained is None and not current.__suppress_context__:
+            chained = current.__context__
+        current = chained
+    return tuple(res)
 
 
 class CustomRichHandler(logging.StreamHandler):
@@ -23,13 +53,38 @@ class CustomRichHandler(logging.StreamHandler):
     If Rich is not installed or if the stream is not a terminal,
     this handler will fallback to the default StreamHandler.
 
+    Rendered tracebacks are cached per exception fingerprint (type and code locations,
+    see `stlog.base.exception_fingerprint`), except when locals are shown (see
+    `RICH_DUMP_EXCEPTION_ON_CONSOLE_SHOW_LOCALS`). If `traceback_dedup_window` is set,
+    the same exception logged again (in a retry loop...) during this window (after a
+    full rendering) is printed as a short "same traceback as #id" line.
+
+    Attributes:
+        traceback_dedup_window: the time window (in seconds) of the deduplication of
+            tracebacks (0 means "no deduplication").
+        traceback_cache_size: the maximum number of remembered tracebacks.
+
     """
 
-    def __init__(self, stream=None, **kwargs):
+    def __init__(
+        self,
+        stream=None,
+        traceback_dedup_window: float = DEFAULT_TRACEBACK_DEDUP_WINDOW,
+        traceback_cache_size: int = DEFAULT_TRACEBACK_CACHE_SIZE,
+        **kwargs,
+    ):
         super().__init__(stream=stream)
+        self.traceback_dedup_window = traceback_dedup_window
+        self.traceback_cache_size = traceback_cache_size
+        self._tracebacks: collections.OrderedDict[str, _SeenTraceback] = (
+            collections.OrderedDict()
+        )
+        self._traceback_ids = itertools.count(1)
         self.console = None
         self.force_terminal = kwargs.get("force_terminal", False)
         if RICH_INSTALLED:
+            from rich.console import Console
+
             # => let's make a rich console
             self.console = Console(
                 file=stream if stream else sys.stderr,
@@ -49,14 +104,69 @@ class CustomRichHandler(logging.StreamHandler):
     def _rich_emit(self, record: logging.LogRecord):
         assert self.console is not None
         assert self.formatter is not None
-        self.console.print(self.formatter.format(record))
+        self.console.print(self.format(record))
         if record.exc_info:
             exc_type, exc_value, exc_traceback = record.exc_info
             assert exc_type is not None
             assert exc_value is not None
+            self._emit_exception(exc_type, exc_value, exc_traceback, record.created)
+
+    def _emit_exception(
+        self,
+        exc_type: type[BaseException],
+        exc_value: BaseException,
+        exc_traceback: types.TracebackType | None,
+        created: float,
+    ) -> None:
+        assert self.console is not None
+        fingerprint = exception_fingerprint(exc_type, exc_value, exc_traceback)
+        seen = self._tracebacks.get(fingerprint)
+        if seen is None:
+            seen = _SeenTraceback(next(self._traceback_ids))
+            self._tracebacks[fingerprint] = seen
+            if len(self._tracebacks) > self.traceback_cache_size:
+                self._tracebacks.popitem(last=False)
+        else:
+            self._tracebacks.move_to_end(fingerprint)
+        window = self.traceback_dedup_window
+        if (
+            window > 0
+            and seen.last_full is not None
+            and created - seen.last_full < window
+        ):
+            seen.repeats += 1
+            self._write_dim(
+                f"    (same traceback as #{seen.id}, repeated {seen.repeats} "
+                f"times in {window:g}s: {exc_type.__name__}: {exc_value})"
+            )
+            return
+        seen.last_full = created
+        seen.repeats = 0
+        if window > 0:
+            self._write_dim(f"    (traceback #{seen.id})")
+        if RICH_DUMP_EXCEPTION_ON_CONSOLE_SHOW_LOCALS:
+            # (locals are different for each occurrence => no cache)
             rich_dump_exception_on_console(
                 self.console, exc_type, exc_value, exc_traceback
             )
+            return
+        # (the rendering includes the messages of the chained exceptions too)
+        messages = _exception_messages(exc_value)
+        if seen.rendered is None or seen.messages != messages:
+            with self.console.capture() as capture:
+                rich_dump_exception_on_console(
+                    self.console, exc_type, exc_value, exc_traceback
+                )
+            seen.rendered = capture.get()
+            seen.messages = messages
+        self.console.file.write(seen.rendered)
+
+    def _write_dim(self, line: str) -> None:
+        # (pre-styled, written directly: no markup parsing and rendering)
+        assert self.console is not None
+        if self.console.color_system is not None:
+            line = f"\x1b[2m{line}\x1b[0m"
+        self.console.file.write(line + "\n")
 
     def emit(self, record: logging.LogRecord):
         if self.console is None or self.formatter is None:
@@ -0,0 +1,489 @@
+from __future__ import annotations
+
+import json
+import logging
+import logging.handlers
+import mmap
+import os
+from dataclasses import dataclass, field
+from typing import IO, Any, Iterator, Sequence
+
+from stlog.base import STLOG_CONTEXT_DEF_KEY, STLOG_EXTRA_KEY
+from stlog.reader import (
+    DEFAULT_CHUNK_SIZE,
+    ContextRefs,
+    EntryFilter,
+    LogEntry,
+    get_levelno,
+    iter_chunk_lines,
+    parse_line,
+    read_entries,
+)
+
+INDEX_SUFFIX = ".idx"
+DEFAULT_BUCKET_SECONDS = 60
+DEFAULT_MAX_BLOCK_BYTES = 1024 * 1024
+DEFAULT_MAX_VALUES_PER_KEY = 256
+
+
+def get_index_path(log_path: str) -> str:
+    """Get the sidecar index path of a log file."""
+    return log_path + INDEX_SUFFIX
+
+
+@dataclass
+class IndexBlock:
+    """A contiguous range of lines of a log file (and a summary of its entries).
+
+    Attributes:
+        start: offset (in bytes) of the first line.
+        end: offset (in bytes) after the last line.
+        count: number of entries.
+        tmin: minimal timestamp (epoch), None if no timestamp.
+        tmax: maximal timestamp (epoch), None if no timestamp.
+        levelmax: maximal level (int).
+        levels: level names in the block.
+        extras: dict "indexed extras key => values (as str) in the block" (None as values
+            means "too many values to be indexed").
+        context_defs: True if the block contains dictionary-encoded context definitions
+            (see `stlog.formatter.JsonFormatter.context_refs`), such a block is always read.
+
+    """
+
+    start: int
+    end: int = 0
+    count: int = 0
+    tmin: float | None = None
+    tmax: float | None = None
+    levelmax: int = logging.NOTSET
+    levels: set[str] = field(default_factory=set)
+    extras: dict[str, set[str] | None] = field(default_factory=dict)
+    context_defs: bool = False
+
+    def add(self, end: int, time: float | None, level: str, levelno: int) -> None:
+        self.end = end
+        self.count += 1
+        if time is not None:
+            if self.tmin is None or time < self.tmin:
+                self.tmin = time
+            if self.tmax is None or time > self.tmax:
+                self.tmax = time
+        self.levelmax = max(self.levelmax, levelno)
+        self.levels.add(level)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "start": self.start,
+                "end": self.end,
+                "count": self.count,
+                "tmin": self.tmin,
+                "tmax": self.tmax,
+                "levelmax": self.levelmax,
+                "levels": sorted(self.levels),
+                "extras": {
+                    k: sorted(v) if v is not None else None
+                    for k, v in self.extras.items()
+                },
+                "context_defs": self.context_defs,
+            },
+            sort_keys=True,
+        )
+
+    @classmethod
+    def from_dict(cls, dct: dict[str, Any]) -> IndexBlock:
+        return cls(
+            start=dct["start"],
+            end=dct["end"],
+            count=dct.get("count", 0),
+            tmin=dct.get("tmin"),
+            tmax=dct.get("tmax"),
+            levelmax=dct.get("levelmax", logging.CRITICAL),
+            levels=set(dct.get("levels", [])),
+            extras={
+                k: set(v) if v is not None else None
+                for k, v in dct.get("extras", {}).items()
+            },
+            context_defs=dct.get("context_defs", False),
+        )
+
+    def may_match(self, entry_filter: EntryFilter) -> bool:
+        """Return False if no entry of the block can match the given filter."""
+        if self.context_defs:
+            return True
+        levelno = entry_filter._levelno
+        if levelno is not None and self.levelmax < levelno:
+            return False
+        if entry_filter.since is not None and (
+            self.tmax is not None and self.tmax < entry_filter.since
+        ):
+            return False
+        if entry_filter.until is not None and (
+            self.tmin is not None and self.tmin >= entry_filter.until
+        ):
+            return False
+        for key, value in entry_filter.where.items():
+            if key not in self.extras:
+                continue  # not indexed
+            values = self.extras[key]
+            if values is not None and value not in values:
+                return False
+        return True
+
+
+def _value_to_str(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+class IndexBuilder:
+    """Incremental builder of a sidecar index (one JSON line per block).
+
+    Lines of the log file are grouped into blocks (a new block is started when the
+    time bucket changes or when the block is bigger than `max_block_bytes`).
+
+    Attributes:
+        index_path: the path of the index file.
+        extras_keys: extras keys to index (values are indexed as strings).
+        bucket_seconds: time bucket size (in seconds).
+        max_block_bytes: maximum size of a block (in bytes).
+        max_values_per_key: maximum number of distinct values indexed per key and per block.
+        mode: mode to open the index file (`a` or `w`).
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        index_path: str,
+        extras_keys: Sequence[str] = (),
+        bucket_seconds: int = DEFAULT_BUCKET_SECONDS,
+        max_block_bytes: int = DEFAULT_MAX_BLOCK_BYTES,
+        max_values_per_key: int = DEFAULT_MAX_VALUES_PER_KEY,
+        mode: str = "a",
+    ):
+        self.index_path = index_path
+        self.extras_keys = list(extras_keys)
+        self.bucket_seconds = bucket_seconds
+        self.max_block_bytes = max_block_bytes
+        self.max_values_per_key = max_values_per_key
+        self.mode = mode
+        self._block: IndexBlock | None = None
+        self._bucket: int | None = None
+        self._file: IO[str] | None = None
+
+    def _new_block(self, start: int) -> IndexBlock:
+        return IndexBlock(start=start, extras={k: set() for k in self.extras_keys})
+
+    def add(
+        self,
+        start: int,
+        end: int,
+        time: float | None,
+        level: str,
+        extras: dict[str, Any],
+    ) -> None:
+        """Add a line (from `start` to `end` offsets) to the index."""
+        bucket = int(time // self.bucket_seconds) if time is not None else None
+        block = self._block
+        if block is not None and (
+            block.end != start
+            or (bucket is not None and bucket != self._bucket)
+            or block.end - block.start >= self.max_block_bytes
+        ):
+            self.flush()
+            block = None
+        if block is None:
+            block = self._new_block(start)
+            self._block = block
+            self._bucket = bucket
+        block.add(end, time, level, get_levelno(level))
+        if STLOG_CONTEXT_DEF_KEY in extras:
+            block.context_defs = True
+        for key, values in block.extras.items():
+            if values is None or key not in extras:
+                continue
+            values.add(_value_to_str(extras[key]))
+            if len(values) > self.max_values_per_key:
+                block.extras[key] = None
+
+    def flush(self) -> None:
+        """Write the current block (if any) in the index file."""
+        if self._block is None or self._block.count == 0:
+            return
+        if self._file is None:
+            self._file = open(self.index_path, self.mode, encoding="utf-8")
+        self._file.write(self._block.to_json() + "\n")
+        self._file.flush()
+        self._block = None
+        self._bucket = None
+
+    def close(self) -> None:
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def load_index(index_path: str) -> list[IndexBlock]:
+    """Load a sidecar index (sorted by offsets, invalid lines are ignored)."""
+    blocks: list[IndexBlock] = []
+    if not os.path.exists(index_path):
+        return blocks
+    with open(index_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                blocks.append(IndexBlock.from_dict(json.loads(line)))
+            except (ValueError, KeyError, TypeError):
+                continue
+    blocks.sort(key=lambda x: x.start)
+    return blocks
+
+
+def build_index(
+    log_path: str,
+    extras_keys: Sequence[str] = (),
+    bucket_seconds: int = DEFAULT_BUCKET_SECONDS,
+    max_block_bytes: int = DEFAULT_MAX_BLOCK_BYTES,
+    input_format: str = "auto",
+) -> str:
+    """Build (after the fact) the sidecar index of a stlog JSON or logfmt log file.
+
+    Returns:
+        The path of the index file.
+
+    """
+    index_path = get_index_path(log_path)
+    builder = IndexBuilder(
+        index_path,
+        extras_keys=extras_keys,
+        bucket_seconds=bucket_seconds,
+        max_block_bytes=max_block_bytes,
+        mode="w",
+    )
+    context_refs = ContextRefs()
+    offset = 0
+    tail = b""
+    try:
+        with open(log_path, "rb") as f:
+            while True:
+                chunk = f.read(DEFAULT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                data = tail + chunk
+                lines = data.split(b"\n")
+                tail = lines.pop()
+                for line in lines:
+                    end = offset + len(line) + 1
+                    entry = parse_line(
+                        line.decode("utf-8", errors="replace"), input_format
+                    )
+                    if entry is not None:
+                        # (context definitions are kept in extras)
+                        context_refs.process(entry)
+                        builder.add(
+                            offset,
+                            end,
+                            entry.time,
+                            entry.level,
+                            entry.extras,
+                        )
+                    offset = end
+    finally:
+        builder.close()
+    if not os.path.exists(index_path):
+        # empty log file => empty index
+        open(index_path, "w").close()
+    return index_path
+
+
+def _candidate_ranges(
+    blocks: list[IndexBlock], size: int, entry_filter: EntryFilter
+) -> list[tuple[int, int]]:
+    """Return the (merged) byte ranges to scan: matching blocks and not indexed gaps."""
+    ranges: list[tuple[int, int]] = []
+    position = 0
+    for block in blocks:
+        if block.end > size or block.start < position:
+            # stale or overlapping block => let's scan it
+            continue
+        if block.start > position:
+            ranges.append((position, block.start))  # not indexed gap
+        if block.may_match(entry_filter):
+            ranges.append((block.start, block.end))
+        position = block.end
+    if position < size:
+        ranges.append((position, size))  # not indexed tail
+    merged: list[tuple[int, int]] = []
+    for start, end in ranges:
+        if merged and merged[-1][1] == start:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _iter_range_chunks(
+    mm: mmap.mmap, start: int, end: int, chunk_size: int
+) -> Iterator[bytes]:
+    for position in range(start, end, chunk_size):
+        yield mm[position : min(position + chunk_size, end)]
+
+
+def read_indexed_file(
+    log_path: str,
+    input_format: str = "auto",
+    entry_filter: EntryFilter | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[LogEntry]:
+    """Read (and filter) `LogEntry` objects of a log file with its sidecar index.
+
+    Only blocks of the index which can match the filter (and not indexed parts of
+    the log file) are read (through `mmap`, by chunks of `chunk_size` bytes).
+    """
+    if entry_filter is None:
+        entry_filter = EntryFilter()
+    blocks = load_index(get_index_path(log_path))
+    with open(log_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        # (context definitions must be kept between ranges)
+        context_refs = ContextRefs()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start, end in _candidate_ranges(blocks, size, entry_filter):
+                chunks = _iter_range_chunks(mm, start, end, chunk_size)
+                lines = iter_chunk_lines(chunks)
+                yield from read_entries(lines, input_format, entry_filter, context_refs)
+
+
+class _IndexingMixin:
+    """Mixin for file handlers to update a sidecar index when writing records."""
+
+    _index_builder: IndexBuilder
+    _index_offset: int | None = None
+
+    def _init_index(
+        self,
+        extras_keys: Sequence[str],
+        bucket_seconds: int,
+        max_block_bytes: int,
+        mode: str,
+    ) -> None:
+        self._index_builder = IndexBuilder(
+            get_index_path(self.baseFilename),  # type: ignore
+            extras_keys=extras_keys,
+            bucket_seconds=bucket_seconds,
+            max_block_bytes=max_block_bytes,
+            mode="w" if "w" in mode else "a",
+        )
+
+    def _emit_and_index(self, record: logging.LogRecord) -> None:
+        # note: called with the handler lock held
+        handler: Any = self
+        if handler.stream is None:
+            handler.stream = handler._open()
+        stream = handler.stream
+        if self._index_offset is None:
+            stream.flush()
+            self._index_offset = stream.buffer.seek(0, os.SEEK_END)
+        msg = handler.format(record)
+        stream.write(msg + handler.terminator)
+        handler.flush()
+        end = stream.buffer.tell()
+        extras: dict[str, Any] = {}
+        extra_keys = getattr(record, STLOG_EXTRA_KEY, ())
+        for key in self._index_builder.extras_keys:
+            if key in extra_keys:
+                extras[key] = getattr(record, key)
+        if STLOG_CONTEXT_DEF_KEY in msg:
+            extras[STLOG_CONTEXT_DEF_KEY] = True
+        start = self._index_offset
+        self._index_offset = end
+        self._index_builder.add(
+            start,
+            end,
+            record.created,
+            record.levelname,
+            extras,
+        )
+
+
+class IndexedFileHandler(_IndexingMixin, logging.FileHandler):
+    """A `logging.FileHandler` which also writes a sidecar index (see `stlog.index`)."""
+
+    def __init__(
+        self,
+        filename: str,
+        mode: str = "a",
+        extras_keys: Sequence[str] = (),
+        bucket_seconds: int = DEFAULT_BUCKET_SECONDS,
+        max_block_bytes: int = DEFAULT_MAX_BLOCK_BYTES,
+        **kwargs,
+    ):
+        super().__init__(filename, mode=mode, **kwargs)
+        self._init_index(extras_keys, bucket_seconds, max_block_bytes, mode)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self._emit_and_index(record)
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            self._index_builder.close()
+        finally:
+            self.release()
+        super().close()
+
+
+class IndexedRotatingFileHandler(_IndexingMixin, logging.handlers.RotatingFileHandler):
+    """A `logging.handlers.RotatingFileHandler` which also writes (and rotates) a sidecar index."""
+
+    def __init__(
+        self,
+        filename: str,
+        mode: str = "a",
+        extras_keys: Sequence[str] = (),
+        bucket_seconds: int = DEFAULT_BUCKET_SECONDS,
+        max_block_bytes: int = DEFAULT_MAX_BLOCK_BYTES,
+        **kwargs,
+    ):
+        super().__init__(filename, mode=mode, **kwargs)
+        self._init_index(extras_keys, bucket_seconds, max_block_bytes, mode)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            self._emit_and_index(record)
+        except Exception:
+            self.handleError(record)
+
+    def doRollover(self) -> None:  # noqa: N802
+        self._index_builder.close()
+        self._index_offset = None
+        if self.backupCount > 0:
+            for i in range(self.backupCount - 1, 0, -1):
+                sfn = get_index_path(self.rotation_filename(f"{self.baseFilename}.{i}"))
+                dfn = get_index_path(
+                    self.rotation_filename(f"{self.baseFilename}.{i + 1}")
+                )
+                if os.path.exists(sfn):
+                    os.replace(sfn, dfn)
+            dfn = get_index_path(self.rotation_filename(self.baseFilename + ".1"))
+            if os.path.exists(self._index_builder.index_path):
+                os.replace(self._index_builder.index_path, dfn)
+        elif os.path.exists(self._index_builder.index_path):
+            os.remove(self._index_builder.index_path)
+        super().doRollover()
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            self._index_builder.close()
+        finally:
+            self.release()
+        super().close()
@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from stlog.adapter import getLogger
+from stlog.base import GLOBAL_LOGGING_CONFIG
+
+_HISTOGRAM_BUCKETS = 65
+
+
+class Histogram:
+    """Cheap log2 histogram of durations (in nanoseconds).
+
+    The bucket `i` counts values `v` with `v.bit_length() == i`,
+    i.e. `2**(i-1) <= v < 2**i`.
+    """
+
+    __slots__ = ("buckets", "count", "max", "total")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.count: int = 0
+        self.total: int = 0
+        self.max: int = 0
+        self.buckets: list[int] = [0] * _HISTOGRAM_BUCKETS
+
+    def add(self, value: int) -> None:
+        value = max(value, 0)
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.buckets[min(value.bit_length(), _HISTOGRAM_BUCKETS - 1)] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ns": self.total,
+            "avg_ns": self.total // self.count if self.count else 0,
+            "max_ns": self.max,
+            # upper bound (excluded) in ns (as str to be JSON friendly) => count
+            "buckets": {
+                str(1 << i): count for i, count in enumerate(self.buckets) if count
+            },
+        }
+
+
+@dataclass
+class BackpressureStats:
+    """Backpressure metrics of a non-blocking output (see `stlog.batch.NonBlockingFdHandler`).
+
+    Attributes:
+        backlog_bytes: number of bytes currently waiting in the in-memory backlog.
+        max_backlog_bytes: high watermark of `backlog_bytes`.
+        stalls: number of stalls (the consumer did not accept all the data).
+        stall_time: histogram of the (ended) stall durations.
+        dropped_records: number of records dropped (full backlog).
+        dropped_bytes: number of bytes dropped (full backlog).
+        spilled_records: number of records written to the spill file (full backlog).
+        spilled_bytes: number of bytes written to the spill file (full backlog).
+
+    """
+
+    backlog_bytes: int = 0
+    max_backlog_bytes: int = 0
+    stalls: int = 0
+    stall_time: Histogram = field(default_factory=Histogram)
+    dropped_records: int = 0
+    dropped_bytes: int = 0
+    spilled_records: int = 0
+    spilled_bytes: int = 0
+
+    def reset(self) -> None:
+        # note: backlog_bytes is a state (not a counter)
+        self.max_backlog_bytes = self.backlog_bytes
+        self.stalls = 0
+        self.stall_time.reset()
+        self.dropped_records = 0
+        self.dropped_bytes = 0
+        self.spilled_records = 0
+        self.spilled_bytes = 0
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "backlog_bytes": self.backlog_bytes,
+            "max_backlog_bytes": self.max_backlog_bytes,
+            "stalls": self.stalls,
+            "stall_time": self.stall_time.snapshot(),
+            "dropped_records": self.dropped_records,
+            "dropped_bytes": self.dropped_bytes,
+            "spilled_records": self.spilled_records,
+            "spilled_bytes": self.spilled_bytes,
+        }
+
+
+@dataclass
+class FilePoolStats:
+    """Open file handles pool metrics (see `stlog.partition.PartitionedFileHandler`).
+
+    Attributes:
+        open_files: number of currently open files.
+        max_open_files: high watermark of `open_files`.
+        hits: number of records written to an already open file.
+        misses: number of records which needed to open a file.
+        evictions: number of files closed to respect the maximum number of open files.
+
+    """
+
+    open_files: int = 0
+    max_open_files: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    def reset(self) -> None:
+        # note: open_files is a state (not a counter)
+        self.max_open_files = self.open_files
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "open_files": self.open_files,
+            "max_open_files": self.max_open_files,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+@dataclass
+class OutputStats:
+    """Self-metrics of an `stlog.output.Output`.
+
+    Counters are updated without any lock (they can be slightly off under
+    heavy multi-threading but they never slow down the logging).
+
+    Attributes:
+        emitted: number of records emitted (passed to the handler `emit()`).
+        filtered: number of records rejected by the output filters.
+        bytes_written: number of characters produced by the formatter (including
+            the line terminator).
+        errors: number of errors (calls to the handler `handleError()`).
+        format_time: histogram of the formatting durations.
+        write_time: histogram of the write durations (emit without formatting).
+        lock_wait: histogram of the handler lock acquisition durations.
+        backpressure: backpressure metrics (only for non-blocking outputs).
+        file_pool: open file handles pool metrics (only for partitioned file outputs).
+
+    """
+
+    emitted: int = 0
+    filtered: int = 0
+    bytes_written: int = 0
+    errors: int = 0
+    format_time: Histogram = field(default_factory=Histogram)
+    write_time: Histogram = field(default_factory=Histogram)
+    lock_wait: Histogram = field(default_factory=Histogram)
+    backpressure: BackpressureStats | None = None
+    file_pool: FilePoolStats | None = None
+
+    def reset(self) -> None:
+        self.emitted = 0
+        self.filtered = 0
+        self.bytes_written = 0
+        self.errors = 0
+        self.format_time.reset()
+        self.write_time.reset()
+        self.lock_wait.reset()
+        if self.backpressure is not None:
+            self.backpressure.reset()
+        if self.file_pool is not None:
+            self.file_pool.reset()
+
+    def snapshot(self) -> dict[str, Any]:
+        res = {
+            "emitted": self.emitted,
+            "filtered": self.filtered,
+            "bytes_written": self.bytes_written,
+            "errors": self.errors,
+            "format_time": self.format_time.snapshot(),
+            "write_time": self.write_time.snapshot(),
+            "lock_wait": self.lock_wait.snapshot(),
+        }
+        if self.backpressure is not None:
+            res["backpressure"] = self.backpressure.snapshot()
+        if self.file_pool is not None:
+            res["file_pool"] = self.file_pool.snapshot()
+        return res
+
+
+class _TimedLock:
+    """Proxy of a handler lock which measures the acquisition durations.
+
+    The lock itself is wrapped (and not `Handler.acquire()`) as `Handler.handle()`
+    uses `with self.lock:` directly since python 3.13.
+    """
+
+    def __init__(self, lock: Any, histogram: Histogram):
+        self._lock = lock
+        self._histogram = histogram
+
+    def acquire(self, *args: Any, **kwargs: Any) -> bool:
+        before = time.perf_counter_ns()
+        rv = self._lock.acquire(*args, **kwargs)
+        self._histogram.add(time.perf_counter_ns() - before)
+        return rv
+
+    def release(self) -> None:
+        self._lock.release()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *args: Any) -> None:
+        self._lock.release()
+
+    def __getattr__(self, name: str) -> Any:
+        # (for example: _at_fork_reinit())
+        return getattr(self._lock, name)
+
+
+def instrument_handler(handler: logging.Handler, stats: OutputStats) -> None:
+    """Instrument a logging handler (instance) to update the given stats.
+
+    Note: the handler methods (and lock) are overridden at the instance level, so
+    non-instrumented handlers have exactly zero overhead.
+    """
+    perf_counter_ns = time.perf_counter_ns
+    terminator_length = len(getattr(handler, "terminator", ""))
+    orig_handle = handler.handle
+    orig_format = handler.format
+    orig_emit = handler.emit
+    orig_handle_error = handler.handleError
+    orig_format_bytes = getattr(handler, "format_bytes", None)
+
+    def handle(record):
+        rv = orig_handle(record)
+        if not rv:
+            stats.filtered += 1
+        return rv
+
+    def format(record):
+        before = perf_counter_ns()
+        res = orig_format(record)
+        stats.format_time.add(perf_counter_ns() - before)
+        stats.bytes_written += len(res) + terminator_length
+        return res
+
+    def emit(record):
+        format_total_before = stats.format_time.total
+        before = perf_counter_ns()
+        orig_emit(record)
+        elapsed = perf_counter_ns() - before
+        stats.write_time.add(elapsed - (stats.format_time.total - format_total_before))
+        stats.emitted += 1
+
+    def handle_error(record):
+        stats.errors += 1
+        orig_handle_error(record)
+
+    handler.handle = handle  # type: ignore
+    handler.format = format  # type: ignore
+    if orig_format_bytes is not None:
+        # bytes-native handler (see `stlog.batch`)
+
+        def format_bytes(record):
+            before = perf_counter_ns()
+            res = orig_format_bytes(record)
+            stats.format_time.add(perf_counter_ns() - before)
+            stats.bytes_written += len(res) + terminator_length
+            return res
+
+        handler.format_bytes = format_bytes  # type: ignore
+    handler.emit = emit  # type: ignore
+    if handler.lock is not None:
+        handler.lock = _TimedLock(handler.lock, stats.lock_wait)  # type: ignore
+    handler.handleError = handle_error  # type: ignore
+
+
+def _output_key(index: int, output: Any) -> str:
+    return f"{index}:{output.__class__.__name__}"
+
+
+def stats(reset: bool = False) -> dict[str, dict[str, Any]]:
+    """Get a snapshot of the self-metrics of all configured outputs (with stats enabled).
+
+    Args:
+        reset: if True, reset counters after the snapshot.
+
+    Returns:
+        A dict "output key (`index:OutputClassName`) => stats snapshot".
+
+    """
+    res: dict[str, dict[str, Any]] = {}
+    for index, output in enumerate(GLOBAL_LOGGING_CONFIG._outputs):
+        output_stats: OutputStats | None = output.get_stats()
+        if output_stats is None:
+            continue
+        res[_output_key(index, output)] = output_stats.snapshot()
+        if reset:
+            output_stats.reset()
+    return res
+
+
+class PeriodicStatsReporter(threading.Thread):
+    """Daemon thread which emits periodically a summary of the self-metrics (through stlog).
+
+    One record is emitted for each output with stats enabled.
+
+    Attributes:
+        interval: the interval between two summaries (in seconds).
+        logger_name: the name of the logger to use.
+        level: the level of summary records.
+        reset: if True, reset counters after each summary (so values are deltas).
+
+    """
+
+    def __init__(
+        self,
+        interval: float = 60.0,
+        logger_name: str = "stlog.stats",
+        level: int = logging.INFO,
+        reset: bool = True,
+    ):
+        super().__init__(name="stlog-stats-reporter", daemon=True)
+        self.interval = interval
+        self.logger_name = logger_name
+        self.level = level
+        self.reset = reset
+        self._stop_event = threading.Event()
+
+    def report(self) -> None:
+        logger = getLogger(self.logger_name)
+        for key, snapshot in stats(reset=self.reset).items():
+            optional: dict[str, Any] = {}
+            if "backpressure" in snapshot:
+                bp = snapshot["backpressure"]
+                optional = {
+                    "backlog_bytes": bp["backlog_bytes"],
+                    "max_backlog_bytes": bp["max_backlog_bytes"],
+                    "stalls": bp["stalls"],
+                    "stall_time_max_ns": bp["stall_time"]["max_ns"],
+                    "dropped_bytes": bp["dropped_bytes"],
+                    "spilled_bytes": bp["spilled_bytes"],
+                }
+            if "file_pool" in snapshot:
+                fp = snapshot["file_pool"]
+                optional.update(
+                    open_files=fp["open_files"],
+                    file_pool_hits=fp["hits"],
+                    file_pool_misses=fp["misses"],
+                    file_pool_evictions=fp["evictions"],
+                )
+            logger.log(
+                self.level,
+                "stlog stats",
+                output=key,
+                emitted=snapshot["emitted"],
+                filtered=snapshot["filtered"],
+                bytes_written=snapshot["bytes_written"],
+                errors=snapshot["errors"],
+                format_time_avg_ns=snapshot["format_time"]["avg_ns"],
+                format_time_max_ns=snapshot["format_time"]["max_ns"],
+                write_time_avg_ns=snapshot["write_time"]["avg_ns"],
+                write_time_max_ns=snapshot["write_time"]["max_ns"],
+                lock_wait_avg_ns=snapshot["lock_wait"]["avg_ns"],
+                lock_wait_max_ns=snapshot["lock_wait"]["max_ns"],
+                **optional,
+            )
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.report()
+
+    def stop(self) -> None:
+        self._stop_event.set()
@@ -0,0 +1,567 @@
+"""Network outputs: TCP, UDP, Unix socket and HTTP (batch shipping) of stlog lines.
+
+Contrary to `logging.handlers.SocketHandler` (which sends pickled records and
+reconnects for each record after a failure), lines are formatted with a standard
+`stlog` formatter (JSON by default) and sent by a background thread:
+
+- through a persistent connection (TCP, Unix socket, HTTP keep-alive) or a connected
+  UDP socket
+- by batches (up to `batch_size` lines, waiting at most `flush_interval` seconds for
+  a batch to fill up)
+- with an exponential backoff between reconnection attempts
+- buffered in a bounded queue (`max_queue_bytes`) during outages (new lines are
+  dropped when the queue is full), and optionally in a bounded disk spool (HTTP)
+
+Note: a batch interrupted by a connection failure is sent again (in full) after the
+reconnection (so some lines can be received twice by the collector).
+"""
+
+from __future__ import annotations
+
+import collections
+import gzip
+import http.client
+import logging
+import os
+import socket
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from typing import Any, Mapping
+from urllib.parse import urlsplit
+
+from stlog.base import StlogError
+from stlog.metrics import BackpressureStats
+
+PROTOCOLS = ("tcp", "udp", "unix")
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_MAX_QUEUE_BYTES = 4 * 1024 * 1024
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_MIN_BACKOFF = 0.1
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_MAX_DATAGRAM_SIZE = 8192
+DEFAULT_FLUSH_TIMEOUT = 5.0
+DEFAULT_HTTP_BATCH_SIZE = 1000
+DEFAULT_HTTP_FLUSH_INTERVAL = 1.0
+DEFAULT_HTTP_TIMEOUT = 10.0
+DEFAULT_MAX_SPOOL_BYTES = 100 * 1024 * 1024
+SPOOL_SUFFIX = ".ndjson.gz"
+_DEFAULT_FORMATTER = logging.Formatter()
+_HANDLERS: weakref.WeakSet[_SenderHandler] = weakref.WeakSet()
+
+
+class _SenderHandler(logging.Handler, ABC):
+    # base class: bounded queue + background sender thread (with backoff)
+
+    terminator = "\n"
+
+    def __init__(  # noqa: PLR0913
+        self,
+        batch_size: int,
+        flush_interval: float,
+        max_queue_bytes: int,
+        min_backoff: float,
+        max_backoff: float,
+        flush_timeout: float,
+    ):
+        super().__init__()
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self.max_queue_bytes = max_queue_bytes
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.flush_timeout = flush_timeout
+        self.backpressure_stats = BackpressureStats()
+        self._terminator = self.terminator.encode("utf-8")
+        self._queue: collections.deque[bytes] = collections.deque()
+        self._queue_since = 0.0
+        self._inflight = 0
+        self._flush_requested = False
+        self._cond = threading.Condition(threading.Lock())
+        self._closing = False
+        self._thread: threading.Thread | None = None
+        self._stall_start: int | None = None
+        self._last_record: logging.LogRecord | None = None
+        _HANDLERS.add(self)
+
+    def format_bytes(self, record: logging.LogRecord) -> bytes:
+        """Format the record to (UTF-8) bytes (without the terminator)."""
+        formatter = self.formatter or _DEFAULT_FORMATTER
+        if hasattr(formatter, "format_bytes"):
+            return formatter.format_bytes(record)  # type: ignore
+        return formatter.format(record).encode("utf-8")
+
+    def _accept(self, size: int) -> bool:
+        # can a line of this size be queued?
+        return self.backpressure_stats.backlog_bytes + size <= self.max_queue_bytes
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            data = self.format_bytes(record) + self._terminator
+            size = len(data)
+            stats = self.backpressure_stats
+            with self._cond:
+                if not self._accept(size):
+                    stats.dropped_records += 1
+                    stats.dropped_bytes += size
+                    return
+                queue = self._queue
+                if not queue:
+                    self._queue_since = time.monotonic()
+                queue.append(data)
+                self._last_record = record
+                stats.backlog_bytes += size
+                stats.max_backlog_bytes = max(
+                    stats.max_backlog_bytes, stats.backlog_bytes
+                )
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run,
+                        name=f"stlog-{self.__class__.__name__}-sender",
+                        daemon=True,
+                    )
+                    self._thread.start()
+                if len(queue) == 1 or len(queue) >= self.batch_size:
+                    self._cond.notify()
+        except Exception:
+            self.handleError(record)
+
+    @abstractmethod
+    def _send(self, batch: list[bytes]) -> bool:
+        # return False if the batch must be retried later (after a backoff)
+        pass
+
+    def _on_send_failure(self, batch: list[bytes]) -> None:
+        # (called outside the lock) default: the batch is requeued (in memory)
+        with self._cond:
+            self._queue.extendleft(reversed(batch))
+            self.backpressure_stats.backlog_bytes += sum(len(x) for x in batch)
+
+    def _disconnect(self) -> None:
+        pass
+
+    def _batch_ready(self) -> bool:
+        queue = self._queue
+        if not queue:
+            return False
+        return (
+            self.flush_interval <= 0
+            or self._flush_requested
+            or len(queue) >= self.batch_size
+            or time.monotonic() - self._queue_since >= self.flush_interval
+        )
+
+    def _next_batch(self) -> list[bytes] | None:
+        # wait for a batch (None means "closing")
+        with self._cond:
+            while not self._closing and not self._batch_ready():
+                timeout = None
+                if self._queue:
+                    timeout = self._queue_since + self.flush_interval - time.monotonic()
+                self._cond.wait(timeout)
+            if self._closing:
+                return None
+            n = min(len(self._queue), self.batch_size)
+            batch = [self._queue.popleft() for _ in range(n)]
+            self._queue_since = time.monotonic()
+            self._inflight = n
+            self.backpressure_stats.backlog_bytes -= sum(len(x) for x in batch)
+            return batch
+
+    def _run(self) -> None:
+        stats = self.backpressure_stats
+        backoff = self.min_backoff
+        cond = self._cond
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                ok = self._send(batch)
+                if not ok:
+                    # outage => let's retry later (without losing the batch)
+                    self._on_send_failure(batch)
+            except Exception:
+                # unexpected error => the batch is lost (but the thread keeps running)
+                ok = False
+                stats.dropped_records += len(batch)
+                stats.dropped_bytes += sum(len(x) for x in batch)
+                self.handleError(self._last_record)  # type: ignore
+            with cond:
+                self._inflight = 0
+                if ok:
+                    if self._stall_start is not None:
+                        stats.stall_time.add(time.perf_counter_ns() - self._stall_start)
+                        self._stall_start = None
+                    backoff = self.min_backoff
+                elif self._stall_start is None:
+                    self._stall_start = time.perf_counter_ns()
+                    stats.stalls += 1
+                if not self._queue:
+                    self._flush_requested = False
+                cond.notify_all()
+                if not ok:
+                    cond.wait_for(lambda: self._closing, timeout=backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+
+    def flush(self) -> None:
+        """Wait (at most `flush_timeout` seconds) until all queued lines are sent."""
+        with self._cond:
+            if self._thread is not None and (self._queue or self._inflight):
+                self._flush_requested = True
+                self._cond.notify_all()
+                self._cond.wait_for(
+                    lambda: not self._queue and not self._inflight,
+                    timeout=self.flush_timeout,
+                )
+
+    def close(self) -> None:
+        self.flush()
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(self.flush_timeout)
+        with self._cond:
+            stats = self.backpressure_stats
+            # what remains (after flush_timeout) is lost
+            stats.dropped_records += len(self._queue)
+            stats.dropped_bytes += stats.backlog_bytes
+            stats.backlog_bytes = 0
+            self._queue.clear()
+        self._disconnect()
+        super().close()
+
+
+class NetworkHandler(_SenderHandler):
+    """A logging handler sending newline-delimited lines to a socket (see `stlog.net`).
+
+    Attributes:
+        protocol: `tcp`, `udp` or `unix` (stream Unix socket).
+        address: `(host, port)` tuple (`tcp`, `udp`) or a path (`unix`).
+        batch_size: the maximum number of lines sent in one go.
+        flush_interval: the maximum time (in seconds) to wait for a batch to fill up
+            (0 means: all the lines queued during the previous send are sent at once).
+        max_queue_bytes: the maximum size of the queue (in bytes).
+        connect_timeout: the timeout (in seconds) of connections and sends.
+        min_backoff: the first delay (in seconds) before a reconnection attempt.
+        max_backoff: the maximum delay (in seconds) between two reconnection attempts.
+        max_datagram_size: (`udp` only) the maximum size of a datagram (several lines can
+            be sent in the same datagram, bigger lines are dropped).
+        flush_timeout: the maximum time (in seconds) `flush()` (and `close()`) waits for
+            the queue to be sent.
+        backpressure_stats: queue (backlog), outages (stalls) and dropped lines metrics.
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        address: tuple[str, int] | str,
+        protocol: str = "tcp",
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = 0,
+        max_queue_bytes: int = DEFAULT_MAX_QUEUE_BYTES,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        min_backoff: float = DEFAULT_MIN_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        max_datagram_size: int = DEFAULT_MAX_DATAGRAM_SIZE,
+        flush_timeout: float = DEFAULT_FLUSH_TIMEOUT,
+    ):
+        if protocol not in PROTOCOLS:
+            raise StlogError(f"bad protocol: {protocol} (must be in {PROTOCOLS})")
+        if (protocol == "unix") != isinstance(address, str):
+            raise StlogError(
+                "address must be a path (unix) or a (host, port) tuple (tcp, udp)"
+            )
+        super().__init__(
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            max_queue_bytes=max_queue_bytes,
+            min_backoff=min_backoff,
+            max_backoff=max_backoff,
+            flush_timeout=flush_timeout,
+        )
+        self.address = address
+        self.protocol = protocol
+        self.connect_timeout = connect_timeout
+        self.max_datagram_size = max_datagram_size
+        self._sock: socket.socket | None = None
+
+    def _accept(self, size: int) -> bool:
+        if self.protocol == "udp" and size > self.max_datagram_size:
+            return False
+        return super()._accept(size)
+
+    def _connect(self) -> socket.socket:
+        sock: socket.socket
+        address = self.address
+        # (the address type matches the protocol, see the constructor)
+        if isinstance(address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sockaddr: str | tuple[Any, ...] = address
+        elif self.protocol == "tcp":
+            sock = socket.create_connection(address, timeout=self.connect_timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return sock
+        else:
+            host, port = address
+            family, kind, proto, _, sockaddr = socket.getaddrinfo(
+                host, port, type=socket.SOCK_DGRAM
+            )[0]
+            sock = socket.socket(family, kind, proto)
+        try:
+            sock.settimeout(self.connect_timeout)
+            sock.connect(sockaddr)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def _iter_datagrams(self, batch: list[bytes]):
+        # (several lines in the same datagram, up to max_datagram_size bytes)
+        datagram: list[bytes] = []
+        size = 0
+        for line in batch:
+            if datagram and size + len(line) > self.max_datagram_size:
+                yield b"".join(datagram)
+                datagram = []
+                size = 0
+            datagram.append(line)
+            size += len(line)
+        if datagram:
+            yield b"".join(datagram)
+
+    def _send(self, batch: list[bytes]) -> bool:
+        try:
+            if self._sock is None:
+                self._sock = self._connect()
+            if self.protocol == "udp":
+                for datagram in self._iter_datagrams(batch):
+                    self._sock.send(datagram)
+            else:
+                self._sock.sendall(b"".join(batch))
+        except OSError:
+            self._disconnect()
+            return False
+        return True
+
+    def _disconnect(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class HttpHandler(_SenderHandler):
+    """A logging handler shipping batches of lines to an HTTP ingestion endpoint.
+
+    Each batch is sent as a gzip compressed POST body (newline-delimited lines, so
+    `application/x-ndjson` with the JSON formatter) through a keep-alive connection.
+
+    Failed batches (connection errors, 408, 429 and 5xx responses) are retried with an
+    exponential backoff. Other responses (4xx) are considered as permanent errors and
+    the batch is dropped.
+
+    If `spool_dir` is set, failed batches are written (compressed) to this directory
+    (bounded by `max_spool_bytes`, one directory per process) and sent again (oldest
+    first, before new batches) when the endpoint is back. Spooled batches left by a
+    previous process are sent too.
+
+    Attributes:
+        url: the URL of the endpoint (`http://` or `https://`).
+        headers: extra HTTP headers (authentication...).
+        batch_size: the maximum number of lines in a batch.
+        flush_interval: the maximum time (in seconds) to wait for a batch to fill up.
+        compress_level: the gzip compression level (0-9).
+        max_queue_bytes: the maximum size of the (in memory) queue (in bytes).
+        timeout: the timeout (in seconds) of HTTP requests.
+        min_backoff: the first delay (in seconds) before a retry.
+        max_backoff: the maximum delay (in seconds) between two retries.
+        spool_dir: the directory of the disk spool (None means "no disk spool").
+        max_spool_bytes: the maximum size of the disk spool (in bytes).
+        flush_timeout: the maximum time (in seconds) `flush()` (and `close()`) waits for
+            the queue to be sent.
+        backpressure_stats: queue (backlog), outages (stalls), dropped and spooled
+            (spilled) lines metrics.
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        url: str,
+        headers: Mapping[str, str] | None = None,
+        batch_size: int = DEFAULT_HTTP_BATCH_SIZE,
+        flush_interval: float = DEFAULT_HTTP_FLUSH_INTERVAL,
+        compress_level: int = 6,
+        max_queue_bytes: int = DEFAULT_MAX_QUEUE_BYTES,
+        timeout: float = DEFAULT_HTTP_TIMEOUT,
+        min_backoff: float = DEFAULT_MIN_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        spool_dir: str | None = None,
+        max_spool_bytes: int = DEFAULT_MAX_SPOOL_BYTES,
+        flush_timeout: float = DEFAULT_FLUSH_TIMEOUT,
+    ):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise StlogError(f"bad url: {url} (must be an http:// or https:// url)")
+        super().__init__(
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            max_queue_bytes=max_queue_bytes,
+            min_backoff=min_backoff,
+            max_backoff=max_backoff,
+            flush_timeout=flush_timeout,
+        )
+        self.url = url
+        self.compress_level = compress_level
+        self.timeout = timeout
+        self.spool_dir = spool_dir
+        self.max_spool_bytes = max_spool_bytes
+        self.headers = {
+            "Content-Type": "application/x-ndjson",
+            "Content-Encoding": "gzip",
+            **(headers or {}),
+        }
+        self._https = parts.scheme == "https"
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self._conn: http.client.HTTPConnection | None = None
+        self._last_body = b""
+        self._spool_files: collections.deque[tuple[str, int]] = collections.deque()
+        self._spool_bytes = 0
+        self._spool_seq = 0
+        if spool_dir is not None:
+            os.makedirs(spool_dir, exist_ok=True)
+            for name in sorted(os.listdir(spool_dir)):
+                if name.endswith(SPOOL_SUFFIX):
+                    path = os.path.join(spool_dir, name)
+                    size = os.path.getsize(path)
+                    self._spool_files.append((path, size))
+                    self._spool_bytes += size
+
+    def _post(self, body: bytes) -> str:
+        # return "ok", "retry" or "drop"
+        for _ in range(2):
+            reused = self._conn is not None
+            if self._conn is None:
+                if self._https:
+                    self._conn = http.client.HTTPSConnection(
+                        self._host, self._port, timeout=self.timeout
+                    )
+                else:
+                    self._conn = http.client.HTTPConnection(
+                        self._host, self._port, timeout=self.timeout
+                    )
+            try:
+                self._conn.request("POST", self._path, body=body, headers=self.headers)
+                response = self._conn.getresponse()
+                response.read()  # (mandatory to reuse the connection)
+            except (OSError, http.client.HTTPException):
+                self._disconnect()
+                if reused:
+                    # the keep-alive connection was probably closed by the server
+                    # => let's retry immediately with a new one
+                    continue
+                return "retry"
+            if response.will_close:
+                self._disconnect()
+            if 200 <= response.status < 300:
+                return "ok"
+            if response.status in (408, 429) or response.status >= 500:
+                return "retry"
+            return "drop"
+        return "retry"
+
+    def _replay_spool(self) -> bool:
+        stats = self.backpressure_stats
+        while self._spool_files:
+            path, size = self._spool_files[0]
+            try:
+                with open(path, "rb") as f:
+                    body = f.read()
+            except OSError:
+                # (already removed by another process for example)
+                self._spool_files.popleft()
+                self._spool_bytes -= size
+                continue
+            status = self._post(body)
+            if status == "retry":
+                return False
+            if status == "drop":
+                stats.dropped_bytes += len(body)
+            self._spool_files.popleft()
+            self._spool_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                self.handleError(self._last_record)  # type: ignore
+        return True
+
+    def _send(self, batch: list[bytes]) -> bool:
+        if not self._replay_spool():
+            self._last_body = b""
+            return False
+        body = gzip.compress(b"".join(batch), compresslevel=self.compress_level)
+        self._last_body = body
+        status = self._post(body)
+        if status == "drop":
+            stats = self.backpressure_stats
+            stats.dropped_records += len(batch)
+            stats.dropped_bytes += sum(len(x) for x in batch)
+        return status != "retry"
+
+    def _on_send_failure(self, batch: list[bytes]) -> None:
+        if self.spool_dir is None:
+            super()._on_send_failure(batch)
+            return
+        body = self._last_body or gzip.compress(
+            b"".join(batch), compresslevel=self.compress_level
+        )
+        if self._spool_bytes + len(body) > self.max_spool_bytes:
+            # full spool => let's keep the batch in memory
+            super()._on_send_failure(batch)
+            return
+        self._spool_seq += 1
+        path = os.path.join(
+            self.spool_dir,
+            f"{time.time_ns():020d}-{os.getpid()}-{self._spool_seq:06d}{SPOOL_SUFFIX}",
+        )
+        try:
+            with open(path + ".tmp", "wb") as f:
+                f.write(body)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            super()._on_send_failure(batch)
+            return
+        self._spool_files.append((path, len(body)))
+        self._spool_bytes += len(body)
+        stats = self.backpressure_stats
+        stats.spilled_records += len(batch)
+        stats.spilled_bytes += len(body)
+
+    def _disconnect(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _after_fork_in_child() -> None:
+    # the sender threads (and the queued or spooled lines) belong to the parent process
+    for handler in list(_HANDLERS):
+        handler._cond = threading.Condition(threading.Lock())
+        handler._thread = None
+        handler._queue.clear()
+        handler._inflight = 0
+        handler.backpressure_stats.backlog_bytes = 0
+        handler._disconnect()
+        if isinstance(handler, HttpHandler):
+            handler._spool_files.clear()
+            handler._spool_bytes = 0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
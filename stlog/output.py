@@ -9,28 +9,27 @@ from dataclasses import dataclass, field
 
 from stlog.base import (
     GLOBAL_LOGGING_CONFIG,
+    RICH_AVAILABLE,
     StlogError,
     check_env_false,
+    check_env_true,
 )
 from stlog.filter import ContextReinjectFilter
 from stlog.formatter import (
+    AnsiHumanFormatter,
     Formatter,
     HumanFormatter,
+    JsonFormatter,
     RichHumanFormatter,
 )
 from stlog.handler import CustomRichHandler
+from stlog.metrics import OutputStats, instrument_handler
 
-RICH_INSTALLED: bool = False
-try:
-    from rich.console import Console
-
-    RICH_INSTALLED = True
-except ImportError:
-    pass
+RICH_INSTALLED: bool = RICH_AVAILABLE
 
 
-def _get_default_use_rich() -> bool | None:
-    tmp = os.environ.get("STLOG_USE_RICH")
+def _get_env_tristate(env_var: str) -> bool | None:
+    tmp = os.environ.get(env_var)
     if tmp is None:
         return None
     if tmp.strip().upper() in ("NONE", "AUTO", ""):
@@ -38,7 +37,33 @@ def _get_default_use_rich() -> bool | None:
     return tmp.strip().upper() in ("1", "TRUE", "YES")
 
 
+def _get_default_use_rich() -> bool | None:
+    return _get_env_tristate("STLOG_USE_RICH")
+
+
 DEFAULT_USE_RICH = _get_default_use_rich()
+DEFAULT_USE_ANSI = _get_env_tristate("STLOG_USE_ANSI")
+DEFAULT_STATS: bool = check_env_true("STLOG_STATS", False)
+
+
+def _is_tty(stream: typing.TextIO) -> bool:
+    isatty = getattr(stream, "isatty", None)
+    try:
+        return isatty is not None and isatty()
+    except ValueError:
+        # closed file
+        return False
+
+
+def _is_rich_terminal(stream: typing.TextIO) -> bool:
+    # cheap negative answer without importing rich (which is quite slow to import)
+    # note: rich can only say "yes" for a non tty stream if forced by these env vars
+    if "TTY_COMPATIBLE" not in os.environ and "FORCE_COLOR" not in os.environ:
+        if not _is_tty(stream):
+            return False
+    from rich.console import Console
+
+    return Console(file=stream).is_terminal
 
 
 @dataclass
@@ -56,6 +81,8 @@ class Output:
             (note: override `stlog.setup` default value for this output).
         read_extra_kwargs_from_standard_logging: if try to reinject the extra kwargs from standard logging
             (note: override `stlog.setup` default value for this output).
+        stats: if True, collect self-metrics for this output (see `stlog.stats()`),
+            default to `STLOG_STATS` env var or False if not set.
 
     """
 
@@ -67,6 +94,8 @@ class Output:
     ] = field(default_factory=list)
     reinject_context_in_standard_logging: bool | None = None
     read_extra_kwargs_from_standard_logging: bool | None = None
+    stats: bool = DEFAULT_STATS
+    _stats: OutputStats | None = field(init=False, default=None, repr=False)
 
     @property
     def _reinject_context_in_standard_logging(self) -> bool:
@@ -95,47 +124,171 @@ class Output:
         self._handler.setFormatter(self.get_formatter_or_raise())
         if self.level is not None:
             self._handler.setLevel(self.level)
+        for filter in self._make_handler_filters():
+            self._handler.addFilter(filter)
+        if self.stats:
+            self._stats = OutputStats(
+                backpressure=getattr(handler, "backpressure_stats", None),
+                file_pool=getattr(handler, "file_pool_stats", None),
+            )
+            instrument_handler(self._handler, self._stats)
+
+    def _make_handler_filters(
+        self,
+    ) -> list[typing.Callable[[logging.LogRecord], bool] | logging.Filter]:
+        res: list[typing.Callable[[logging.LogRecord], bool] | logging.Filter] = []
         if self._reinject_context_in_standard_logging:
-            self._handler.addFilter(
+            res.append(
                 ContextReinjectFilter(
                     read_extra_kwargs_from_standard_logging=self._read_extra_kwargs_from_standard_logging
                 )
             )
-        for filter in self.filters:
-            self._handler.addFilter(filter)
+        res.extend(self.filters)
+        return res
+
+    def set_level(self, level: int | str | None) -> None:
+        """Change the level of this output at runtime (the handler is reused).
+
+        Args:
+            level: the new python logging level (None means "use the global logging level").
+
+        """
+        self._handler.setLevel(level if level is not None else logging.NOTSET)
+        self.level = level
+
+    def set_filters(
+        self,
+        filters: typing.Iterable[
+            typing.Callable[[logging.LogRecord], bool] | logging.Filter
+        ],
+    ) -> None:
+        """Replace the filters of this output at runtime (the handler is reused).
+
+        Args:
+            filters: list of logging Filters (or simple callables).
+
+        """
+        self.filters = list(filters)
+        # note: the list is replaced in one assignment so a concurrent emit()
+        # sees either the old filters or the new ones (never a mix)
+        self._handler.filters = self._make_handler_filters()  # type: ignore
 
     def get_handler(self) -> logging.Handler:
         """Get the configured Python logging Handler."""
         return self._handler
 
+    def get_stats(self) -> OutputStats | None:
+        """Get the self-metrics of this output (None if `stats` is not enabled)."""
+        return self._stats
+
     def get_formatter_or_raise(self) -> logging.Formatter:
         if self.formatter is None:
             raise StlogError("formatter is not set")
         return self.formatter
 
 
+def _get_fileno(stream: typing.IO) -> int | None:
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        # not a real file (io.StringIO, pytest capture...) or closed
+        return None
+
+
 @dataclass
 class StreamOutput(Output):
     """Represent an output to a stream (stdout, stderr...).
 
     Attributes:
         stream: the stream to use (`typing.TextIO`), default to `sys.stderr`.
+        batch_size: if > 0 and if the stream is backed by a real file descriptor, records
+            are formatted to bytes and written by batches (of at most `batch_size` records)
+            with a single `os.writev()` call (see `stlog.batch`), default to 0 (no batching).
+        flush_interval: (only with `batch_size` > 0 or `non_blocking`) the maximum time
+            (in seconds) a record can wait in a batch (or in the backlog before a new write
+            attempt), default to 0.1.
+        non_blocking: if True and if the stream is backed by a real file descriptor, the
+            file descriptor is set to `O_NONBLOCK` and what can't be written immediately
+            is kept in a bounded in-memory backlog (see `stlog.batch.NonBlockingFdHandler`),
+            so a stalled consumer never blocks the logging threads, default to False
+            (POSIX only).
+        max_backlog_bytes: (only with `non_blocking`) the maximum size of the backlog
+            (in bytes), default to 1MiB.
+        overflow_policy: (only with `non_blocking`) what to do with a new record when the
+            backlog is full: `drop` (default), `block` (wait for the consumer at most
+            `block_timeout` seconds, then drop) or `spill` (write the record to the
+            `spill_path` local file).
+        block_timeout: (only with `non_blocking`) the maximum time (in seconds) to wait for
+            the consumer (`block` policy and at close), default to 1.0.
+        spill_path: (only with `non_blocking` and the `spill` policy) the path of the
+            spill file.
 
     """
 
     stream: typing.TextIO = sys.stderr
+    batch_size: int = 0
+    flush_interval: float = 0.1
+    non_blocking: bool = False
+    max_backlog_bytes: int = 1024 * 1024
+    overflow_policy: str = "drop"
+    block_timeout: float = 1.0
+    spill_path: str | None = None
 
     def __post_init__(self):
         if self.formatter is None:
             self.formatter = HumanFormatter()
-        self.set_handler(
-            logging.StreamHandler(self.stream),
-        )
+        fd = None
+        if self.batch_size > 0 or self.non_blocking:
+            fd = _get_fileno(self.stream)
+        if fd is None:
+            self.set_handler(
+                logging.StreamHandler(self.stream),
+            )
+            return
+        from stlog.batch import BatchFdHandler, NonBlockingFdHandler
+
+        self.stream.flush()  # (to keep the order with previous writes)
+        kwargs = {
+            "flush_interval": self.flush_interval,
+            "encoding": getattr(self.stream, "encoding", None),
+            "errors": getattr(self.stream, "errors", None),
+        }
+        if self.non_blocking:
+            self.set_handler(
+                NonBlockingFdHandler(
+                    fd,
+                    batch_size=max(self.batch_size, 1),
+                    max_backlog_bytes=self.max_backlog_bytes,
+                    overflow_policy=self.overflow_policy,
+                    block_timeout=self.block_timeout,
+                    spill_path=self.spill_path,
+                    **kwargs,  # type: ignore
+                )
+            )
+        else:
+            self.set_handler(
+                BatchFdHandler(fd, batch_size=self.batch_size, **kwargs)  # type: ignore
+            )
 
 
 @dataclass
 class RichStreamOutput(StreamOutput):
+    """Represent a "rich" stream output (colors, rich tracebacks...).
+
+    Attributes:
+        force_terminal: if True, render as if the stream was a terminal.
+        traceback_dedup_window: if > 0, the same traceback (same exception type and code
+            locations) is fully rendered only once per `traceback_dedup_window` seconds
+            (a short "same traceback as #id" line is printed instead), default to 0
+            (no deduplication).
+        traceback_cache_size: the maximum number of remembered (rendered) tracebacks,
+            default to 128.
+
+    """
+
     force_terminal: bool = False
+    traceback_dedup_window: float = 0
+    traceback_cache_size: int = 128
 
     def __post_init__(self):
         if not RICH_INSTALLED:
@@ -143,15 +296,22 @@ class RichStreamOutput(StreamOutput):
         if self.formatter is None:
             self.formatter = RichHumanFormatter()
         self.set_handler(
-            CustomRichHandler(stream=self.stream, force_terminal=self.force_terminal)
+            CustomRichHandler(
+                stream=self.stream,
+                force_terminal=self.force_terminal,
+                traceback_dedup_window=self.traceback_dedup_window,
+                traceback_cache_size=self.traceback_cache_size,
+            )
         )
 
 
-def make_stream_or_rich_stream_output(
+def make_stream_or_rich_stream_output(  # noqa: PLR0913
     stream: typing.TextIO = sys.stderr,
     use_rich: bool | None = DEFAULT_USE_RICH,
     rich_formatter: Formatter | None = None,
     not_rich_formatter: Formatter | None = None,
+    use_ansi: bool | None = DEFAULT_USE_ANSI,
+    ansi_formatter: Formatter | None = None,
     **kwargs,
 ) -> StreamOutput:
     """Create automatically a `stlog.output.RichStreamOutput` or a (classic)`stlog.output.StreamOutput`.
@@ -160,44 +320,75 @@ def make_stream_or_rich_stream_output(
 
     - `rich` library must be installed and available in python path
     - `use_rich` parameter must be `True` (forced mode) or `None` (automatic mode)
-    - (if `use_rich` is `None`): the selected `stream` must "output" in a real terminal (not in a shell filter
-    or in a file through redirection...)
+    - (if `use_rich` is `None`): `use_ansi` must not be `True` and the selected `stream` must "output"
+    in a real terminal (not in a shell filter or in a file through redirection...)
 
-    NOTE: the default value of the `use_rich` parameter is `None` (automatic) but it can be forced by
-    the `STLOG_USE_RICH` env variable.
+    Else, a `stlog.output.StreamOutput` is returned, with colors (plain ANSI escape sequences, see
+    `stlog.formatter.AnsiHumanFormatter`, much cheaper than `rich`) only if `use_ansi` is `True` (opt-in).
+
+    NOTE: the default value of the `use_rich` (and `use_ansi`) parameter is `None` (automatic) but it can be
+    forced by the `STLOG_USE_RICH` (and `STLOG_USE_ANSI`) env variable.
 
     Attributes:
         stream: the stream to use (`typing.TextIO`), default to `sys.stderr`.
         use_rich: if None, use [rich output](https://github.com/Textualize/rich/blob/master/README.md) if possible
             (rich installed and supported tty), if True/False force the usage (or not).
         rich_formatter: Formatter to use if rich is available/selected (None => default RichHumanFormatter instance).
-        not_rich_formatter: Formatter to use if rich is not available/selected (None => default HumanFormatter instance).
+        not_rich_formatter: Formatter to use if neither rich nor ANSI colors are selected
+            (None => default HumanFormatter instance).
+        use_ansi: if True, use ANSI colors (without rich) if rich is not selected
+            (with `ansi_formatter` instead of `not_rich_formatter`), if None (default) or False,
+            don't.
+        ansi_formatter: Formatter to use if ANSI colors are selected (None => default AnsiHumanFormatter instance).
+
+    Other `kwargs` are passed to the output constructor (for example `non_blocking=True`,
+    see `stlog.output.StreamOutput`, note: batching and non-blocking options are ignored
+    by `stlog.output.RichStreamOutput`).
 
     """
     if "formatter" in kwargs:
         raise StlogError(
-            "you can't use formatter in kwargs for this function (buy you can use rich_formatter/not_rich_formatter instead)"
+            "you can't use formatter in kwargs for this function (buy you can use rich_formatter/not_rich_formatter/ansi_formatter instead)"
         )
     _use_rich: bool = False
     if use_rich is not None:
         # manual mode
         _use_rich = use_rich
     # automatic mode
-    elif RICH_INSTALLED:
-        c = Console(file=stream)
-        _use_rich = c.is_terminal
+    elif RICH_INSTALLED and not use_ansi:
+        _use_rich = _is_rich_terminal(stream)
     if _use_rich:
         return RichStreamOutput(
             stream=stream,
             formatter=rich_formatter or RichHumanFormatter(),
             **kwargs,
         )
-    else:
+    if use_ansi:
         return StreamOutput(
             stream=stream,
-            formatter=not_rich_formatter or HumanFormatter(),
+            formatter=ansi_formatter or AnsiHumanFormatter(),
             **kwargs,
         )
+    return StreamOutput(
+        stream=stream,
+        formatter=not_rich_formatter or HumanFormatter(),
+        **kwargs,
+    )
+
+
+def _reset_context_refs_on_rollover(
+    handler: logging.handlers.RotatingFileHandler, formatter: logging.Formatter | None
+) -> None:
+    if not isinstance(formatter, JsonFormatter) or not formatter.context_refs:
+        return
+    # each rotated file must contain its own context definitions
+    orig_do_rollover = handler.doRollover
+
+    def do_rollover():
+        orig_do_rollover()
+        formatter.reset_context_refs()
+
+    handler.doRollover = do_rollover  # type: ignore
 
 
 @dataclass
@@ -210,6 +401,16 @@ class FileOutput(Output):
         encoding: the encoding to use, default to None.
         delay: if True, the file is not opened until the first call to emit().
         errors: the errors to use, default to None (python >= 3.9 only)
+        index: if True, a sidecar index (`filename` + `.idx`) is written along the file
+            (see `stlog.index`).
+        index_extras_keys: extras keys to index (only if `index` is True).
+        batch_size: if > 0, records are formatted to bytes and written by batches
+            (of at most `batch_size` records) with a single `os.writev()` call (see
+            `stlog.batch`), default to 0 (no batching). Not compatible with `index`
+            and `delay` (the file is opened immediately). The default encoding is
+            UTF-8 in this mode.
+        flush_interval: (only with `batch_size` > 0) the maximum time (in seconds) a
+            record can wait in a batch, default to 0.1.
 
     """
 
@@ -218,12 +419,19 @@ class FileOutput(Output):
     encoding: str | None = None
     delay: bool = False
     errors: str | None = None
+    index: bool = False
+    index_extras_keys: typing.Sequence[str] = ()
+    batch_size: int = 0
+    flush_interval: float = 0.1
 
     def __post_init__(self):
         if not self.filename:
             raise StlogError("filename is not set")
         if self.formatter is None:
             self.formatter = HumanFormatter()
+        if self.batch_size > 0:
+            self._set_batch_handler()
+            return
         kwargs = {
             "mode": self.mode,
             "encoding": self.encoding,
@@ -231,10 +439,39 @@ class FileOutput(Output):
         }
         if sys.version_info >= (3, 9):
             kwargs["errors"] = self.errors
+        if self.index:
+            from stlog.index import IndexedFileHandler
+
+            self.set_handler(
+                IndexedFileHandler(
+                    self.filename,
+                    extras_keys=self.index_extras_keys,
+                    **kwargs,  # type: ignore
+                )
+            )
+            return
         self.set_handler(
             logging.FileHandler(self.filename, **kwargs),  # type: ignore
         )
 
+    def _set_batch_handler(self) -> None:
+        from stlog.batch import BatchFdHandler
+
+        if self.index or self.delay:
+            raise StlogError("batch_size is not compatible with index or delay")
+        flags = os.O_WRONLY | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        flags |= os.O_TRUNC if "w" in self.mode else os.O_APPEND
+        self.set_handler(
+            BatchFdHandler(
+                os.open(self.filename, flags, 0o666),
+                batch_size=self.batch_size,
+                flush_interval=self.flush_interval,
+                encoding=self.encoding,
+                errors=self.errors,
+                close_fd=True,
+            )
+        )
+
 
 @dataclass
 class RotatingFileOutput(FileOutput):
@@ -248,6 +485,9 @@ class RotatingFileOutput(FileOutput):
         encoding: the encoding to use, default to None.
         delay: if True, the file is not opened until the first call to emit().
         errors: the errors to use, default to None.
+        index: if True, a sidecar index (`filename` + `.idx`) is written (and rotated)
+            along the file (see `stlog.index`).
+        index_extras_keys: extras keys to index (only if `index` is True).
 
     """
 
@@ -257,6 +497,8 @@ class RotatingFileOutput(FileOutput):
     def __post_init__(self):
         if not self.filename:
             raise StlogError("filename is not set")
+        if self.batch_size > 0:
+            raise StlogError("batch_size is not supported by RotatingFileOutput")
         if self.formatter is None:
             self.formatter = HumanFormatter()
         kwargs = {
@@ -268,9 +510,417 @@ class RotatingFileOutput(FileOutput):
         }
         if sys.version_info >= (3, 9):
             kwargs["errors"] = self.errors
-        self.set_handler(
-            logging.handlers.RotatingFileHandler(
+        handler: logging.handlers.RotatingFileHandler
+        if self.index:
+            from stlog.index import IndexedRotatingFileHandler
+
+            handler = IndexedRotatingFileHandler(
+                self.filename,
+                extras_keys=self.index_extras_keys,
+                **kwargs,  # type: ignore
+            )
+        else:
+            handler = logging.handlers.RotatingFileHandler(
                 self.filename,
                 **kwargs,  # type: ignore
-            ),
+            )
+        self.set_handler(handler)
+        _reset_context_refs_on_rollover(handler, self.formatter)
+
+
+@dataclass
+class PartitionedFileOutput(Output):
+    """Represent an output to one file per partition (for example per tenant).
+
+    The path of the file is derived from a template filled with record attributes
+    (extras or `stlog.LogContext` values) and open files are kept in a bounded LRU pool
+    (see `stlog.partition`). Files are always opened in append mode.
+
+    Attributes:
+        filename: the path template, for example `logs/{tenant}.log`.
+        default_value: the value used when a template attribute is not set on a record,
+            default to "default".
+        max_open_files: the maximum number of files open at the same time (the least
+            recently used one is flushed and closed when the limit is reached),
+            default to 128.
+        encoding: the encoding to use, default to None (utf-8).
+        errors: the errors to use, default to None.
+        flush_interval: the maximum time (in seconds) a record can wait in a file buffer,
+            default to 1.0.
+
+    """
+
+    filename: str = ""
+    default_value: str = "default"
+    max_open_files: int = 128
+    encoding: str | None = None
+    errors: str | None = None
+    flush_interval: float = 1.0
+
+    def __post_init__(self):
+        from stlog.partition import PartitionedFileHandler
+
+        if not self.filename:
+            raise StlogError("filename is not set")
+        if self.formatter is None:
+            self.formatter = HumanFormatter()
+        if isinstance(self.formatter, JsonFormatter) and self.formatter.context_refs:
+            raise StlogError("context_refs is not supported by PartitionedFileOutput")
+        self.set_handler(
+            PartitionedFileHandler(
+                self.filename,
+                default_value=self.default_value,
+                max_open_files=self.max_open_files,
+                encoding=self.encoding,
+                errors=self.errors,
+                flush_interval=self.flush_interval,
+            )
+        )
+
+
+@dataclass
+class CompressedFileOutput(Output):
+    """Represent an output to a (optionally rotating) gzip compressed file.
+
+    Logs are compressed on the fly (see `stlog.compressed`) and the compressor is
+    flushed every `flush_interval` seconds (at most) so the file is always decodable
+    up to the last flush.
+
+    Attributes:
+        filename: the filename to use (`.gz` suffix recommended).
+        mode: the mode to use, default to "a" (a new gzip member is appended).
+        compress_level: the gzip compression level (0-9), default to 6.
+        flush_interval: the maximum time (in seconds) between two (sync) flushes of
+            the compressor (checked when a log is emitted), default to 1.0 (0 means
+            "after each log").
+        max_bytes: the maximum number of (compressed) bytes before a rotation,
+            default to 0 (no size rotation).
+        rotation_interval: the maximum age (in seconds) of a file before a rotation,
+            default to 0 (no time rotation).
+        backup_count: the number of backup files to use, default to 0.
+        encoding: the encoding to use, default to None (utf-8).
+        delay: if True, the file is not opened until the first call to emit().
+        errors: the errors to use, default to None.
+
+    """
+
+    filename: str = ""
+    mode: str = "a"
+    compress_level: int = 6
+    flush_interval: float = 1.0
+    max_bytes: int = 0
+    rotation_interval: float = 0
+    backup_count: int = 0
+    encoding: str | None = None
+    delay: bool = False
+    errors: str | None = None
+
+    def __post_init__(self):
+        from stlog.compressed import CompressedFileHandler
+
+        if not self.filename:
+            raise StlogError("filename is not set")
+        if self.formatter is None:
+            self.formatter = HumanFormatter()
+        handler = CompressedFileHandler(
+            self.filename,
+            mode=self.mode,
+            maxBytes=self.max_bytes,
+            backupCount=self.backup_count,
+            encoding=self.encoding,
+            delay=self.delay,
+            errors=self.errors,
+            compressLevel=self.compress_level,
+            flushInterval=self.flush_interval,
+            rotationInterval=self.rotation_interval,
+        )
+        self.set_handler(handler)
+        _reset_context_refs_on_rollover(handler, self.formatter)
+
+
+@dataclass
+class SocketOutput(Output):
+    """Represent an output to a (local) collector through a TCP, UDP or Unix socket.
+
+    Lines (newline-delimited, JSON by default) are sent by batches by a background
+    thread through a persistent connection, with a bounded queue during outages and
+    reconnections with an exponential backoff (see `stlog.net`).
+
+    Attributes:
+        protocol: `tcp` (default), `udp` or `unix` (stream Unix socket).
+        host: the host to connect to (`tcp` and `udp`), default to `127.0.0.1`.
+        port: the port to connect to (`tcp` and `udp`).
+        path: the path of the socket to connect to (`unix`).
+        batch_size: the maximum number of lines sent in one go, default to 256.
+        max_queue_bytes: the maximum size (in bytes) of the queue (new lines are dropped
+            when the queue is full), default to 4MiB.
+        connect_timeout: the timeout (in seconds) of connections and sends, default to 5.0.
+        max_backoff: the maximum delay (in seconds) between two reconnection attempts,
+            default to 30.0.
+        max_datagram_size: (`udp` only) the maximum size of a datagram, default to 8192.
+        flush_timeout: the maximum time (in seconds) a flush (or the close) waits for
+            the queue to be sent, default to 5.0.
+
+    """
+
+    protocol: str = "tcp"
+    host: str = "127.0.0.1"
+    port: int = 0
+    path: str = ""
+    batch_size: int = 256
+    max_queue_bytes: int = 4 * 1024 * 1024
+    connect_timeout: float = 5.0
+    max_backoff: float = 30.0
+    max_datagram_size: int = 8192
+    flush_timeout: float = 5.0
+
+    def __post_init__(self):
+        from stlog.net import NetworkHandler
+
+        if self.formatter is None:
+            self.formatter = JsonFormatter()
+        if self.protocol == "unix":
+            if not self.path:
+                raise StlogError("path is not set")
+            address: tuple[str, int] | str = self.path
+        else:
+            if not self.port:
+                raise StlogError("port is not set")
+            address = (self.host, self.port)
+        self.set_handler(
+            NetworkHandler(
+                address,
+                protocol=self.protocol,
+                batch_size=self.batch_size,
+                max_queue_bytes=self.max_queue_bytes,
+                connect_timeout=self.connect_timeout,
+                max_backoff=self.max_backoff,
+                max_datagram_size=self.max_datagram_size,
+                flush_timeout=self.flush_timeout,
+            )
+        )
+
+
+@dataclass
+class HttpOutput(Output):
+    """Represent an output shipping batches of lines to an HTTP ingestion endpoint.
+
+    Lines (newline-delimited, JSON by default) are sent by a background thread as
+    gzip compressed POST bodies through a keep-alive connection, with retries (and an
+    exponential backoff) during outages and an optional bounded disk spool
+    (see `stlog.net.HttpHandler`).
+
+    Attributes:
+        url: the URL of the endpoint (`http://` or `https://`).
+        headers: extra HTTP headers (authentication...).
+        batch_size: the maximum number of lines in a POST body, default to 1000.
+        flush_interval: the maximum time (in seconds) a line waits for its batch to
+            fill up, default to 1.0.
+        compress_level: the gzip compression level (0-9), default to 6.
+        timeout: the timeout (in seconds) of HTTP requests, default to 10.0.
+        max_queue_bytes: the maximum size (in bytes) of the in-memory queue (new lines
+            are dropped when the queue is full), default to 4MiB.
+        max_backoff: the maximum delay (in seconds) between two retries, default to 30.0.
+        spool_dir: the directory where failed batches are kept (and sent again later),
+            default to None (no disk spool).
+        max_spool_bytes: the maximum size (in bytes) of the disk spool, default to 100MiB.
+        flush_timeout: the maximum time (in seconds) a flush (or the close) waits for
+            the queue to be sent, default to 5.0.
+
+    """
+
+    url: str = ""
+    headers: dict[str, str] = field(default_factory=dict)
+    batch_size: int = 1000
+    flush_interval: float = 1.0
+    compress_level: int = 6
+    timeout: float = 10.0
+    max_queue_bytes: int = 4 * 1024 * 1024
+    max_backoff: float = 30.0
+    spool_dir: str | None = None
+    max_spool_bytes: int = 100 * 1024 * 1024
+    flush_timeout: float = 5.0
+
+    def __post_init__(self):
+        from stlog.net import HttpHandler
+
+        if not self.url:
+            raise StlogError("url is not set")
+        if self.formatter is None:
+            self.formatter = JsonFormatter()
+        self.set_handler(
+            HttpHandler(
+                self.url,
+                headers=self.headers,
+                batch_size=self.batch_size,
+                flush_interval=self.flush_interval,
+                compress_level=self.compress_level,
+                timeout=self.timeout,
+                max_queue_bytes=self.max_queue_bytes,
+                max_backoff=self.max_backoff,
+                spool_dir=self.spool_dir,
+                max_spool_bytes=self.max_spool_bytes,
+                flush_timeout=self.flush_timeout,
+            )
+        )
+
+
+@dataclass
+class AsyncioOutput(Output):
+    """Represent an asyncio-native output which never blocks the event loop.
+
+    The log call only enqueues the record (with the current `contextvars` context)
+    and a writer task drains the queue by batches in a dedicated thread through the
+    wrapped output (see `stlog.aio`).
+
+    For a graceful shutdown, use `await output.drain()` (or `await stlog.aio.drain()`
+    for all configured asyncio outputs).
+
+    Attributes:
+        output: the wrapped output (which formats and writes the records), default to
+            a `stlog.output.StreamOutput` (on `sys.stderr`). Note: the formatter must
+            be set on this wrapped output.
+        batch_size: the maximum number of records written in one go by the writer.
+        max_queue_records: the maximum number of queued records (new records are
+            dropped when the queue is full), default to 100000 (0 means "no limit").
+        max_queue_bytes: the maximum (estimated) size in bytes of the queued records
+            (see `stlog.aio.AsyncioHandler`), default to 64MiB (0 means "no limit").
+
+    """
+
+    output: Output | None = None
+    batch_size: int = 256
+    max_queue_records: int = 100000
+    max_queue_bytes: int = 64 * 1024 * 1024
+
+    def __post_init__(self):
+        from stlog.aio import AsyncioHandler
+
+        if self.formatter is not None:
+            raise StlogError(
+                "you can't set a formatter on an AsyncioOutput (set it on the wrapped output)"
+            )
+        if self.output is None:
+            self.output = StreamOutput()
+        self.formatter = self.output.get_formatter_or_raise()
+        # (the context is reinjected by the wrapped output, in the captured context)
+        self.reinject_context_in_standard_logging = False
+        self.set_handler(
+            AsyncioHandler(
+                self.output.get_handler(),
+                batch_size=self.batch_size,
+                max_queue_records=self.max_queue_records,
+                max_queue_bytes=self.max_queue_bytes,
+            )
+        )
+
+    async def drain(self) -> None:
+        """Wait until all the records queued before the call are written (and flushed)."""
+        await self.get_handler().drain()  # type: ignore
+
+
+@dataclass
+class Route:
+    """Represent a routing rule of a `stlog.output.RoutingOutput`.
+
+    All the given conditions must match (an unset condition always matches).
+
+    Attributes:
+        output: the child output to send the matching records to.
+        min_level: the minimum level (included), default to NOTSET.
+        max_level: the maximum level (included), default to None (no maximum).
+        loggers: logger name prefixes (`foo` matches `foo` and `foo.bar` but not
+            `foobar`), default to all loggers.
+        context: dict "context key => accepted value (or list of accepted values)".
+
+    """
+
+    output: Output
+    min_level: int | str = logging.NOTSET
+    max_level: int | str | None = None
+    loggers: typing.Sequence[str] = ()
+    context: dict[str, typing.Any] = field(default_factory=dict)
+
+
+@dataclass
+class RoutingOutput(Output):
+    """Represent an output which sends each record only to the matching child outputs.
+
+    Routing rules are compiled into a dispatch table (see `stlog.routing`), so only the
+    matching child outputs see the record (instead of the level check and the filter
+    chain of every output). A record is sent (once) to the outputs of all matching
+    routes, or to the `default` output when no route matches.
+
+    Note: the levels and the filters of the child outputs still apply.
+
+    Attributes:
+        routes: the routing rules (see `stlog.output.Route`).
+        default: the output for records matched by no route, default to None (dropped).
+
+    """
+
+    routes: typing.Sequence[Route] = ()
+    default: Output | None = None
+
+    def __post_init__(self):
+        from stlog.routing import RoutingHandler, Rule
+
+        if self.formatter is not None:
+            raise StlogError(
+                "you can't set a formatter on a RoutingOutput (set it on the child outputs)"
+            )
+        # (unused, records are formatted by the child outputs)
+        self.formatter = logging.Formatter()
+        rules = [
+            Rule(
+                route.output.get_handler(),
+                min_level=route.min_level,
+                max_level=route.max_level,
+                loggers=route.loggers,
+                context=route.context,
+            )
+            for route in self.routes
+        ]
+        default = self.default.get_handler() if self.default is not None else None
+        self.set_handler(RoutingHandler(rules, default=default))
+
+
+@dataclass
+class BinaryFileOutput(Output):
+    """Represent an output to a (optionally rotating) file in the compact binary format.
+
+    See `stlog.binary` for details about the format (and `python -m stlog` to read it).
+
+    Attributes:
+        filename: the filename to use.
+        mode: the mode to use, default to "a".
+        max_bytes: the maximum number of bytes to use, default to 0 (no rotation).
+        backup_count: the number of backup files to use, default to 0.
+        delay: if True, the file is not opened until the first call to emit().
+
+    """
+
+    filename: str = ""
+    mode: str = "a"
+    max_bytes: int = 0
+    backup_count: int = 0
+    delay: bool = False
+
+    def __post_init__(self):
+        from stlog.binary import BinaryFileHandler, BinaryFormatter
+
+        if not self.filename:
+            raise StlogError("filename is not set")
+        if self.formatter is None:
+            self.formatter = BinaryFormatter()
+        if not isinstance(self.formatter, BinaryFormatter):
+            raise StlogError("BinaryFileOutput must be used with a BinaryFormatter")
+        self.set_handler(
+            BinaryFileHandler(
+                self.filename,
+                mode=self.mode,
+                maxBytes=self.max_bytes,
+                backupCount=self.backup_count,
+                delay=self.delay,
+            )
         )
@@ -0,0 +1,203 @@
+"""Parsers for stlog logfmt and JSON outputs (the inverse of stlog formatters).
+
+Example::
+
+    parser = LogFmtParser()
+    for chunk in iter(lambda: sock.recv(65536), b""):
+        for dct in parser.feed(chunk):
+            print(dct["message"])
+    for dct in parser.close():
+        print(dct["message"])
+
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Tuple, Union
+
+_UNESCAPES = {"\\": "\\", '"': '"', "n": "\n"}
+
+Pairs = Tuple[Tuple[str, Any], ...]
+Parsed = Union[dict, Pairs]
+
+
+def logfmt_parse_string(value: str) -> str:
+    """Parse a logfmt value (the inverse of `stlog.base.logfmt_format_string`).
+
+    Note: unknown escape sequences are kept as is.
+    """
+    if value[0:1] == '"' and value[-1:] == '"' and len(value) >= 2:
+        value = value[1:-1]
+    if "\\" not in value:
+        return value
+    return _unescape(value)
+
+
+def _unescape(value: str) -> str:
+    if "\\\\" not in value:
+        # fast path: all backslashes start a (single char) escape sequence
+        return value.replace('\\"', '"').replace("\\n", "\n")
+    res: list[str] = []
+    pos = 0
+    length = len(value)
+    while True:
+        backslash = value.find("\\", pos)
+        if backslash == -1 or backslash == length - 1:
+            res.append(value[pos:])
+            break
+        res.append(value[pos:backslash])
+        char = value[backslash + 1]
+        unescaped = _UNESCAPES.get(char)
+        if unescaped is None:
+            res.append(value[backslash : backslash + 2])
+        else:
+            res.append(unescaped)
+        pos = backslash + 2
+    return "".join(res)
+
+
+def _find_closing_quote(line: str, start: int) -> int:
+    # return the position of the first not escaped double quote (or -1)
+    while True:
+        end = line.find('"', start)
+        if end == -1:
+            return -1
+        backslashes = 0
+        pos = end - 1
+        while pos >= start and line[pos] == "\\":
+            backslashes += 1
+            pos -= 1
+        if backslashes % 2 == 0:
+            return end
+        start = end + 1
+
+
+def parse_logfmt_pairs(line: str) -> list[tuple[str, str]]:
+    """Parse a logfmt line into a list of (key, value) tuples (in the line order).
+
+    Values are returned as strings (logfmt is not typed). Keys without value
+    (`key` or `key=`) get an empty string.
+    """
+    res: list[tuple[str, str]] = []
+    length = len(line)
+    pos = 0
+    while pos < length:
+        # skip spaces
+        while pos < length and line[pos] == " ":
+            pos += 1
+        if pos >= length:
+            break
+        eq = line.find("=", pos)
+        space = line.find(" ", pos)
+        if eq == -1 or (space != -1 and space < eq):
+            # key without value
+            end = length if space == -1 else space
+            res.append((line[pos:end], ""))
+            pos = end
+            continue
+        key = line[pos:eq]
+        pos = eq + 1
+        if pos < length and line[pos] == '"':
+            # quoted value
+            start = pos + 1
+            end = _find_closing_quote(line, start)
+            if end == -1:
+                end = length
+            value = line[start:end]
+            if "\\" in value:
+                value = _unescape(value)
+            res.append((key, value))
+            pos = end + 1
+        else:
+            end = line.find(" ", pos)
+            if end == -1:
+                end = length
+            res.append((key, line[pos:end]))
+            pos = end
+    return res
+
+
+def parse_logfmt(line: str) -> dict[str, str]:
+    """Parse a logfmt line (as produced by `stlog.formatter.LogFmtFormatter`) into a dict."""
+    return dict(parse_logfmt_pairs(line))
+
+
+class IncrementalParser(ABC):
+    """Abstract base class of incremental (line oriented) parsers.
+
+    Data (`bytes` or `str`) can be fed in arbitrary chunks (partial lines are kept
+    until they are completed by a next chunk or by `close()`).
+
+    Attributes:
+        as_tuples: if True, parsed lines are returned as tuples of (key, value) tuples
+            (instead of dicts).
+
+    """
+
+    def __init__(self, as_tuples: bool = False):
+        self.as_tuples = as_tuples
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._tail = ""
+
+    @abstractmethod
+    def _parse_line(self, line: str) -> Parsed | None:
+        pass
+
+    def _parse_lines(self, lines: list[str]) -> list[Parsed]:
+        res: list[Parsed] = []
+        for line in lines:
+            if not line or line.isspace():
+                continue
+            parsed = self._parse_line(line)
+            if parsed is not None:
+                res.append(parsed)
+        return res
+
+    def feed(self, data: bytes | str) -> list[Parsed]:
+        """Feed a chunk of data and return parsed complete lines."""
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        last_newline = data.rfind("\n")
+        if last_newline == -1:
+            self._tail += data
+            return []
+        lines = (self._tail + data[0:last_newline]).split("\n")
+        self._tail = data[last_newline + 1 :]
+        return self._parse_lines(lines)
+
+    def close(self) -> list[Parsed]:
+        """Parse (and return) the last (not terminated) line (if any)."""
+        tail = self._tail + self._decoder.decode(b"", final=True)
+        self._tail = ""
+        return self._parse_lines([tail])
+
+
+class LogFmtParser(IncrementalParser):
+    """Incremental parser of logfmt lines (see `parse_logfmt`)."""
+
+    def _parse_line(self, line: str) -> Parsed | None:
+        line = line.rstrip("\r")
+        if self.as_tuples:
+            return tuple(parse_logfmt_pairs(line))
+        return parse_logfmt(line)
+
+
+class JsonParser(IncrementalParser):
+    """Incremental parser of JSON lines (invalid or not object lines are ignored).
+
+    Note: JSON outputs with an `indent` are not supported (not line oriented).
+    """
+
+    def _parse_line(self, line: str) -> Parsed | None:
+        try:
+            decoded = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(decoded, dict):
+            return None
+        if self.as_tuples:
+            return tuple(decoded.items())
+        return decoded
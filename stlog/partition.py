@@ -0,0 +1,177 @@
+"""Output to one file per partition (tenant...) with a bounded pool of open files.
+
+The path of the file is derived from a template (for example `logs/{tenant}.log`)
+filled with record attributes (extras or `stlog.LogContext` values). Open files are
+kept in a LRU pool limited to `max_open_files`: when the limit is reached, the least
+recently used file is flushed and closed (and reopened later, in append mode, if
+needed). So thousands of partitions never exhaust the file descriptors.
+
+Writes are buffered: open files are flushed when they are evicted, when the handler
+is flushed (`logging.shutdown()` does it at exit) and every `flush_interval` seconds.
+"""
+
+from __future__ import annotations
+
+import collections
+import logging
+import os
+import re
+import string
+import weakref
+from typing import IO
+
+from stlog.base import StlogError
+from stlog.batch import _Flusher
+from stlog.metrics import FilePoolStats
+
+DEFAULT_MAX_OPEN_FILES = 128
+DEFAULT_FLUSH_INTERVAL = 1.0
+_UNSAFE_CHARS = re.compile(r"[^\w.-]")
+_HANDLERS: weakref.WeakSet[PartitionedFileHandler] = weakref.WeakSet()
+
+
+def _sanitize(value: object) -> str:
+    # the value must not escape the template directory
+    res = _UNSAFE_CHARS.sub("_", str(value))
+    if not res or res.startswith("."):
+        res = "_" + res
+    return res
+
+
+class PartitionedFileHandler(logging.Handler):
+    """A logging handler writing records to one file per partition (see `stlog.partition`).
+
+    Attributes:
+        filename: the path template (`str.format()` syntax with record attribute names,
+            for example `logs/{tenant}/app.log`). Values are sanitized (only letters,
+            digits, `_`, `-` and `.` are kept) so they can't escape the directory.
+        default_value: the value used when a template attribute is not set on the record.
+        max_open_files: the maximum number of files open at the same time.
+        encoding: the encoding to use, default to UTF-8.
+        errors: the encoding error handler to use.
+        flush_interval: the maximum time (in seconds) a record can wait in a file
+            buffer (0 means "no periodic flush").
+        file_pool_stats: hits, misses and evictions of the open files pool.
+
+    """
+
+    terminator = "\n"
+
+    def __init__(  # noqa: PLR0913
+        self,
+        filename: str,
+        default_value: str = "default",
+        max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+        encoding: str | None = None,
+        errors: str | None = None,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        super().__init__()
+        self.keys = tuple(
+            field for _, field, _, _ in string.Formatter().parse(filename) if field
+        )
+        if not self.keys:
+            raise StlogError(
+                f"bad filename template: {filename} (no {{attribute}} placeholder)"
+            )
+        if max_open_files < 1:
+            raise StlogError("max_open_files must be >= 1")
+        self.filename = filename
+        self.default_value = default_value
+        self.max_open_files = max_open_files
+        self.encoding = encoding or "utf-8"
+        self.errors = errors
+        self.flush_interval = flush_interval
+        self.file_pool_stats = FilePoolStats()
+        self._files: collections.OrderedDict[str, IO[str]] = collections.OrderedDict()
+        self._flusher: _Flusher | None = None
+        _HANDLERS.add(self)
+
+    def get_path(self, record: logging.LogRecord) -> str:
+        """Get the path of the file for the given record."""
+        values = {
+            key: _sanitize(getattr(record, key, self.default_value))
+            for key in self.keys
+        }
+        return self.filename.format(**values)
+
+    def _get_file(self, path: str) -> IO[str]:
+        stats = self.file_pool_stats
+        f = self._files.get(path)
+        if f is not None:
+            stats.hits += 1
+            self._files.move_to_end(path)
+            return f
+        stats.misses += 1
+        while len(self._files) >= self.max_open_files:
+            _, evicted = self._files.popitem(last=False)
+            evicted.close()  # (flushed by close)
+            stats.evictions += 1
+            stats.open_files = len(self._files)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        f = open(path, "a", encoding=self.encoding, errors=self.errors)
+        self._files[path] = f
+        stats.open_files = len(self._files)
+        stats.max_open_files = max(stats.max_open_files, stats.open_files)
+        return f
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            msg = self.format(record)
+            self._get_file(self.get_path(record)).write(msg + self.terminator)
+            if self._flusher is None and self.flush_interval > 0:
+                self._flusher = _Flusher(self)  # type: ignore
+                self._flusher.start()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        """Flush all the open files."""
+        self.acquire()
+        try:
+            for f in self._files.values():
+                f.flush()
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            while self._files:
+                _, f = self._files.popitem(last=False)
+                f.close()
+            self.file_pool_stats.open_files = 0
+            if self._flusher is not None:
+                self._flusher.stop_event.set()
+                self._flusher = None
+        finally:
+            self.release()
+        super().close()
+
+
+def _discard(f: IO[str]) -> None:
+    # close the file without writing its buffer (redirected to the null device)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    try:
+        os.dup2(devnull, f.fileno())
+    finally:
+        os.close(devnull)
+    f.close()
+
+
+def _after_fork_in_child() -> None:
+    # the flusher threads do not exist anymore in the child process
+    # and the buffered data of the open files belongs to the parent (which writes it)
+    # => the pool is emptied (files are reopened when needed, the flusher restarted)
+    for handler in list(_HANDLERS):
+        handler._flusher = None
+        while handler._files:
+            _, f = handler._files.popitem(last=False)
+            _discard(f)
+        handler.file_pool_stats.open_files = 0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
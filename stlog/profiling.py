@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import Any, Callable
+
+from stlog.adapter import StLogLoggerAdapter
+from stlog.base import GLOBAL_LOGGING_CONFIG, StlogError
+from stlog.filter import ContextReinjectFilter
+from stlog.metrics import Histogram, _output_key
+
+ADAPTER_KEY = "adapter"
+
+
+class _Profile:
+    """Per-stage histograms (and sampling state) for one output (or for the adapter)."""
+
+    def __init__(self, every: int):
+        self.every = every
+        self.counter = 0
+        self.local = threading.local()
+        self.stages: dict[str, Histogram] = {}
+
+    def is_sampled(self) -> bool:
+        return getattr(self.local, "sampled", False)
+
+    def add(self, stage: str, value: int) -> None:
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages.setdefault(stage, Histogram())
+        histogram.add(value)
+
+
+class Profiler:
+    """Sampled per-stage profiler for the stlog logging pipeline.
+
+    When started, one record out of `every` is timed (with `time.perf_counter_ns`)
+    at each stage of the pipeline:
+
+    - `adapter.process`: context/kwargs merge in `stlog` loggers
+    - `adapter.level_check`: level check in `stlog` loggers
+    - `handle`: everything in the output handler (filters, format, write)
+    - `filters`: all filters of the output
+    - `filters.context_reinject`: the `stlog.filter.ContextReinjectFilter` filter
+    - `format`: the formatter
+    - `format.extras`: the `{extras}` placeholder building
+    - `format.time`: the `{asctime}` placeholder building
+    - `format.json`: the final JSON serialization (only for JSON formatters)
+    - `write`: the handler `emit()` without the formatting
+
+    Stages are aggregated per output (key: `index:OutputClassName`) and for stlog
+    loggers (key: `adapter`).
+
+    The instrumentation is done at the instance level for outputs
+    (and at the class level for `stlog.adapter.StLogLoggerAdapter`) when the
+    profiler is started, and it's completely removed when it's stopped.
+
+    Note: outputs configured after `start()` are not profiled.
+
+    Attributes:
+        every: sampling interval (1 => all records are profiled).
+
+    """
+
+    def __init__(self, every: int = 1000):
+        if every < 1:
+            raise StlogError("every must be >= 1")
+        self.every = every
+        self.profiles: dict[str, _Profile] = {}
+        self._restore: list[Callable[[], None]] = []
+
+    def _patch(self, obj: Any, name: str, wrapper: Callable) -> None:
+        if name in vars(obj):
+            previous = vars(obj)[name]
+            self._restore.append(lambda: setattr(obj, name, previous))
+        else:
+            self._restore.append(lambda: delattr(obj, name))
+        setattr(obj, name, wrapper)
+
+    def _make_stage_wrapper(
+        self, profile: _Profile, stage: str, orig: Callable
+    ) -> Callable:
+        perf_counter_ns = time.perf_counter_ns
+
+        def wrapper(*args, **kwargs):
+            if not profile.is_sampled():
+                return orig(*args, **kwargs)
+            before = perf_counter_ns()
+            try:
+                return orig(*args, **kwargs)
+            finally:
+                elapsed = perf_counter_ns() - before
+                profile.add(stage, elapsed)
+                if stage == "format":
+                    profile.local.format_ns += elapsed
+
+        return wrapper
+
+    def _instrument_output(self, profile: _Profile, output: Any) -> None:
+        perf_counter_ns = time.perf_counter_ns
+        handler = output.get_handler()
+        orig_handle = handler.handle
+        orig_emit = handler.emit
+
+        def handle(record):
+            profile.counter += 1
+            if profile.counter % profile.every:
+                return orig_handle(record)
+            profile.local.sampled = True
+            profile.local.format_ns = 0
+            before = perf_counter_ns()
+            try:
+                return orig_handle(record)
+            finally:
+                profile.add("handle", perf_counter_ns() - before)
+                profile.local.sampled = False
+
+        def emit(record):
+            if not profile.is_sampled():
+                return orig_emit(record)
+            before = perf_counter_ns()
+            try:
+                return orig_emit(record)
+            finally:
+                elapsed = perf_counter_ns() - before
+                profile.add("write", elapsed - profile.local.format_ns)
+
+        self._patch(handler, "handle", handle)
+        self._patch(handler, "emit", emit)
+        self._patch(
+            handler,
+            "filter",
+            self._make_stage_wrapper(profile, "filters", handler.filter),
+        )
+        for filter in handler.filters:
+            if isinstance(filter, ContextReinjectFilter):
+                self._patch(
+                    filter,
+                    "filter",
+                    self._make_stage_wrapper(
+                        profile, "filters.context_reinject", filter.filter
+                    ),
+                )
+        formatter = handler.formatter
+        if formatter is None:
+            return
+        for name, stage in (
+            ("format", "format"),
+            ("_make_extras_string", "format.extras"),
+            ("formatTime", "format.time"),
+            ("json_serialize", "format.json"),
+        ):
+            orig = getattr(formatter, name, None)
+            if orig is not None:
+                self._patch(
+                    formatter, name, self._make_stage_wrapper(profile, stage, orig)
+                )
+
+    def _instrument_adapter(self, profile: _Profile) -> None:
+        perf_counter_ns = time.perf_counter_ns
+        orig_process = StLogLoggerAdapter.process
+        orig_is_enabled_for = StLogLoggerAdapter.isEnabledFor
+        counters = {"process": 0, "level_check": 0}
+
+        def sampled(stage: str, orig: Callable) -> Callable:
+            def wrapper(*args, **kwargs):
+                counters[stage] += 1
+                if counters[stage] % profile.every:
+                    return orig(*args, **kwargs)
+                before = perf_counter_ns()
+                try:
+                    return orig(*args, **kwargs)
+                finally:
+                    profile.add(f"adapter.{stage}", perf_counter_ns() - before)
+
+            return wrapper
+
+        self._patch(StLogLoggerAdapter, "process", sampled("process", orig_process))
+        self._patch(
+            StLogLoggerAdapter,
+            "isEnabledFor",
+            sampled("level_check", orig_is_enabled_for),
+        )
+
+    def start(self) -> Profiler:
+        """Instrument the configured outputs and stlog loggers."""
+        if self._restore:
+            raise StlogError("the profiler is already started")
+        self.profiles = {}
+        profile = _Profile(self.every)
+        self.profiles[ADAPTER_KEY] = profile
+        self._instrument_adapter(profile)
+        for index, output in enumerate(GLOBAL_LOGGING_CONFIG._outputs):
+            profile = _Profile(self.every)
+            self.profiles[_output_key(index, output)] = profile
+            self._instrument_output(profile, output)
+        return self
+
+    def stop(self) -> None:
+        """Remove all the instrumentation (collected data are kept)."""
+        for restore in reversed(self._restore):
+            restore()
+        self._restore = []
+
+    def __enter__(self) -> Profiler:
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def snapshot(self) -> dict[str, dict[str, dict[str, Any]]]:
+        """Get collected data as a dict "output key => stage => histogram snapshot"."""
+        return {
+            key: {
+                stage: histogram.snapshot()
+                for stage, histogram in sorted(profile.stages.items())
+            }
+            for key, profile in self.profiles.items()
+            if profile.stages
+        }
+
+    def dump(self, format: str = "table") -> str:
+        """Dump collected data as a text table (`format="table"`) or as JSON (`format="json"`)."""
+        snapshot = self.snapshot()
+        if format == "json":
+            return json.dumps(snapshot, indent=4, sort_keys=True)
+        if format != "table":
+            raise StlogError(f"unknown dump format: {format}")
+        lines = [
+            f"{'output':<24s} {'stage':<26s} {'samples':>8s} {'avg_ns':>10s} {'max_ns':>10s}"
+        ]
+        for key, stages in snapshot.items():
+            for stage, histogram in stages.items():
+                lines.append(
+                    f"{key:<24s} {stage:<26s} {histogram['count']:>8d} "
+                    f"{histogram['avg_ns']:>10d} {histogram['max_ns']:>10d}"
+                )
+        return "\n".join(lines)
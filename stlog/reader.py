@@ -0,0 +1,639 @@
+from __future__ import annotations
+
+import calendar
+import heapq
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import IO, Any, Iterable, Iterator, Sequence
+
+from stlog.base import (
+    RESERVED_ATTRS,
+    STLOG_CONTEXT_DEF_KEY,
+    STLOG_CONTEXT_REF_KEY,
+    STLOG_CONTEXT_VALUES_KEY,
+    STLOG_EXTRA_KEY,
+    StlogError,
+)
+from stlog.compressed import GzipReader, is_gzip
+from stlog.parser import parse_logfmt
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+TIME_KEYS = ("time", "timestamp")
+LEVEL_KEYS = ("level", "severity")
+LOGGER_KEY = "logger"
+MESSAGE_KEY = "message"
+SOURCE_KEY = "source"
+EXC_INFO_KEY = "exc_info"
+STACK_INFO_KEY = "stack_info"
+_SPECIAL_KEYS = frozenset(
+    (
+        *TIME_KEYS,
+        *LEVEL_KEYS,
+        LOGGER_KEY,
+        MESSAGE_KEY,
+        SOURCE_KEY,
+        EXC_INFO_KEY,
+        STACK_INFO_KEY,
+    )
+)
+# mapping between stlog JSON "source" keys and LogRecord attributes
+_SOURCE_TO_RECORD_ATTRS = {
+    "path": "pathname",
+    "lineno": "lineno",
+    "module": "module",
+    "funcName": "funcName",
+    "process": "process",
+    "processName": "processName",
+    "thread": "thread",
+    "threadName": "threadName",
+}
+# record attributes of the running process (not the one of the log entry)
+_RUNTIME_RECORD_ATTRS = ("process", "processName", "thread", "threadName")
+_TIME_CACHE: dict[str, float] = {}
+_TIME_CACHE_MAX_SIZE = 10000
+
+
+@dataclass
+class LogEntry:
+    """A log entry read back from a stlog JSON or logfmt output.
+
+    Attributes:
+        time: the timestamp (as an epoch float), None if not found or not parsable.
+        level: the level name (uppercase).
+        logger: the logger name.
+        message: the (already formatted) message.
+        extras: extra key/values.
+        source: source information (JSON only, see `stlog.formatter.DEFAULT_STLOG_JSON_FORMAT`).
+        exc_info: the formatted exception (if any).
+        stack_info: the formatted stack (if any).
+
+    """
+
+    time: float | None = None
+    level: str = "NOTSET"
+    logger: str = "root"
+    message: str = ""
+    extras: dict[str, Any] = field(default_factory=dict)
+    source: dict[str, Any] = field(default_factory=dict)
+    exc_info: str | None = None
+    stack_info: str | None = None
+
+    @property
+    def levelno(self) -> int:
+        return get_levelno(self.level)
+
+    def to_log_record(self) -> logging.LogRecord:
+        """Build a `logging.LogRecord` (with stlog extras) to be rendered by any stlog formatter.
+
+        Process and thread attributes not found in `source` are None (as the ones of
+        the reading process would be wrong).
+        """
+        record = logging.LogRecord(
+            name=self.logger,
+            level=self.levelno,
+            pathname=self.source.get("path") or "",
+            lineno=self.source.get("lineno") or 0,
+            msg=self.message,
+            args=(),
+            exc_info=None,
+            func=self.source.get("funcName"),
+            sinfo=self.stack_info,
+        )
+        if self.time is not None:
+            record.created = self.time
+            # note: round() to avoid float errors (stlog formatters truncate msecs)
+            record.msecs = round((self.time - int(self.time)) * 1000, 3)
+        for attr in _RUNTIME_RECORD_ATTRS:
+            setattr(record, attr, None)
+        for key, attr in _SOURCE_TO_RECORD_ATTRS.items():
+            if key in self.source and self.source[key] is not None:
+                setattr(record, attr, self.source[key])
+        record.exc_text = self.exc_info
+        extra_keys: set[str] = set()
+        for key, value in self.extras.items():
+            if key in RESERVED_ATTRS or key in record.__dict__:
+                continue
+            setattr(record, key, value)
+            extra_keys.add(key)
+        setattr(record, STLOG_EXTRA_KEY, extra_keys)
+        return record
+
+
+def get_levelno(level: str) -> int:
+    levelno = logging.getLevelName(level.upper())
+    return levelno if isinstance(levelno, int) else logging.NOTSET
+
+
+def parse_time(value: Any) -> float | None:
+    """Parse a stlog timestamp (`2023-03-29T14:48:37Z` or `2023-03-29T14:48:37.123Z`, UTC).
+
+    Other ISO 8601 formats are also accepted (slower). Returns None if not parsable.
+    """
+    if not isinstance(value, str):
+        return None
+    # fast path: cache the expensive part (up to the seconds)
+    prefix = value[0:19]
+    base = _TIME_CACHE.get(prefix)
+    if base is None:
+        try:
+            base = float(
+                calendar.timegm(
+                    (
+                        int(prefix[0:4]),
+                        int(prefix[5:7]),
+                        int(prefix[8:10]),
+                        int(prefix[11:13]),
+                        int(prefix[14:16]),
+                        int(prefix[17:19]),
+                        0,
+                        0,
+                        0,
+                    )
+                )
+            )
+        except ValueError:
+            return _slow_parse_time(value)
+        if len(_TIME_CACHE) >= _TIME_CACHE_MAX_SIZE:
+            _TIME_CACHE.clear()
+        _TIME_CACHE[prefix] = base
+    rest = value[19:]
+    if rest in ("Z", ""):
+        return base
+    if rest[0] == "." and rest[-1] == "Z" and rest[1:-1].isdigit():
+        return base + float(f"0{rest[:-1]}")
+    return _slow_parse_time(value)
+
+
+def _slow_parse_time(value: str) -> float | None:
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        return calendar.timegm(dt.timetuple()) + dt.microsecond / 1_000_000
+    return dt.timestamp()
+
+
+# (kept for compatibility, see `stlog.parser` for the official logfmt parser)
+parse_logfmt_line = parse_logfmt
+
+
+def _first(dct: dict[str, Any], keys: Sequence[str]) -> Any:
+    for key in keys:
+        if key in dct:
+            return dct[key]
+    return None
+
+
+def make_entry(dct: dict[str, Any]) -> LogEntry:
+    """Build a `LogEntry` from a parsed JSON object or logfmt line."""
+    source = dct.get(SOURCE_KEY)
+    level = _first(dct, LEVEL_KEYS)
+    logger = dct.get(LOGGER_KEY)
+    message = dct.get(MESSAGE_KEY)
+    return LogEntry(
+        time=parse_time(_first(dct, TIME_KEYS)),
+        level=str(level).upper() if level is not None else "NOTSET",
+        logger=str(logger) if logger is not None else "root",
+        message=str(message) if message is not None else "",
+        extras={k: v for k, v in dct.items() if k not in _SPECIAL_KEYS},
+        source=source if isinstance(source, dict) else {},
+        exc_info=dct.get(EXC_INFO_KEY) or None,
+        stack_info=dct.get(STACK_INFO_KEY) or None,
+    )
+
+
+def parse_line(line: str, input_format: str = "auto") -> LogEntry | None:
+    """Parse a stlog JSON or logfmt line (None if the line is empty or not parsable).
+
+    Args:
+        line: the line to parse (without the trailing newline).
+        input_format: `json`, `logfmt` or `auto` (JSON if the line starts with `{`).
+
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if input_format == "json" or (input_format == "auto" and line[0] == "{"):
+        try:
+            dct = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(dct, dict):
+            return None
+        return make_entry(dct)
+    if input_format in ("logfmt", "auto"):
+        return make_entry(parse_logfmt_line(line))
+    raise StlogError(f"unknown input format: {input_format}")
+
+
+def iter_lines(
+    fileobj: IO[bytes], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[str]:
+    """Iterate over the (decoded) lines of a binary file object with big chunked reads."""
+    return iter_chunk_lines(iter(lambda: fileobj.read(chunk_size), b""))
+
+
+def iter_chunk_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Iterate over the (decoded) lines of a sequence of chunks of bytes.
+
+    Lines can be split between chunks (the partial last line of a chunk is carried
+    over to the next one).
+    """
+    tail = b""
+    for chunk in chunks:
+        last_newline = chunk.rfind(b"\n")
+        if last_newline == -1:
+            tail += chunk
+            continue
+        data = tail + chunk[0:last_newline]
+        tail = chunk[last_newline + 1 :]
+        yield from data.decode("utf-8", errors="replace").split("\n")
+    if tail:
+        yield tail.decode("utf-8", errors="replace")
+
+
+def _is_safe_for_prefilter(value: str) -> bool:
+    # the value is serialized "as is" in JSON and logfmt outputs
+    # (so we can search it in the raw line before parsing)
+    return (
+        value.isascii()
+        and value.isprintable()
+        and '"' not in value
+        and "\\" not in value
+    )
+
+
+@dataclass
+class EntryFilter:
+    """Filter for `LogEntry` objects.
+
+    Attributes:
+        level: minimal level (name or int), None => no level filtering
+            (an unknown level name raises a `StlogError`).
+        loggers: logger names (a logger matches if it's one of these loggers or one of
+            their children), empty => no logger filtering.
+        since: minimal timestamp (epoch, included), None => no filtering.
+        until: maximal timestamp (epoch, excluded), None => no filtering.
+        where: extras key/values which must match (values are compared as strings).
+
+    """
+
+    level: str | int | None = None
+    loggers: Sequence[str] = field(default_factory=list)
+    since: float | None = None
+    until: float | None = None
+    where: dict[str, str] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._levelno: int | None = None
+        if self.level is not None:
+            self._levelno = (
+                self.level if isinstance(self.level, int) else get_levelno(self.level)
+            )
+            if self._levelno == logging.NOTSET and str(self.level).upper() not in (
+                "0",
+                "NOTSET",
+            ):
+                raise StlogError(f"unknown level: {self.level}")
+        # substrings which must be in the raw line (cheap rejection before parsing)
+        self._prefilter_levels: list[str] = []
+        if self._levelno is not None and self._levelno > logging.NOTSET:
+            self._prefilter_levels = [
+                name
+                for name, levelno in logging._nameToLevel.items()  # type: ignore
+                if levelno >= self._levelno
+            ]
+        self._prefilter_values: list[str] = [
+            v for v in self.where.values() if v and _is_safe_for_prefilter(v)
+        ]
+        self._prefilter_loggers: list[str] = [
+            x for x in self.loggers if _is_safe_for_prefilter(x)
+        ]
+        if len(self._prefilter_loggers) != len(self.loggers):
+            self._prefilter_loggers = []
+
+    def prefilter(self, line: str, values: bool = True) -> bool:
+        """Return False if the raw line can't match (without parsing it).
+
+        Args:
+            line: the raw line.
+            values: if False, don't check `where` values (for example because they
+                can come from a dictionary-encoded context).
+
+        """
+        if values:
+            for value in self._prefilter_values:
+                if value not in line:
+                    return False
+        if self._prefilter_levels and not any(
+            x in line for x in self._prefilter_levels
+        ):
+            return False
+        if self._prefilter_loggers:
+            return any(x in line for x in self._prefilter_loggers)
+        return True
+
+    def match(self, entry: LogEntry) -> bool:  # noqa: PLR0911
+        if self._levelno is not None and entry.levelno < self._levelno:
+            return False
+        if self.loggers and not any(
+            entry.logger == x or entry.logger.startswith(x + ".") for x in self.loggers
+        ):
+            return False
+        if self.since is not None and (entry.time is None or entry.time < self.since):
+            return False
+        if self.until is not None and (entry.time is None or entry.time >= self.until):
+            return False
+        for key, value in self.where.items():
+            if key not in entry.extras:
+                return False
+            extra_value = entry.extras[key]
+            if isinstance(extra_value, bool):
+                extra_value = "true" if extra_value else "false"
+            if str(extra_value) != value:
+                return False
+        return True
+
+
+class ContextRefs:
+    """Re-expand dictionary-encoded contexts (see `stlog.formatter.JsonFormatter.context_refs`).
+
+    Attributes:
+        contexts: already read context definitions (id => context values).
+
+    """
+
+    def __init__(self):
+        self.contexts: dict[Any, dict[str, Any]] = {}
+
+    def process(self, entry: LogEntry) -> bool:
+        """Process an entry: store a context definition or expand a context reference (in place).
+
+        Returns:
+            False if the entry is a context definition (and not a real log entry).
+
+        """
+        extras = entry.extras
+        if STLOG_CONTEXT_DEF_KEY in extras:
+            values = extras.get(STLOG_CONTEXT_VALUES_KEY)
+            self.contexts[extras[STLOG_CONTEXT_DEF_KEY]] = (
+                values if isinstance(values, dict) else {}
+            )
+            return False
+        if STLOG_CONTEXT_REF_KEY in extras:
+            context = self.contexts.get(extras[STLOG_CONTEXT_REF_KEY])
+            if context is not None:
+                # (the record values have the priority)
+                entry.extras = {
+                    **context,
+                    **{k: v for k, v in extras.items() if k != STLOG_CONTEXT_REF_KEY},
+                }
+        return True
+
+
+def read_entries(
+    lines: Iterable[str],
+    input_format: str = "auto",
+    entry_filter: EntryFilter | None = None,
+    context_refs: ContextRefs | None = None,
+) -> Iterator[LogEntry]:
+    """Parse (and filter) stlog JSON or logfmt lines.
+
+    Unparsable lines are ignored. Dictionary-encoded contexts (see
+    `stlog.formatter.JsonFormatter.context_refs`) are re-expanded (pass the same
+    `context_refs` object to successive calls reading the same stream).
+    """
+    if context_refs is None:
+        context_refs = ContextRefs()
+    for line in lines:
+        if (
+            entry_filter is not None
+            and not entry_filter.prefilter(line, values=not context_refs.contexts)
+            and STLOG_CONTEXT_DEF_KEY not in line
+        ):
+            continue
+        entry = parse_line(line, input_format)
+        if entry is None:
+            continue
+        if not context_refs.process(entry):
+            continue
+        if entry_filter is not None and not entry_filter.match(entry):
+            continue
+        yield entry
+
+
+def open_input(path: str) -> IO[bytes]:
+    """Open a log file (or stdin if `path` is `-`) in binary mode."""
+    if path == "-":
+        return sys.stdin.buffer
+    return open(path, "rb")
+
+
+def read_files(
+    paths: Iterable[str],
+    input_format: str = "auto",
+    entry_filter: EntryFilter | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[LogEntry]:
+    """Read (and filter) `LogEntry` objects from log files (`-` means stdin).
+
+    Files of the compact binary output (see `stlog.binary`) are detected automatically
+    (with the `auto` input format). Gzip compressed files (see `stlog.compressed`)
+    are decompressed on the fly (whatever the input format).
+    """
+    for path in paths:
+        raw_fileobj = open_input(path)
+        fileobj = raw_fileobj
+        try:
+            if is_gzip(fileobj):
+                fileobj = GzipReader(fileobj)  # type: ignore
+            if input_format in ("auto", "binary"):
+                from stlog.binary import is_binary, read_binary
+
+                if input_format == "binary" or is_binary(fileobj):
+                    yield from read_binary(fileobj, entry_filter, chunk_size)
+                    continue
+            yield from read_entries(
+                iter_lines(fileobj, chunk_size), input_format, entry_filter
+            )
+        finally:
+            if raw_fileobj is not sys.stdin.buffer:
+                raw_fileobj.close()
+
+
+def get_rotated_paths(path: str) -> list[str]:
+    """Return the existing files of a rotated set (oldest first).
+
+    For example: `["app.log.2", "app.log.1", "app.log"]` for `app.log`
+    (see `stlog.output.RotatingFileOutput`).
+    """
+    rotated: list[str] = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        rotated.append(f"{path}.{i}")
+        i += 1
+    rotated.reverse()
+    return [*rotated, path]
+
+
+def _with_time_key(entries: Iterable[LogEntry]) -> Iterator[tuple[float, LogEntry]]:
+    # entries without time keep the time of the previous entry (of the same source)
+    last = float("-inf")
+    for entry in entries:
+        if entry.time is not None:
+            last = entry.time
+        yield (last, entry)
+
+
+def _time_key(item: tuple[float, LogEntry]) -> float:
+    return item[0]
+
+
+def merge_entries(sources: Sequence[Iterable[LogEntry]]) -> Iterator[LogEntry]:
+    """Merge several (time ordered) sources of entries into a single time ordered stream.
+
+    This is a streaming k-way merge (with a heap): only one entry per source is kept
+    in memory. For the same time, entries of the first sources are returned first.
+    """
+    for _, entry in heapq.merge(*[_with_time_key(x) for x in sources], key=_time_key):
+        yield entry
+
+
+def merge_files(
+    paths: Sequence[str],
+    input_format: str = "auto",
+    entry_filter: EntryFilter | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[LogEntry]:
+    """Read (and filter) `LogEntry` objects from several log files ordered by time.
+
+    Each file must be time ordered (for example: rotated files or one file per
+    worker process).
+    """
+    return merge_entries(
+        [read_files([x], input_format, entry_filter, chunk_size) for x in paths]
+    )
+
+
+class _FollowedFile:
+    """A file followed (`tail -f` style) across rotations and truncations."""
+
+    def __init__(self, path: str, from_start: bool, chunk_size: int):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._file: IO[bytes] | None = None
+        self._inode: tuple[int, int] | None = None
+        self._tail = b""
+        self._open(from_start)
+
+    def _open(self, from_start: bool) -> None:
+        try:
+            fileobj = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        st = os.fstat(fileobj.fileno())
+        self._inode = (st.st_dev, st.st_ino)
+        if not from_start:
+            fileobj.seek(0, os.SEEK_END)
+        self._file = fileobj
+        self._tail = b""
+
+    def _read_available(self) -> Iterator[str]:
+        assert self._file is not None
+        while True:
+            chunk = self._file.read(self.chunk_size)
+            if not chunk:
+                return
+            data = self._tail + chunk
+            last_newline = data.rfind(b"\n")
+            if last_newline == -1:
+                self._tail = data
+                continue
+            self._tail = data[last_newline + 1 :]
+            yield from (
+                data[0:last_newline].decode("utf-8", errors="replace").split("\n")
+            )
+
+    def read_lines(self) -> Iterator[str]:
+        """Read new complete lines (partial lines are kept for the next call)."""
+        if self._file is None:
+            # the file didn't exist yet
+            self._open(True)
+            if self._file is None:
+                return
+        yield from self._read_available()
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # rotated but not recreated yet
+            return
+        if (st.st_dev, st.st_ino) != self._inode:
+            # rotated => let's drain the old file and then switch to the new one
+            yield from self._read_available()
+            if self._tail:
+                yield self._tail.decode("utf-8", errors="replace")
+            self.close()
+            self._open(True)
+            if self._file is not None:
+                yield from self._read_available()
+        elif self._file is not None and st.st_size < self._file.tell():
+            # truncated
+            self._file.seek(0)
+            self._tail = b""
+            yield from self._read_available()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def follow_files(  # noqa: PLR0913
+    paths: Sequence[str],
+    input_format: str = "auto",
+    entry_filter: EntryFilter | None = None,
+    poll_interval: float = 0.5,
+    from_start: bool = False,
+    stop_event: threading.Event | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[LogEntry]:
+    """Follow (`tail -f` style) log files across rotations.
+
+    New entries of all files are polled every `poll_interval` seconds and returned
+    (time ordered for each poll). The iteration stops only when `stop_event` is set.
+
+    Args:
+        paths: log files to follow (they may not exist yet).
+        input_format: input format (`auto`, `json` or `logfmt`).
+        entry_filter: optional filter.
+        poll_interval: poll interval (in seconds) when there is no new line.
+        from_start: if True, existing lines are read first (else, only new lines are read).
+        stop_event: optional event to stop following.
+        chunk_size: size of reads (in bytes).
+
+    """
+    files = [_FollowedFile(x, from_start, chunk_size) for x in paths]
+    # (context definitions must be kept between polls)
+    refs = [ContextRefs() for _ in files]
+    try:
+        while stop_event is None or not stop_event.is_set():
+            sources = [
+                list(read_entries(x.read_lines(), input_format, entry_filter, r))
+                for x, r in zip(files, refs)
+            ]
+            if any(sources):
+                yield from merge_entries(sources)
+            elif stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+    finally:
+        for x in files:
+            x.close()
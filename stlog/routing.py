@@ -0,0 +1,181 @@
+"""Routing of records to child handlers through a (lazily compiled) dispatch table.
+
+Routing rules (level range, logger name prefixes, context key values) are compiled
+once. The "level and logger name" part of the rules is resolved per distinct
+`(levelno, logger name)` couple and cached in a dict (the dispatch table), so the
+routing of a record costs one dict lookup (plus the check of the context conditions
+of the candidate rules, if any) instead of the level check and the filter chain of
+every configured handler.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Iterable, Mapping, Sequence
+
+from stlog.base import StlogError
+
+DEFAULT_CACHE_SIZE = 4096
+_MISSING = object()
+
+
+def _check_level(level: int | str) -> int:
+    try:
+        return logging._checkLevel(level)  # type: ignore
+    except (ValueError, TypeError) as e:
+        raise StlogError(f"invalid level: {level}") from e
+
+
+def _compile_values(value: Any) -> frozenset:
+    # a single value or a collection of accepted values
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return frozenset(value)
+    return frozenset((value,))
+
+
+class Rule:
+    """A compiled routing rule (to a child handler).
+
+    Attributes:
+        handler: the child handler.
+        min_level: the minimum level (included).
+        max_level: the maximum level (included), None means "no maximum".
+        loggers: the logger name prefixes (in the logging hierarchy sense: `foo` matches
+            `foo` and `foo.bar` but not `foobar`), empty means "all loggers".
+        context: dict "context key => accepted values" (all keys must match).
+
+    """
+
+    def __init__(
+        self,
+        handler: logging.Handler,
+        min_level: int | str = logging.NOTSET,
+        max_level: int | str | None = None,
+        loggers: Iterable[str] = (),
+        context: Mapping[str, Any] | None = None,
+    ):
+        self.handler = handler
+        self.min_level = _check_level(min_level)
+        self.max_level = _check_level(max_level) if max_level is not None else None
+        self.loggers = tuple(loggers)
+        self.context = {k: _compile_values(v) for k, v in (context or {}).items()}
+
+    def match_static(self, levelno: int, name: str) -> bool:
+        """Check the level and logger name part of the rule."""
+        if levelno < self.min_level:
+            return False
+        if self.max_level is not None and levelno > self.max_level:
+            return False
+        if not self.loggers:
+            return True
+        return any(
+            name == prefix or name.startswith(prefix + ".") for prefix in self.loggers
+        )
+
+    def match_context(self, record: logging.LogRecord) -> bool:
+        """Check the context part of the rule."""
+        for key, values in self.context.items():
+            try:
+                if getattr(record, key, _MISSING) not in values:
+                    return False
+            except TypeError:  # unhashable value
+                return False
+        return True
+
+
+class RoutingHandler(logging.Handler):
+    """A logging handler sending each record only to the matching child handlers.
+
+    A record is sent (once) to the handlers of all matching rules, or to the
+    `default` handler (if any) when no rule matches.
+
+    Attributes:
+        rules: the (compiled) routing rules.
+        default: the handler for records matched by no rule (None means "dropped").
+        cache_size: the maximum number of entries of the dispatch table (the table is
+            cleared when full).
+
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[Rule],
+        default: logging.Handler | None = None,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+    ):
+        super().__init__()
+        self.rules = tuple(rules)
+        self.default = default
+        self.cache_size = cache_size
+        self._table: dict[
+            tuple[int, str], tuple[tuple[logging.Handler, ...], tuple[Rule, ...]]
+        ] = {}
+
+    def _compile(
+        self, levelno: int, name: str
+    ) -> tuple[tuple[logging.Handler, ...], tuple[Rule, ...]]:
+        # => (handlers without context conditions, rules with context conditions)
+        handlers: list[logging.Handler] = []
+        conditional: list[Rule] = []
+        for rule in self.rules:
+            if not rule.match_static(levelno, name):
+                continue
+            if rule.context:
+                conditional.append(rule)
+            elif rule.handler not in handlers:
+                handlers.append(rule.handler)
+        # (a conditional rule is useless if its handler is already selected)
+        return tuple(handlers), tuple(
+            r for r in conditional if r.handler not in handlers
+        )
+
+    def get_handlers(self, record: logging.LogRecord) -> Sequence[logging.Handler]:
+        """Get the handlers the record must be sent to."""
+        key = (record.levelno, record.name)
+        entry = self._table.get(key)
+        if entry is None:
+            entry = self._compile(*key)
+            if len(self._table) >= self.cache_size:
+                self._table.clear()
+            self._table[key] = entry
+        handlers, conditional = entry
+        if conditional:
+            res = list(handlers)
+            for rule in conditional:
+                if rule.handler not in res and rule.match_context(record):
+                    res.append(rule.handler)
+            handlers = tuple(res)
+        if not handlers and self.default is not None:
+            return (self.default,)
+        return handlers
+
+    def handle(self, record: logging.LogRecord) -> bool:  # type: ignore
+        # same as logging.Handler.handle() but without the handler lock
+        # (the child handlers use their own locks)
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        if rv:
+            self.emit(record)
+        return bool(rv)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        for handler in self.get_handlers(record):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _children(self) -> list[logging.Handler]:
+        res: list[logging.Handler] = []
+        for handler in [r.handler for r in self.rules] + [self.default]:
+            if handler is not None and handler not in res:
+                res.append(handler)
+        return res
+
+    def flush(self) -> None:
+        for handler in self._children():
+            handler.flush()
+
+    def close(self) -> None:
+        for handler in self._children():
+            handler.close()
+        super().close()
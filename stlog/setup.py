@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import logging
 import os
+import signal
 import sys
 import traceback
 import types
@@ -9,7 +10,7 @@ import typing
 import warnings
 
 from stlog.adapter import getLogger
-from stlog.base import GLOBAL_LOGGING_CONFIG, check_env_false
+from stlog.base import GLOBAL_LOGGING_CONFIG, StlogError, check_env_false
 from stlog.formatter import (
     DEFAULT_STLOG_GCP_JSON_FORMAT,
     JsonFormatter,
@@ -147,8 +148,10 @@ def setup(  # noqa: PLR0913
     # Add configured handlers
     if outputs is None:
         outputs = _make_default_outputs()
+    outputs = list(outputs)
     for out in outputs:
         root_logger.addHandler(out.get_handler())
+    GLOBAL_LOGGING_CONFIG._outputs = outputs
 
     root_logger.setLevel(level)
 
@@ -163,10 +166,128 @@ def setup(  # noqa: PLR0913
 
     for lgger, lvel in extra_levels.items():
         logging.getLogger(lgger).setLevel(lvel)
+    GLOBAL_LOGGING_CONFIG._extra_levels = dict(extra_levels)
 
     GLOBAL_LOGGING_CONFIG.setup = True
 
 
+def _check_level(level: str | int) -> None:
+    try:
+        logging._checkLevel(level)  # type: ignore
+    except (ValueError, TypeError) as e:
+        raise StlogError(f"invalid level: {level}") from e
+
+
+def reconfigure(  # noqa: PLR0912
+    *,
+    level: str | int | None = None,
+    extra_levels: typing.Mapping[str, str | int] | None = None,
+    outputs_levels: typing.Mapping[int, str | int | None] | None = None,
+    outputs_filters: typing.Mapping[
+        int,
+        typing.Iterable[typing.Callable[[logging.LogRecord], bool] | logging.Filter],
+    ]
+    | None = None,
+) -> None:
+    """Change the logging configuration at runtime (without rebuilding handlers).
+
+    Contrary to `setup()`, configured handlers are reused as is (no file is reopened,
+    no buffered state is lost). All given values are checked before applying anything,
+    then all changes are applied under the global logging lock.
+
+    `setup()` must have been called before.
+
+    Args:
+        level: the new root log level (None => no change).
+        extra_levels: the new dict "logger name => log level" (None => no change),
+            loggers overridden by a previous `extra_levels` but not present in this
+            new one are reset to the root log level.
+        outputs_levels: dict "output index (in `setup()` outputs) => new level"
+            (None as level means "use the global logging level").
+        outputs_filters: dict "output index (in `setup()` outputs) => new filters list".
+
+    """
+    if not GLOBAL_LOGGING_CONFIG.setup:
+        raise StlogError("setup() must be called before reconfigure()")
+    outputs = GLOBAL_LOGGING_CONFIG._outputs
+    if level is not None:
+        _check_level(level)
+    for lvel in (extra_levels or {}).values():
+        _check_level(lvel)
+    for index in list(outputs_levels or {}) + list(outputs_filters or {}):
+        if not 0 <= index < len(outputs):
+            raise StlogError(f"invalid output index: {index}")
+    for lvel_or_none in (outputs_levels or {}).values():
+        if lvel_or_none is not None:
+            _check_level(lvel_or_none)
+    with logging._lock:  # type: ignore
+        if level is not None:
+            logging.getLogger(None).setLevel(level)
+        if extra_levels is not None:
+            for lgger in GLOBAL_LOGGING_CONFIG._extra_levels:
+                if lgger not in extra_levels:
+                    logging.getLogger(lgger).setLevel(logging.NOTSET)
+            for lgger, lvel in extra_levels.items():
+                logging.getLogger(lgger).setLevel(lvel)
+            GLOBAL_LOGGING_CONFIG._extra_levels = dict(extra_levels)
+        for index, lvel_or_none in (outputs_levels or {}).items():
+            outputs[index].set_level(lvel_or_none)
+        for index, filters in (outputs_filters or {}).items():
+            outputs[index].set_filters(filters)
+
+
+def _get_current_configuration() -> dict[str, typing.Any]:
+    return {
+        "level": logging.getLogger(None).level,
+        "extra_levels": dict(GLOBAL_LOGGING_CONFIG._extra_levels),
+        "outputs_levels": {
+            i: out.level for i, out in enumerate(GLOBAL_LOGGING_CONFIG._outputs)
+        },
+    }
+
+
+def install_reconfigure_signal_handler(
+    signum: int | None = None,
+    *,
+    level: str | int | None = "DEBUG",
+    extra_levels: typing.Mapping[str, str | int] | None = None,
+    outputs_levels: typing.Mapping[int, str | int | None] | None = None,
+) -> typing.Any:
+    """Install a signal handler to toggle a "diagnostic" configuration at runtime.
+
+    The first signal applies the given configuration (with `reconfigure()`), the next one
+    restores the previous configuration, and so on. Example: `kill -USR1 <pid>`.
+
+    Note: it must be called from the main thread (python signal handlers limitation).
+
+    Args:
+        signum: the signal to use (None => SIGUSR1).
+        level: the root log level to apply (None => no change).
+        extra_levels: the `extra_levels` to apply (None => no change).
+        outputs_levels: the outputs levels to apply (None => no change).
+
+    Returns:
+        The previous signal handler.
+
+    """
+    if signum is None:
+        if not hasattr(signal, "SIGUSR1"):
+            raise StlogError("SIGUSR1 is not available on this platform")
+        signum = signal.SIGUSR1
+    saved: list[dict[str, typing.Any]] = []
+
+    def _signal_handler(signum, frame):
+        if saved:
+            reconfigure(**saved.pop())
+        else:
+            saved.append(_get_current_configuration())
+            reconfigure(
+                level=level, extra_levels=extra_levels, outputs_levels=outputs_levels
+            )
+
+    return signal.signal(signum, _signal_handler)
+
+
 ROOT_LOGGER = getLogger("root")
 
 
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import logging
+import threading
+
+import pytest
+
+from stlog import LogContext, getLogger, setup
+from stlog.aio import drain
+from stlog.base import StlogError
+from stlog.formatter import JsonFormatter
+from stlog.output import AsyncioOutput, StreamOutput
+
+
+class BlockingStream(io.StringIO):
+    """Stream whose writes block until `released` is set (stalled consumer)."""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.released = threading.Event()
+
+    def write(self, s: str) -> int:
+        self.entered.set()
+        self.released.wait(10)
+        return super().write(s)
+
+
+def _lines(stream: io.StringIO) -> list[dict]:
+    return [json.loads(x) for x in stream.getvalue().splitlines()]
+
+
+def test_asyncio_output():
+    stream = BlockingStream()
+    output = AsyncioOutput(
+        output=StreamOutput(stream=stream, formatter=JsonFormatter(context_refs=True))
+    )
+    setup(outputs=[output])
+    logger = getLogger("foo")
+
+    async def request(i: int):
+        LogContext.add(request_id=f"req{i}")
+        logger.info("request", i=i)
+        await asyncio.sleep(0)
+        logging.getLogger("bar").info("standard logging")
+
+    async def main():
+        await asyncio.gather(*[request(i) for i in range(10)])
+        # the writer is blocked (in its thread) but the event loop keeps running
+        loop = asyncio.get_running_loop()
+        assert await loop.run_in_executor(None, stream.entered.wait, 10)
+        assert stream.getvalue() == ""
+        stream.released.set()
+        # from another thread
+        thread = threading.Thread(target=lambda: logger.info("from a thread"))
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0)
+        await output.drain()
+        assert len(stream.getvalue().splitlines()) > 20  # (+ context definitions)
+        logger.info("last")
+        await drain()
+
+    LogContext.reset_context()
+    asyncio.run(main())
+    records = [x for x in _lines(stream) if "message" in x]
+    definitions = {
+        x["ctx_def"]: x["ctx_values"] for x in _lines(stream) if "ctx_def" in x
+    }
+    assert len(records) == 22
+    assert records[-1]["message"] == "last"
+    for record in records:
+        if record["message"] == "request":
+            # context captured at call time
+            assert definitions[record["ctx"]]["request_id"] == f"req{record['i']}"
+        elif record["message"] == "standard logging":
+            assert "ctx" in record
+        else:
+            assert "ctx" not in record
+    output.get_handler().close()
+
+
+def test_asyncio_output_without_loop():
+    stream = io.StringIO()
+    output = AsyncioOutput(output=StreamOutput(stream=stream))
+    setup(outputs=[output])
+    getLogger("foo").info("no loop => synchronous")
+    assert "synchronous" in stream.getvalue()
+
+    async def main():
+        getLogger("foo").info("queued")
+        assert "queued" not in stream.getvalue()
+
+    # (the writer task is cancelled at the end of the loop => remaining records are written)
+    asyncio.run(main())
+    assert "queued" in stream.getvalue()
+    output.get_handler().close()
+
+
+def test_asyncio_output_bounded_queue():
+    stream = BlockingStream()
+    output = AsyncioOutput(
+        output=StreamOutput(stream=stream, formatter=JsonFormatter()),
+        max_queue_records=5,
+        stats=True,
+    )
+    setup(outputs=[output])
+    logger = getLogger("foo")
+
+    async def main():
+        # (the writer task doesn't run before the first await => full queue)
+        for i in range(20):
+            logger.info("message", i=i)
+        stream.released.set()
+        await output.drain()
+
+    asyncio.run(main())
+    stats = output.get_stats()
+    assert stats is not None and stats.backpressure is not None
+    assert stats.backpressure.dropped_records == 15
+    assert stats.backpressure.backlog_bytes == 0
+    assert stats.backpressure.max_backlog_bytes > 0
+    assert [x["i"] for x in _lines(stream)] == list(range(5))
+    output.get_handler().close()
+
+
+def test_asyncio_output_misuse():
+    with pytest.raises(StlogError):
+        AsyncioOutput(formatter=JsonFormatter())
@@ -0,0 +1,230 @@
+"""Allocation regression tests (tracemalloc).
+
+For each reference scenario, we measure per logged record:
+
+- the peak of transient memory allocated (in bytes) while emitting the record
+- the number of memory blocks still allocated after the record (leaks, growing caches...),
+  for the whole interpreter (`net_blocks`) and for the python allocations traced by
+  tracemalloc (`traced_blocks`, diff of two snapshots, with the allocation sites)
+
+and we fail if it goes over the budget recorded in `alloc_budgets.json`
+(for the running python version, with a small tolerance). When no budget is recorded
+for the running python version, the closest recorded version is used with a wider
+tolerance (the peak bytes depend on the python version, the blocks budgets don't).
+
+Each scenario is measured in a fresh python process because allocations depend
+on the process history (for example, `LogRecord` instances don't share their
+attribute dict keys anymore once records with different extra keys were emitted).
+
+To record new budgets (after a deliberate change or for a new python version):
+
+    STLOG_RECORD_ALLOC_BUDGETS=1 pytest tests/test_allocations.py
+
+"""
+
+from __future__ import annotations
+
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tracemalloc
+from typing import Any, Callable
+
+import pytest
+
+from stlog import LogContext, getLogger, setup
+from stlog.formatter import HumanFormatter, JsonFormatter, LogFmtFormatter
+from stlog.output import StreamOutput
+from tests.utils import NullStream
+
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), "alloc_budgets.json")
+RECORD_MODE = os.environ.get("STLOG_RECORD_ALLOC_BUDGETS", "0") == "1"
+PYTHON_VERSION = ".".join(platform.python_version_tuple()[0:2])
+TOLERANCE = 0.10  # 10%
+OTHER_VERSION_TOLERANCE = 0.50  # 50% (budget recorded for another python version)
+MAX_NET_BLOCKS_GROWTH = 0.1  # tiny (amortized) growth allowed (caches...)
+NUMBER = 200
+
+
+def _setup(formatter: logging.Formatter) -> None:
+    setup(
+        outputs=[StreamOutput(stream=NullStream(), formatter=formatter)],
+        capture_warnings=False,
+        logging_excepthook=None,
+    )
+
+
+def _adapter_json() -> Callable[[], Any]:
+    _setup(JsonFormatter())
+    logger = getLogger("foo")
+    return lambda: logger.info("message %s", "foo", key1="value1", key2=123)
+
+
+def _adapter_human() -> Callable[[], Any]:
+    _setup(HumanFormatter())
+    logger = getLogger("foo")
+    return lambda: logger.info("message %s", "foo", key1="value1", key2=123)
+
+
+def _adapter_logfmt() -> Callable[[], Any]:
+    _setup(LogFmtFormatter())
+    logger = getLogger("foo")
+    return lambda: logger.info("message %s", "foo", key1="value1", key2=123)
+
+
+def _context15_json() -> Callable[[], Any]:
+    _setup(JsonFormatter())
+    LogContext.add(**{f"context_key{i}": f"value{i}" for i in range(15)})
+    logger = getLogger("foo")
+    return lambda: logger.info("message", key1="value1")
+
+
+def _standard_logging_json() -> Callable[[], Any]:
+    _setup(JsonFormatter())
+    LogContext.add(context_key="value")
+    logger = logging.getLogger("foo")
+    return lambda: logger.info("message %s", "foo")
+
+
+def _exception_json() -> Callable[[], Any]:
+    _setup(JsonFormatter())
+    logger = getLogger("foo")
+    try:
+        raise ValueError("foo")
+    except ValueError:
+        exc_info = sys.exc_info()
+    return lambda: logger.error("error", exc_info=exc_info)
+
+
+SCENARIOS: dict[str, Callable[[], Callable[[], Any]]] = {
+    "adapter_json": _adapter_json,
+    "adapter_human": _adapter_human,
+    "adapter_logfmt": _adapter_logfmt,
+    "context15_json": _context15_json,
+    "standard_logging_json": _standard_logging_json,
+    "exception_json": _exception_json,
+}
+
+
+def measure(func: Callable[[], Any], number: int = NUMBER) -> dict[str, Any]:
+    for _ in range(10):  # warmup (caches, lazy properties...)
+        func()
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    for _ in range(number):
+        func()
+    gc.collect()
+    blocks_after = sys.getallocatedblocks()
+    peaks: list[int] = []
+    tracemalloc.start()
+    try:
+        traced_blocks = _traced_blocks_diff(func, number)
+        for _ in range(number):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - current)
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+    return {
+        # median is more stable than the mean (gc, dict resizes...)
+        "peak_bytes": float(peaks[len(peaks) // 2]),
+        "net_blocks": (blocks_after - blocks_before) / number,
+        "traced_blocks": sum(x.count_diff for x in traced_blocks) / number,
+        # (not a budget, to explain a failure)
+        "traced_blocks_sites": [str(x) for x in traced_blocks[0:3]],
+    }
+
+
+def _traced_blocks_diff(
+    func: Callable[[], Any], number: int
+) -> list[tracemalloc.StatisticDiff]:
+    # (tracemalloc must be started)
+    ignore_tracemalloc = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    # (warmup of the filter itself: fnmatch cache...)
+    tracemalloc.take_snapshot().filter_traces(ignore_tracemalloc)
+    gc.collect()
+    before = tracemalloc.take_snapshot().filter_traces(ignore_tracemalloc)
+    for _ in range(number):
+        func()
+    gc.collect()
+    after = tracemalloc.take_snapshot().filter_traces(ignore_tracemalloc)
+    return [x for x in after.compare_to(before, "lineno") if x.count_diff != 0]
+
+
+def measure_in_subprocess(name: str) -> dict[str, Any]:
+    env = dict(os.environ)
+    env["STLOG_UNIT_TESTS_MODE"] = "1"
+    res = subprocess.run(
+        [sys.executable, "-m", "tests.test_allocations", name],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        check=True,
+    )
+    return json.loads(res.stdout)
+
+
+def _load_budgets() -> dict[str, Any]:
+    if not os.path.exists(BUDGETS_PATH):
+        return {}
+    with open(BUDGETS_PATH) as f:
+        return json.load(f)
+
+
+def _get_budget(
+    budgets: dict[str, Any], name: str
+) -> tuple[dict[str, float] | None, float]:
+    # (budget, peak bytes tolerance) for the running python version (or the closest one)
+    if name in budgets.get(PYTHON_VERSION, {}):
+        return budgets[PYTHON_VERSION][name], TOLERANCE
+    versions = [x for x in budgets if name in budgets[x]]
+    if not versions:
+        return None, TOLERANCE
+    minor = int(PYTHON_VERSION.split(".")[1])
+    closest = min(versions, key=lambda x: abs(int(x.split(".")[1]) - minor))
+    return budgets[closest][name], OTHER_VERSION_TOLERANCE
+
+
+@pytest.mark.skipif(
+    not hasattr(tracemalloc, "reset_peak"), reason="python >= 3.9 is required"
+)
+@pytest.mark.parametrize("name", sorted(SCENARIOS.keys()))
+def test_allocations(name):
+    measured = measure_in_subprocess(name)
+    budgets = _load_budgets()
+    if RECORD_MODE:
+        budgets.setdefault(PYTHON_VERSION, {})[name] = {
+            key: measured[key] for key in ("peak_bytes", "net_blocks", "traced_blocks")
+        }
+        with open(BUDGETS_PATH, "w") as f:
+            json.dump(budgets, f, indent=4, sort_keys=True)
+            f.write("\n")
+        return
+    budget, tolerance = _get_budget(budgets, name)
+    if budget is None:
+        pytest.skip(f"no recorded allocation budget for {name}")
+    assert measured["peak_bytes"] <= budget["peak_bytes"] * (1 + tolerance), (
+        f"{name}: peak bytes per record: {measured['peak_bytes']} > {budget['peak_bytes']}"
+    )
+    assert (
+        measured["net_blocks"] <= max(budget["net_blocks"], 0) + MAX_NET_BLOCKS_GROWTH
+    ), f"{name}: leaked blocks per record: {measured['net_blocks']}"
+    assert (
+        measured["traced_blocks"]
+        <= max(budget.get("traced_blocks", 0), 0) + MAX_NET_BLOCKS_GROWTH
+    ), (
+        f"{name}: leaked (traced) blocks per record: {measured['traced_blocks']} "
+        f"(top allocation sites: {measured['traced_blocks_sites']})"
+    )
+
+
+if __name__ == "__main__":
+    print(json.dumps(measure(SCENARIOS[sys.argv[1]]())))
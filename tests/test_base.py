@@ -1,15 +1,18 @@
 from __future__ import annotations
 
 import os
+from typing import Any
 from unittest import mock
 
 import pytest
 
 from stlog.base import (
+    GlobalLoggingConfig,
     StlogError,
     check_false,
     check_json_types_or_raise,
     check_true,
+    exception_fingerprint,
     get_env_context,
     logfmt_format_string,
     logfmt_format_value,
@@ -35,6 +38,7 @@ def test_logfmt_format_string():
     assert logfmt_format_string("foo foo") == '"foo foo"'
     assert logfmt_format_string("foo\nfoo") == '"foo\\nfoo"'
     assert logfmt_format_string("") == '""'
+    assert logfmt_format_string('C:\\foo "\\n"') == '"C:\\\\foo \\"\\\\n\\""'
 
 
 def test_logfmt_format_value():
@@ -72,6 +76,9 @@ def test_get_env_context2():
 
 def test_rich_markup_escape():
     assert rich_markup_escape("[foo]bar[/foo]") == "\\[foo]bar\\[/foo]"
+    assert rich_markup_escape("\\[foo]") == "\\\\\\[foo]"
+    assert rich_markup_escape("no markup [1]") == "no markup [1]"
+    assert rich_markup_escape("no markup") == "no markup"
 
 
 def test_check_true():
@@ -88,3 +95,32 @@ def test_check_false():
     assert check_false("False") is True
     assert check_false("nO") is True
     assert check_false("0") is True
+
+
+def test_program_name():
+    config = GlobalLoggingConfig()
+    assert config._program_name is None  # lazy
+    assert config.program_name
+    assert config._program_name == config.program_name
+    config.program_name = "foo"
+    assert config.program_name == "foo"
+
+
+def _fingerprint_from(filename: str) -> str:
+    namespace: dict[str, Any] = {"__name__": "app.module"}
+    exec(
+        compile('def fail():\n    raise ValueError("boom")\n', filename, "exec"),
+        namespace,
+    )
+    try:
+        namespace["fail"]()
+    except ValueError as e:
+        return exception_fingerprint(type(e), e, e.__traceback__)
+    raise AssertionError()
+
+
+def test_exception_fingerprint_is_path_independent():
+    # (same module installed in different places)
+    a = _fingerprint_from("/srv/venv1/lib/app/module.py")
+    b = _fingerprint_from("/home/user/venv2/lib/app/module.py")
+    assert a == b
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+from stlog import getLogger, setup
+from stlog.base import StlogError
+from stlog.batch import BatchFdHandler, writev_all
+from stlog.formatter import JsonFormatter
+from stlog.output import FileOutput, RotatingFileOutput, StreamOutput
+
+
+def _log(n: int):
+    logger = getLogger("foo")
+    for i in range(n):
+        logger.info("message %s", i, key="é")
+
+
+def test_batch_file_output():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "batch.log")
+        ref_path = os.path.join(tmpdir, "ref.log")
+        output = FileOutput(
+            filename=path,
+            formatter=JsonFormatter(),
+            batch_size=3,
+            flush_interval=0,
+            stats=True,
+        )
+        ref_output = FileOutput(
+            filename=ref_path, formatter=JsonFormatter(), encoding="utf-8"
+        )
+        setup(outputs=[output, ref_output])
+        _log(5)
+        with open(path, "rb") as f:
+            assert len(f.read().splitlines()) == 3  # one full batch
+        output.get_handler().flush()
+        ref_output.get_handler().close()
+        with open(path, "rb") as f, open(ref_path, "rb") as g:
+            assert f.read() == g.read()
+        stats = output.get_stats()
+        assert stats is not None
+        assert stats.emitted == 5
+        assert stats.bytes_written == os.path.getsize(path)
+        assert stats.format_time.count == 5
+        output.get_handler().close()
+        assert isinstance(output.get_handler(), BatchFdHandler)
+        assert output.get_handler().fd == -1  # type: ignore
+
+
+def test_batch_flush_interval():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "batch.log")
+        output = FileOutput(filename=path, batch_size=100, flush_interval=0.01)
+        setup(outputs=[output])
+        _log(1)
+        for _ in range(200):
+            if os.path.getsize(path) > 0:
+                break
+            time.sleep(0.01)
+        assert os.path.getsize(path) > 0
+        output.get_handler().close()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="no fork")
+def test_batch_fork():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "batch.log")
+        output = FileOutput(
+            filename=path, formatter=JsonFormatter(), batch_size=256, flush_interval=0
+        )
+        setup(outputs=[output])
+        getLogger("foo").info("parent")
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            getLogger("foo").info("child")
+            output.get_handler().close()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        output.get_handler().close()
+        with open(path) as f:
+            messages = [json.loads(x)["message"] for x in f.read().splitlines()]
+        assert sorted(messages) == ["child", "parent"]
+
+
+def test_batch_stream_output():
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(write_fd, "w", encoding="utf-8") as stream, os.fdopen(
+        read_fd, "rb"
+    ) as reader:
+        output = StreamOutput(stream=stream, batch_size=10)
+        assert isinstance(output.get_handler(), BatchFdHandler)
+        setup(outputs=[output])
+        _log(3)
+        output.get_handler().flush()
+        assert reader.read1(65536).count(b"\n") == 3
+        output.get_handler().close()
+    # not a real file => classic stream handler
+    output = StreamOutput(stream=io.StringIO(), batch_size=10)
+    assert type(output.get_handler()) is logging.StreamHandler
+
+
+def test_writev_all(monkeypatch):
+    calls = []
+    orig_writev = os.writev
+
+    def writev(fd, buffers):
+        calls.append(len(buffers))
+        # partial writes (at most 3 bytes)
+        data = b"".join(bytes(x) for x in buffers)[:3]
+        return orig_writev(fd, [data])
+
+    monkeypatch.setattr(os, "writev", writev)
+    monkeypatch.setattr("stlog.batch._IOV_MAX", 2)
+    with tempfile.TemporaryFile() as f:
+        writev_all(f.fileno(), [b"foo\n", b"", b"barbaz\n", "é\n".encode()])
+        f.seek(0)
+        assert f.read() == "foo\nbarbaz\né\n".encode()
+    assert max(calls) == 2
+
+
+def test_batch_misuse():
+    with pytest.raises(StlogError):
+        FileOutput(filename="foo.log", batch_size=10, delay=True)
+    with pytest.raises(StlogError):
+        RotatingFileOutput(filename="foo.log", batch_size=10)
+
+
+def _read_available(fd: int) -> bytes:
+    os.set_blocking(fd, False)
+    res = b""
+    while True:
+        try:
+            chunk = os.read(fd, 65536)
+        except BlockingIOError:
+            return res
+        if not chunk:
+            return res
+        res += chunk
+
+
+@pytest.mark.parametrize("policy", ["drop", "spill"])
+def test_non_blocking_stream_output(policy):
+    read_fd, write_fd = os.pipe()
+    with tempfile.TemporaryDirectory() as tmpdir, os.fdopen(
+        write_fd, "w", encoding="utf-8"
+    ) as stream:
+        spill_path = os.path.join(tmpdir, "spill.log")
+        output = StreamOutput(
+            stream=stream,
+            formatter=JsonFormatter(),
+            non_blocking=True,
+            max_backlog_bytes=10000,
+            overflow_policy=policy,
+            spill_path=spill_path,
+            stats=True,
+        )
+        setup(outputs=[output])
+        # nobody reads the pipe => the pipe buffer and then the backlog are full
+        # (but the logging never blocks)
+        _log(5000)
+        stats = output.get_stats()
+        assert stats is not None and stats.backpressure is not None
+        backpressure = stats.backpressure
+        assert 0 < backpressure.backlog_bytes <= 10000
+        assert backpressure.stalls == 1
+        if policy == "drop":
+            assert backpressure.dropped_records > 0
+            assert backpressure.spilled_records == 0
+        else:
+            assert backpressure.dropped_records == 0
+            assert backpressure.spilled_records > 0
+        # the consumer is back
+        data = _read_available(read_fd)
+        output.get_handler().flush()
+        data += _read_available(read_fd)
+        assert backpressure.backlog_bytes == 0
+        assert backpressure.stall_time.count == 1
+        assert "backpressure" in stats.snapshot()
+        lines = data.decode("utf-8").splitlines()
+        assert len(lines) == 5000 - backpressure.dropped_records - (
+            backpressure.spilled_records
+        )
+        assert [json.loads(x)["message"] for x in lines[0:2]] == [
+            "message 0",
+            "message 1",
+        ]
+        if policy == "spill":
+            with open(spill_path) as f:
+                assert len(f.read().splitlines()) == backpressure.spilled_records
+        output.get_handler().close()
+        assert os.get_blocking(write_fd)
+    os.close(read_fd)
+
+
+def test_non_blocking_block_policy():
+    read_fd, write_fd = os.pipe()
+    chunks = []
+
+    def consumer():
+        time.sleep(0.1)  # stalled consumer
+        os.set_blocking(read_fd, True)
+        while True:
+            chunk = os.read(read_fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+    thread = threading.Thread(target=consumer)
+    thread.start()
+    with os.fdopen(write_fd, "w", encoding="utf-8") as stream:
+        output = StreamOutput(
+            stream=stream,
+            non_blocking=True,
+            max_backlog_bytes=10000,
+            overflow_policy="block",
+            block_timeout=10,
+        )
+        setup(outputs=[output])
+        _log(5000)
+        handler = output.get_handler()
+        handler.close()
+        assert handler.backpressure_stats.dropped_records == 0  # type: ignore
+    thread.join()
+    os.close(read_fd)
+    assert b"".join(chunks).count(b"\n") == 5000
+
+
+def test_non_blocking_misuse():
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(write_fd, "w") as stream:
+        with pytest.raises(StlogError):
+            StreamOutput(stream=stream, non_blocking=True, overflow_policy="foo")
+        with pytest.raises(StlogError):
+            StreamOutput(stream=stream, non_blocking=True, overflow_policy="spill")
+        assert os.get_blocking(write_fd)
+    os.close(read_fd)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+
+import pytest
+
+from stlog import LogContext, getLogger, setup
+from stlog.base import StlogError
+from stlog.binary import BinaryDecoder, BinaryFormatter
+from stlog.formatter import JsonFormatter
+from stlog.output import BinaryFileOutput, FileOutput
+from stlog.reader import EntryFilter, read_files
+
+
+def _log():
+    LogContext.reset_context()
+    LogContext.add(service="svc", region="eu")
+    logger = getLogger("foo")
+    for i in range(5):
+        logger.info(
+            "message %s",
+            i,
+            i=i,
+            neg=-i * 1000,
+            f=1.5,
+            b=True,
+            n=None,
+            d={"a": [1, "é"]},
+            s="é \n",
+        )
+    getLogger("bar").warning("warning")
+    try:
+        1 / 0  # noqa: B018
+    except ZeroDivisionError:
+        logger.exception("boom")
+    LogContext.reset_context()
+
+
+def test_binary_roundtrip():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        json_path = os.path.join(tmpdir, "test.json")
+        binary_path = os.path.join(tmpdir, "test.bin")
+        output = BinaryFileOutput(filename=binary_path)
+        setup(
+            outputs=[FileOutput(filename=json_path, formatter=JsonFormatter()), output]
+        )
+        _log()
+        output.get_handler().close()
+        assert os.path.getsize(binary_path) < os.path.getsize(json_path) / 2
+        entries = list(read_files([binary_path]))
+        assert len(entries) == 7
+        assert entries[0].extras == {
+            "service": "svc",
+            "region": "eu",
+            "i": 0,
+            "neg": 0,
+            "f": 1.5,
+            "b": True,
+            "n": None,
+            "d": {"a": [1, "é"]},
+            "s": "é \n",
+        }
+        assert entries[1].extras["neg"] == -1000
+        # rendered back through the JSON formatter => same output
+        formatter = JsonFormatter()
+        with open(json_path) as f:
+            expected = f.read().splitlines()
+        assert [formatter.format(x.to_log_record()) for x in entries] == expected
+        warnings = list(
+            read_files([binary_path], entry_filter=EntryFilter(level="WARNING"))
+        )
+        assert [x.message for x in warnings] == ["warning", "boom"]
+        assert "ZeroDivisionError" in (warnings[1].exc_info or "")
+
+
+def test_binary_decoder_incremental_and_segments():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "test.bin")
+        for _ in range(2):
+            # append mode => 2 segments (with their own string table)
+            output = BinaryFileOutput(filename=path)
+            setup(outputs=[output])
+            _log()
+            output.get_handler().close()
+        with open(path, "rb") as f:
+            data = f.read()
+        decoder = BinaryDecoder()
+        entries = []
+        for i in range(len(data)):
+            entries.extend(decoder.feed(data[i : i + 1]))
+        assert len(entries) == 14
+        assert entries[0].message == entries[7].message
+        assert entries[0].extras == entries[7].extras
+        assert entries == list(read_files([path]))
+        with pytest.raises(StlogError):
+            BinaryDecoder().feed(data[7:])
+
+
+class _FailingStream:
+    """Stream wrapper which writes half of the data then fails (disk full...)."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, data):
+        self._stream.write(data[: len(data) // 2])
+        self._stream.flush()
+        raise OSError("disk full")
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def test_binary_write_and_encoding_errors():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "test.bin")
+        output = BinaryFileOutput(filename=path)
+        setup(outputs=[output])
+        handler = output.get_handler()
+        getLogger("foo").info("before")
+        handler.stream = _FailingStream(handler.stream)  # type: ignore
+        getLogger("bar").info("lost", key="value")
+        getLogger("bar").info("after", key="value")
+        getLogger("baz").info("bad %d", "argument")  # (encoding error)
+        getLogger("baz").info("after encoding error")
+        handler.close()
+        entries = list(read_files([path]))
+        assert [(x.logger, x.message) for x in entries] == [
+            ("foo", "before"),
+            ("bar", "after"),
+            ("baz", "after encoding error"),
+        ]
+        assert entries[1].extras == {"key": "value"}
+
+
+def test_binary_rotation():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "test.bin")
+        output = BinaryFileOutput(filename=path, max_bytes=500, backup_count=10)
+        setup(outputs=[output])
+        for _ in range(3):
+            _log()
+        output.get_handler().close()
+        paths = sorted(x for x in os.listdir(tmpdir))
+        assert len(paths) > 2
+        for name in paths:
+            assert os.path.getsize(os.path.join(tmpdir, name)) <= 500
+        # each file is self-contained
+        count = sum(
+            len(list(read_files([os.path.join(tmpdir, x)], input_format="binary")))
+            for x in paths
+        )
+        assert count == 21
+
+
+def test_binary_formatter_misuse():
+    with pytest.raises(StlogError):
+        BinaryFileOutput(filename="foo.bin", formatter=JsonFormatter(), delay=True)
+    with pytest.raises(StlogError):
+        BinaryFormatter().format(logging.makeLogRecord({"msg": "foo"}))
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import gzip
+import os
+import tempfile
+import time
+
+import pytest
+
+from stlog import getLogger, setup
+from stlog.base import StlogError
+from stlog.formatter import JsonFormatter
+from stlog.output import CompressedFileOutput, FileOutput
+from stlog.reader import get_rotated_paths, read_files
+
+
+def _log(n: int = 100):
+    logger = getLogger("foo")
+    for i in range(n):
+        logger.info("message %s", i, i=i, key="value")
+
+
+def test_compressed_roundtrip():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        json_path = os.path.join(tmpdir, "test.json")
+        gz_path = os.path.join(tmpdir, "test.json.gz")
+        output = CompressedFileOutput(filename=gz_path, formatter=JsonFormatter())
+        setup(
+            outputs=[FileOutput(filename=json_path, formatter=JsonFormatter()), output]
+        )
+        _log()
+        output.get_handler().close()
+        # append mode => a new gzip member
+        output = CompressedFileOutput(filename=gz_path, formatter=JsonFormatter())
+        setup(
+            outputs=[FileOutput(filename=json_path, formatter=JsonFormatter()), output]
+        )
+        _log()
+        output.get_handler().close()
+        with open(json_path, "rb") as f:
+            expected = f.read()
+        assert os.path.getsize(gz_path) < len(expected) / 5
+        with gzip.open(gz_path, "rb") as f:
+            assert f.read() == expected
+        entries = list(read_files([gz_path]))
+        assert len(entries) == 200
+        assert entries[199].extras == {"i": 99, "key": "value"}
+
+
+def test_compressed_sync_flush():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "test.log.gz")
+        output = CompressedFileOutput(filename=path, flush_interval=0)
+        setup(outputs=[output])
+        _log(10)
+        # not closed (no gzip trailer) but decodable up to the last flush
+        assert len(list(read_files([path]))) == 10
+        with pytest.raises(EOFError):
+            with gzip.open(path, "rb") as f:
+                f.read()
+        output.get_handler().close()
+        output = CompressedFileOutput(filename=path, flush_interval=3600)
+        setup(outputs=[output])
+        _log(10)
+        assert len(list(read_files([path]))) == 10  # not flushed yet
+        output.get_handler().flush()
+        assert len(list(read_files([path]))) == 20
+        output.get_handler().close()
+
+
+def test_compressed_periodic_flush():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "test.log.gz")
+        output = CompressedFileOutput(filename=path, flush_interval=0.05)
+        setup(outputs=[output])
+        _log(10)
+        # no more records (quiet period) => flushed by the flusher thread
+        for _ in range(200):
+            if len(list(read_files([path]))) == 10:
+                break
+            time.sleep(0.01)
+        assert len(list(read_files([path]))) == 10
+        output.get_handler().close()
+
+
+def test_compressed_rotation():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "test.log.gz")
+        output = CompressedFileOutput(
+            filename=path, max_bytes=300, backup_count=100, flush_interval=0
+        )
+        setup(outputs=[output])
+        _log(200)
+        output.get_handler().close()
+        paths = get_rotated_paths(path)
+        assert len(paths) > 2
+        # each file is self-contained
+        for x in paths:
+            with gzip.open(x, "rb") as f:
+                assert f.read().endswith(b"\n")
+        assert len(list(read_files(paths))) == 200
+
+
+def test_compressed_time_rotation():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "test.log.gz")
+        output = CompressedFileOutput(
+            filename=path, rotation_interval=0.05, backup_count=10
+        )
+        setup(outputs=[output])
+        _log(1)
+        time.sleep(0.1)
+        _log(1)
+        output.get_handler().close()
+        assert len(get_rotated_paths(path)) == 2
+
+
+def test_compressed_bad_level():
+    with pytest.raises(StlogError):
+        CompressedFileOutput(filename="foo.gz", compress_level=10, delay=True)
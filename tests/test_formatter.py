@@ -1,19 +1,26 @@
 from __future__ import annotations
 
+import io
 import json
 import logging
 
 import pytest
 
+from stlog import LogContext, getLogger, setup
 from stlog.base import STLOG_EXTRA_KEY
 from stlog.formatter import (
     DEFAULT_STLOG_DATE_FORMAT_HUMAN,
     DEFAULT_STLOG_HUMAN_FORMAT,
     DEFAULT_STLOG_LOGFMT_FORMAT,
+    AnsiHumanFormatter,
     HumanFormatter,
     JsonFormatter,
     LogFmtFormatter,
+    RichHumanFormatter,
+    _cached_rich_markup_escape,
 )
+from stlog.kvformatter import LogFmtKVFormatter
+from stlog.output import StreamOutput
 
 
 @pytest.fixture
@@ -73,6 +80,68 @@ def test_human2(log_record, human_formatter):
     assert "_key3=456" not in res
 
 
+def test_ansi_human(log_record):
+    setattr(log_record, STLOG_EXTRA_KEY, ("key1",))
+    log_record.key1 = "value1"
+    res = AnsiHumanFormatter().format(log_record)
+    assert "\x1b[34m  INFO  \x1b[0m \x1b[1mfoo foo bar bar\x1b[0m" in res
+    assert res.endswith("\x1b[33mkey1\x1b[0m\x1b[1;31m=\x1b[0m\x1b[35mvalue1\x1b[0m")
+    assert not hasattr(log_record, "ansi_level_style")
+
+
+def test_rich_human_static_message_cache(log_record):
+    formatter = RichHumanFormatter(fmt="{rich_escaped_message}")
+    log_record.msg = "user [john] logged in"
+    log_record.args = ()
+    _cached_rich_markup_escape.cache_clear()
+    assert formatter.format(log_record) == "user \\[john] logged in"
+    assert formatter.format(log_record) == "user \\[john] logged in"
+    info = _cached_rich_markup_escape.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+    # message with args => escaped after formatting (not cached)
+    log_record.msg = "user %s logged in [%s]"
+    log_record.args = ("[john]", "admin")
+    assert formatter.format(log_record) == "user \\[john] logged in \\[admin]"
+    assert _cached_rich_markup_escape.cache_info().currsize == 1
+    assert not hasattr(log_record, "rich_escaped_message")
+
+
+def test_rich_human_escaped_extras(log_record):
+    setattr(log_record, STLOG_EXTRA_KEY, ("key",))
+    log_record.key = "[bold]value"
+    formatter = RichHumanFormatter(
+        fmt="{rich_escaped_message}{rich_escaped_extras}",
+        kv_formatter=LogFmtKVFormatter(prefix=" ", suffix=""),
+    )
+    assert formatter.format(log_record) == 'foo foo bar bar key="\\[bold]value"'
+    assert not hasattr(log_record, "rich_escaped_extras")
+    assert not hasattr(log_record, "extras")
+    # (default format) => {rich_escaped_extras} is not computed
+    res = RichHumanFormatter().format(log_record)
+    assert '[repr.attrib_value]"[bold]value"[/repr.attrib_value]' in res
+    assert not hasattr(log_record, "rich_escaped_extras")
+    assert not hasattr(log_record, "rich_escaped_message")
+
+
+@pytest.mark.parametrize(
+    "level_name,style",
+    [
+        ("NOTSET", "logging.level.notset"),
+        ("DEBUG", "logging.level.debug"),
+        ("INFO", "logging.level.info"),
+        ("WARNING", "logging.level.error"),
+        ("ERROR", "logging.level.critical"),
+        ("CRITICAL", "logging.level.critical"),
+        ("CUSTOM", "logging.level.none"),
+    ],
+)
+def test_rich_human_level_style(log_record, level_name, style):
+    log_record.levelname = level_name
+    formatter = RichHumanFormatter(fmt="{rich_level_style}")
+    assert formatter.format(log_record) == style
+    assert not hasattr(log_record, "rich_level_style")
+
+
 def test_truncate_keys(log_record):
     setattr(log_record, STLOG_EXTRA_KEY, ("abcdefghijk", "abc"))
     log_record.abc = "value1"
@@ -116,3 +185,95 @@ def test_logfmt(log_record, logfmt_formatter):
         res
         == 'time=2023-03-29T14:48:37Z logger=name level=INFO message="foo foo bar bar" foo=bar foo2=bar2'
     )
+
+
+def test_json_context_refs():
+    stream = io.StringIO()
+    formatter = JsonFormatter(context_refs=True)
+    setup(outputs=[StreamOutput(stream=stream, formatter=formatter)])
+    LogContext.reset_context()
+    try:
+        LogContext.add(service="svc", _region="eu")
+        logger = getLogger("foo")
+        logger.info("message1", key="value1")
+        logger.info("message2", _region="us")  # overridden context value
+        with LogContext.bind(pod="pod1"):
+            logger.info("message3")
+        logger.info("message4")
+        logging.getLogger("bar").info("message5")  # reinjected context
+    finally:
+        LogContext.reset_context()
+    lines = [json.loads(x) for x in stream.getvalue().splitlines()]
+    ctx1, ctx2 = lines[0]["ctx_def"], lines[3]["ctx_def"]
+    assert ctx1 != ctx2
+    # (ids are prefixed by a random token per process)
+    assert ctx1.split("-")[0] == ctx2.split("-")[0]
+    assert lines[0] == {
+        "ctx_def": ctx1,
+        "ctx_values": {"service": "svc", "region": "eu"},
+    }
+    assert lines[1]["ctx"] == ctx1
+    assert lines[1]["key"] == "value1"
+    assert "service" not in lines[1]
+    assert lines[2]["ctx"] == ctx1
+    assert lines[2]["region"] == "us"
+    assert lines[3] == {
+        "ctx_def": ctx2,
+        "ctx_values": {"service": "svc", "region": "eu", "pod": "pod1"},
+    }
+    assert [x.get("ctx") for x in lines[4:]] == [ctx2, ctx1, ctx1]
+    assert [x["message"] for x in lines[4:]] == [
+        "message3",
+        "message4",
+        "message5",
+    ]
+    formatter.reset_context_refs()
+    assert len(formatter._format_context_definition(ctx1).splitlines()) == 1
+
+
+def _raise(i: int):
+    raise ValueError(f"boom{i}")
+
+
+def test_exception_fingerprint_and_dedup():
+    stream = io.StringIO()
+    default_stream = io.StringIO()
+    setup(
+        outputs=[
+            StreamOutput(
+                stream=stream,
+                formatter=JsonFormatter(
+                    exc_fingerprint_key="exc_fingerprint", exc_dedup_window=60
+                ),
+            ),
+            StreamOutput(
+                stream=stream,
+                formatter=LogFmtFormatter(exc_fingerprint_key="exc_fingerprint"),
+            ),
+            StreamOutput(stream=default_stream, formatter=JsonFormatter()),
+        ]
+    )
+    logger = getLogger("foo")
+    for i in range(3):
+        try:
+            _raise(i)
+        except ValueError:
+            logger.exception("error")
+    try:
+        raise ValueError("other location")
+    except ValueError:
+        logger.exception("error")
+    lines = stream.getvalue().splitlines()
+    json_lines = [json.loads(x) for x in lines if x.startswith("{")]
+    logfmt_lines = [x for x in lines if x.startswith("time=")]
+    fingerprints = [x["exc_fingerprint"] for x in json_lines]
+    assert fingerprints[0] == fingerprints[1] == fingerprints[2] != fingerprints[3]
+    assert "Traceback" in json_lines[0]["exc_info"]
+    assert json_lines[1]["exc_info"] == "ValueError: boom1 (traceback omitted)"
+    assert json_lines[2]["exc_info"] == "ValueError: boom2 (traceback omitted)"
+    assert "Traceback" in json_lines[3]["exc_info"]
+    assert f"exc_fingerprint={fingerprints[2]}" in logfmt_lines[2]
+    assert "Traceback" in logfmt_lines[2]  # (no dedup window)
+    # (no fingerprint by default)
+    for line in default_stream.getvalue().splitlines():
+        assert "exc_fingerprint" not in json.loads(line)
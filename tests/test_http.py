@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from stlog import getLogger, setup
+from stlog.base import StlogError
+from stlog.net import HttpHandler
+from stlog.output import HttpOutput
+
+
+class Endpoint:
+    """Local `http.server` ingestion endpoint stand-in which collects received lines."""
+
+    def __init__(self):
+        endpoint = self
+        self.status = 200
+        self.bodies: list[bytes] = []
+        self.requests = 0
+        self.connections: set[int] = set()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # (keep-alive)
+
+            def do_POST(self):  # noqa: N802
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                endpoint.requests += 1
+                endpoint.connections.add(self.client_address[1])
+                if endpoint.status == 200:
+                    assert self.headers["Content-Encoding"] == "gzip"
+                    endpoint.bodies.append(gzip.decompress(body))
+                self.send_response(endpoint.status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/ingest"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def lines(self) -> list[dict]:
+        return [json.loads(x) for body in self.bodies for x in body.splitlines()]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _log(n: int, start: int = 0):
+    logger = getLogger("foo")
+    for i in range(start, start + n):
+        logger.info("message", i=i)
+
+
+def test_http_output():
+    endpoint = Endpoint()
+    output = HttpOutput(url=endpoint.url, batch_size=10, flush_interval=60)
+    setup(outputs=[output])
+    _log(95)
+    output.get_handler().close()
+    assert [x["i"] for x in endpoint.lines()] == list(range(95))
+    assert len(endpoint.bodies) == 10
+    assert len(endpoint.connections) == 1  # keep-alive connection
+    endpoint.close()
+
+
+def test_http_output_flush_interval():
+    endpoint = Endpoint()
+    output = HttpOutput(url=endpoint.url, batch_size=1000, flush_interval=0.05)
+    setup(outputs=[output])
+    _log(3)
+    for _ in range(100):
+        if endpoint.bodies:
+            break
+        threading.Event().wait(0.05)
+    assert [x["i"] for x in endpoint.lines()] == [0, 1, 2]
+    output.get_handler().close()
+    endpoint.close()
+
+
+def test_http_output_retry_and_drop():
+    endpoint = Endpoint()
+    endpoint.status = 503
+    output = HttpOutput(url=endpoint.url, batch_size=10, flush_timeout=0.2)
+    setup(outputs=[output])
+    handler = output.get_handler()
+    assert isinstance(handler, HttpHandler)
+    _log(10)
+    handler.flush()  # (times out)
+    stats = handler.backpressure_stats
+    assert stats.stalls == 1
+    assert endpoint.requests >= 1
+    endpoint.status = 200
+    handler.flush_timeout = 5.0
+    handler.flush()
+    assert [x["i"] for x in endpoint.lines()] == list(range(10))
+    endpoint.status = 400  # permanent error => dropped
+    _log(5, 10)
+    handler.close()
+    assert stats.dropped_records == 5
+    endpoint.close()
+
+
+def test_http_output_spool():
+    endpoint = Endpoint()
+    endpoint.status = 503
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output = HttpOutput(url=endpoint.url, batch_size=10, spool_dir=tmpdir)
+        setup(outputs=[output])
+        handler = output.get_handler()
+        _log(30)
+        handler.flush()
+        stats = handler.backpressure_stats  # type: ignore
+        assert stats.spilled_records == 30
+        assert len(os.listdir(tmpdir)) == 3
+        handler.close()
+        # endpoint back, new process (handler) => the spool is sent first
+        endpoint.status = 200
+        output = HttpOutput(url=endpoint.url, batch_size=10, spool_dir=tmpdir)
+        setup(outputs=[output])
+        _log(5, 30)
+        output.get_handler().close()
+        assert [x["i"] for x in endpoint.lines()] == list(range(35))
+        assert os.listdir(tmpdir) == []
+    endpoint.close()
+
+
+def test_http_output_bad_parameters():
+    with pytest.raises(StlogError):
+        HttpOutput()
+    with pytest.raises(StlogError):
+        HttpOutput(url="ftp://127.0.0.1/")
+
+
+def test_http_output_sender_errors():
+    endpoint = Endpoint()
+    endpoint.status = 503
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output = HttpOutput(url=endpoint.url, batch_size=10, spool_dir=tmpdir)
+        setup(outputs=[output])
+        handler = output.get_handler()
+        _log(20)
+        handler.flush()
+        names = sorted(os.listdir(tmpdir))
+        assert len(names) == 2
+        os.remove(os.path.join(tmpdir, names[0]))  # (by another process)
+        endpoint.status = 200
+        post = handler._post  # type: ignore
+
+        def failing_post(body):
+            handler._post = post  # type: ignore
+            raise RuntimeError("unexpected")
+
+        handler._post = failing_post  # type: ignore
+        _log(5, 20)  # (lost)
+        handler.flush()
+        _log(5, 25)
+        handler.close()
+        stats = handler.backpressure_stats  # type: ignore
+        assert stats.dropped_records == 5
+        assert [x["i"] for x in endpoint.lines()] == list(range(10, 20)) + list(
+            range(25, 30)
+        )
+        assert os.listdir(tmpdir) == []
+        assert handler._spool_bytes == 0  # type: ignore
+    endpoint.close()
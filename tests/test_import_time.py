@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+
+# stdlib modules used by stlog: imported first (in the same process) as a baseline
+# so the measure does not depend on the speed of the (CI) machine
+BASELINE_MODULES = ("logging.handlers", "json", "dataclasses", "hashlib")
+# generous maximum ratio between the import time of stlog (its stdlib dependencies
+# excluded) and the baseline to catch big regressions without being flaky
+STLOG_IMPORT_TIME_MAX_RATIO = 4.0
+
+
+def _importtime(code: str) -> dict[str, int]:
+    env = dict(os.environ)
+    env["STLOG_OUTPUT"] = "json"
+    env.pop("STLOG_USE_RICH", None)
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        check=True,
+    )
+    modules: dict[str, int] = {}
+    for line in res.stderr.splitlines():
+        # format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def test_import_does_not_import_rich():
+    modules = _importtime("import stlog")
+    assert "stlog" in modules
+    assert not [x for x in modules if x == "rich" or x.startswith("rich.")]
+
+
+def test_setup_json_does_not_import_rich():
+    modules = _importtime("import stlog; stlog.setup(); stlog.info('foo')")
+    assert not [x for x in modules if x == "rich" or x.startswith("rich.")]
+
+
+def test_import_time_budget():
+    modules = _importtime(f"import {', '.join(BASELINE_MODULES)}; import stlog")
+    baseline = sum(modules[x] for x in BASELINE_MODULES)
+    assert modules["stlog"] < baseline * STLOG_IMPORT_TIME_MAX_RATIO
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+
+from stlog import LogContext, getLogger, setup
+from stlog.__main__ import main
+from stlog.formatter import JsonFormatter
+from stlog.index import (
+    _candidate_ranges,
+    build_index,
+    get_index_path,
+    load_index,
+    read_indexed_file,
+)
+from stlog.output import FileOutput, RotatingFileOutput
+from stlog.reader import EntryFilter, read_files
+
+LINES = [
+    '{"time": "2023-03-29T10:00:00Z", "level": "INFO", "logger": "foo", "message": "m1", "request_id": "1"}',
+    '{"time": "2023-03-29T10:00:30Z", "level": "ERROR", "logger": "foo", "message": "m2", "request_id": "2"}',
+    '{"time": "2023-03-29T10:03:00Z", "level": "INFO", "logger": "foo", "message": "m3", "request_id": "2"}',
+    '{"time": "2023-03-29T10:10:00Z", "level": "ERROR", "logger": "foo", "message": "m4", "request_id": "1"}',
+]
+
+
+def _write(path: str, lines: list[str]) -> None:
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def test_build_index_and_query():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "test.log")
+        _write(path, LINES)
+        index_path = build_index(path, ["request_id"])
+        assert index_path == get_index_path(path)
+        blocks = load_index(index_path)
+        # one block per time bucket (60s)
+        assert [b.count for b in blocks] == [2, 1, 1]
+        assert blocks[0].levels == {"INFO", "ERROR"}
+        assert blocks[0].extras == {"request_id": {"1", "2"}}
+        assert blocks[-1].end == os.path.getsize(path)
+        size = os.path.getsize(path)
+        assert _candidate_ranges(blocks, size, EntryFilter()) == [(0, size)]
+        entry_filter = EntryFilter(level="ERROR", where={"request_id": "1"})
+        assert _candidate_ranges(blocks, size, entry_filter) == [
+            (blocks[0].start, blocks[0].end),
+            (blocks[2].start, blocks[2].end),
+        ]
+        entries = list(read_indexed_file(path, entry_filter=entry_filter))
+        assert [x.message for x in entries] == ["m4"]
+        entry_filter = EntryFilter(
+            since=blocks[1].tmin,
+            until=blocks[1].tmin + 1,  # type: ignore
+        )
+        assert _candidate_ranges(blocks, size, entry_filter) == [
+            (blocks[1].start, blocks[1].end)
+        ]
+        # not indexed tail (appended after the index was built) is scanned
+        with open(path, "a") as f:
+            f.write(LINES[1].replace("m2", "m5") + "\n")
+        entries = list(
+            read_indexed_file(path, entry_filter=EntryFilter(where={"request_id": "2"}))
+        )
+        assert [x.message for x in entries] == ["m2", "m3", "m5"]
+        # (small chunks => lines split between chunks)
+        assert list(read_indexed_file(path, chunk_size=7)) == list(read_files([path]))
+
+
+def test_read_indexed_file_context_refs():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "test.log")
+        output = FileOutput(filename=path, formatter=JsonFormatter(context_refs=True))
+        setup(outputs=[output])
+        LogContext.reset_context()
+        LogContext.add(service="svc")
+        logger = getLogger("foo")
+        for i in range(10):
+            logger.info("message", i=i, request_id=str(i))
+        LogContext.reset_context()
+        output.get_handler().close()
+        blocks = load_index(build_index(path, ["request_id"], max_block_bytes=200))
+        assert len(blocks) > 2
+        # the context definition and the matching entry are in different ranges
+        entry_filter = EntryFilter(where={"request_id": "8", "service": "svc"})
+        size = os.path.getsize(path)
+        assert len(_candidate_ranges(blocks, size, entry_filter)) == 2
+        entries = list(read_indexed_file(path, entry_filter=entry_filter))
+        assert [x.extras["i"] for x in entries] == [8]
+        assert list(read_indexed_file(path)) == list(read_files([path]))
+
+
+def test_file_output_index():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "test.log")
+        output = FileOutput(
+            filename=path,
+            formatter=JsonFormatter(),
+            index=True,
+            index_extras_keys=["request_id"],
+        )
+        setup(outputs=[output])
+        logger = getLogger("foo")
+        logger.info("héllo", request_id="1")
+        logger.warning("world", request_id="2")
+        output.get_handler().close()  # => flush the index
+        blocks = load_index(get_index_path(path))
+        assert len(blocks) == 1
+        assert (blocks[0].start, blocks[0].end) == (0, os.path.getsize(path))
+        assert blocks[0].count == 2
+        assert blocks[0].extras == {"request_id": {"1", "2"}}
+        entries = list(
+            read_indexed_file(path, entry_filter=EntryFilter(level="WARNING"))
+        )
+        assert [x.message for x in entries] == ["world"]
+        assert list(read_indexed_file(path)) == list(read_files([path]))
+
+
+def test_rotating_file_output_index():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "test.log")
+        output = RotatingFileOutput(
+            filename=path,
+            formatter=JsonFormatter(),
+            max_bytes=300,
+            backup_count=2,
+            index=True,
+        )
+        setup(outputs=[output])
+        logger = getLogger("foo")
+        for i in range(6):
+            logger.info(f"message{i}", request_id=str(i))
+        output.get_handler().close()
+        for name in (path, path + ".1"):
+            blocks = load_index(get_index_path(name))
+            assert len(blocks) == 1
+            assert blocks[0].start == 0
+            assert blocks[0].end == os.path.getsize(name)
+            assert blocks[0].count == len(list(read_files([name])))
+
+
+def test_cli_index(capsys):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "test.log")
+        _write(path, LINES)
+        assert main(["--build-index", "--index-key", "request_id", path]) == 0
+        assert capsys.readouterr().out.strip() == get_index_path(path)
+        assert main(["--output", "json", "--where", "request_id=2", path]) == 0
+        out = capsys.readouterr().out
+        assert [json.loads(x)["message"] for x in out.splitlines()] == ["m2", "m3"]
+        assert main(["--build-index", "-"]) == 2
@@ -3,13 +3,15 @@ from __future__ import annotations
 import json
 import logging
 import os
+import signal
 import tempfile
 import warnings
 from io import StringIO
 
 import pytest
 
-from stlog import LogContext, getLogger, setup
+from stlog import LogContext, getLogger, reconfigure, setup
+from stlog.base import StlogError
 from stlog.formatter import JsonFormatter
 from stlog.output import FileOutput, RichStreamOutput
 from stlog.setup import (
@@ -20,6 +22,7 @@ from stlog.setup import (
     exception,
     fatal,
     info,
+    install_reconfigure_signal_handler,
     warn,
     warning,
 )
@@ -222,3 +225,47 @@ def test_file_output():
         info("info")
         with open(filename) as f:
             assert f.read() == "2023-03-29T14:48:37Z root [   INFO   ] info\n"
+
+
+def test_reconfigure(context):
+    target_list: list[dict] = []
+    output = UnitsTestsJsonOutput(target_list=target_list)
+    setup(level="INFO", outputs=[output], extra_levels={"bar": "WARNING"})
+    handler = output.get_handler()
+    getLogger("foo").debug("ignored")
+    getLogger("bar").info("ignored")
+    reconfigure(level="DEBUG", extra_levels={})
+    getLogger("foo").debug("not ignored")
+    getLogger("bar").info("not ignored")
+    assert [x["message"] for x in target_list] == ["not ignored", "not ignored"]
+    reconfigure(
+        outputs_levels={0: "WARNING"},
+        outputs_filters={0: [lambda r: r.getMessage() != "filtered"]},
+    )
+    assert output.get_handler() is handler
+    getLogger("foo").info("ignored")
+    getLogger("foo").warning("filtered")
+    getLogger("foo").warning("warning")
+    assert len(target_list) == 3
+    assert target_list[-1]["message"] == "warning"
+    # invalid values => nothing is applied
+    with pytest.raises(StlogError):
+        reconfigure(level="INFO", outputs_levels={1: "DEBUG"})
+    with pytest.raises(StlogError):
+        reconfigure(level="INFO", extra_levels={"foo": "BADLEVEL"})
+    assert logging.getLogger(None).level == logging.DEBUG
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="no SIGUSR1")
+def test_reconfigure_signal_handler(context):
+    target_list: list[dict] = []
+    setup(level="INFO", outputs=[UnitsTestsJsonOutput(target_list=target_list)])
+    previous = install_reconfigure_signal_handler(level="DEBUG")
+    try:
+        os.kill(os.getpid(), signal.SIGUSR1)
+        getLogger("foo").debug("not ignored")
+        os.kill(os.getpid(), signal.SIGUSR1)
+        getLogger("foo").debug("ignored")
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+    assert [x["message"] for x in target_list] == ["not ignored"]
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import logging
+
+from stlog import getLogger, setup, stats
+from stlog.formatter import HumanFormatter
+from stlog.metrics import Histogram, PeriodicStatsReporter
+from tests.utils import UnitsTestsJsonOutput, UnitsTestsOutput
+
+
+def test_histogram():
+    h = Histogram()
+    h.add(0)
+    h.add(3)
+    h.add(1000)
+    snapshot = h.snapshot()
+    assert snapshot["count"] == 3
+    assert snapshot["total_ns"] == 1003
+    assert snapshot["max_ns"] == 1000
+    assert snapshot["buckets"] == {"1": 1, "4": 1, "1024": 1}
+
+
+def test_stats_disabled():
+    target_list: list[str] = []
+    output = UnitsTestsOutput(target_list=target_list, formatter=HumanFormatter())
+    setup(outputs=[output])
+    getLogger("foo").info("foo")
+    assert output.get_stats() is None
+    assert "emit" not in vars(output.get_handler())
+    assert stats() == {}
+
+
+def test_stats():
+    target_list: list[dict] = []
+    setup(
+        outputs=[
+            UnitsTestsJsonOutput(
+                target_list=target_list,
+                stats=True,
+                filters=[lambda r: r.getMessage() != "filtered"],
+            ),
+            UnitsTestsJsonOutput(target_list=[]),
+        ]
+    )
+    logger = getLogger("foo")
+    logger.info("foo")
+    logger.info("filtered")
+    logger.info("bar", key="value")
+    res = stats(reset=True)
+    assert list(res.keys()) == ["0:UnitsTestsJsonOutput"]
+    snapshot = res["0:UnitsTestsJsonOutput"]
+    assert snapshot["emitted"] == 2
+    assert snapshot["filtered"] == 1
+    assert snapshot["errors"] == 0
+    assert snapshot["bytes_written"] > 100
+    assert snapshot["format_time"]["count"] == 2
+    assert snapshot["write_time"]["count"] == 2
+    assert snapshot["lock_wait"]["count"] == 2
+    assert stats()["0:UnitsTestsJsonOutput"]["emitted"] == 0
+
+
+def test_stats_errors():
+    class BadHandler(logging.Handler):
+        def emit(self, record):
+            try:
+                raise Exception("write error")
+            except Exception:
+                self.handleError(record)
+
+    output = UnitsTestsOutput(target_list=[], formatter=HumanFormatter(), stats=True)
+    output.set_handler(BadHandler())
+    setup(outputs=[output])
+    raise_exceptions = logging.raiseExceptions
+    logging.raiseExceptions = False
+    try:
+        getLogger("foo").info("foo")
+    finally:
+        logging.raiseExceptions = raise_exceptions
+    assert stats()["0:UnitsTestsOutput"]["errors"] == 1
+
+
+def test_periodic_stats_reporter():
+    target_list: list[dict] = []
+    setup(outputs=[UnitsTestsJsonOutput(target_list=target_list, stats=True)])
+    getLogger("foo").info("foo")
+    PeriodicStatsReporter().report()
+    assert len(target_list) == 2
+    assert target_list[1]["logger"] == "stlog.stats"
+    assert target_list[1]["output"] == "0:UnitsTestsJsonOutput"
+    assert target_list[1]["emitted"] == 1
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import pytest
+
+from stlog import getLogger, setup
+from stlog.base import StlogError
+from stlog.net import _SenderHandler
+from stlog.output import SocketOutput
+
+
+class Collector:
+    """Local (stream) socket server stand-in which collects received lines."""
+
+    def __init__(self, family: int = socket.AF_INET, address=("127.0.0.1", 0)):
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(address)
+        self.sock.listen()
+        self.address = self.sock.getsockname()
+        self.connections = 0
+        self.data = b""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._read, args=(conn,), daemon=True).start()
+
+    def _read(self, conn):
+        with conn:
+            while True:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    return
+                self.data += chunk
+
+    def lines(self) -> list[dict]:
+        return [json.loads(x) for x in self.data.splitlines()]
+
+    def wait_lines(self, n: int, timeout: float = 5.0) -> list[dict]:
+        deadline = time.monotonic() + timeout
+        while self.data.count(b"\n") < n and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.lines()
+
+    def close(self):
+        # (shutdown() to wake up the blocked accept(), else the socket keeps listening)
+        self.sock.shutdown(socket.SHUT_RDWR)
+        self.sock.close()
+
+
+def _log(n: int, start: int = 0):
+    logger = getLogger("foo")
+    for i in range(start, start + n):
+        logger.info("message", i=i)
+
+
+def test_tcp_output():
+    collector = Collector()
+    output = SocketOutput(port=collector.address[1], batch_size=10)
+    setup(outputs=[output])
+    _log(100)
+    output.get_handler().flush()
+    _log(100, 100)
+    output.get_handler().close()
+    lines = collector.wait_lines(200)
+    assert [x["i"] for x in lines] == list(range(200))
+    assert collector.connections == 1  # persistent connection
+    collector.close()
+
+
+def test_tcp_output_outage():
+    collector = Collector()
+    port = collector.address[1]
+    collector.close()  # the collector is down
+    output = SocketOutput(port=port, max_backoff=0.05, flush_timeout=0.1, stats=True)
+    setup(outputs=[output])
+    _log(10)
+    output.get_handler().flush()  # (timeout)
+    stats = output.get_stats()
+    assert stats is not None and stats.backpressure is not None
+    assert stats.backpressure.stalls == 1
+    assert stats.backpressure.backlog_bytes > 0
+    collector = Collector(address=("127.0.0.1", port))  # the collector is back
+    assert [x["i"] for x in collector.wait_lines(10)] == list(range(10))
+    output.get_handler().flush()
+    assert stats.backpressure.backlog_bytes == 0
+    assert stats.backpressure.stall_time.count == 1
+    output.get_handler().close()
+    collector.close()
+
+
+def test_tcp_output_bounded_queue():
+    collector = Collector()
+    port = collector.address[1]
+    collector.close()
+    output = SocketOutput(port=port, max_queue_bytes=1000, flush_timeout=0.1)
+    setup(outputs=[output])
+    _log(100)
+    handler = output.get_handler()
+    assert 0 < handler.backpressure_stats.dropped_records < 100  # type: ignore
+    assert handler.backpressure_stats.backlog_bytes <= 1000  # type: ignore
+    handler.close()
+
+
+def test_udp_output():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(5)
+    output = SocketOutput(
+        protocol="udp", port=server.getsockname()[1], max_datagram_size=1000
+    )
+    setup(outputs=[output])
+    _log(50)
+    output.get_handler().close()
+    data = b""
+    while data.count(b"\n") < 50:
+        datagram = server.recv(65536)
+        assert len(datagram) <= 1000
+        assert datagram.endswith(b"\n")  # (only full lines in each datagram)
+        data += datagram
+    assert [json.loads(x)["i"] for x in data.splitlines()] == list(range(50))
+    server.close()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="no unix sockets")
+def test_unix_output():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "collector.sock")
+        collector = Collector(family=socket.AF_UNIX, address=path)
+        output = SocketOutput(protocol="unix", path=path)
+        setup(outputs=[output])
+        _log(10)
+        output.get_handler().close()
+        assert [x["i"] for x in collector.wait_lines(10)] == list(range(10))
+        collector.close()
+
+
+def test_socket_output_misuse():
+    with pytest.raises(StlogError):
+        SocketOutput(protocol="foo", port=1234)
+    with pytest.raises(StlogError):
+        SocketOutput(protocol="tcp")
+    with pytest.raises(StlogError):
+        SocketOutput(protocol="unix")
+
+
+def test_sender_handler_is_abstract():
+    class IncompleteHandler(_SenderHandler):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteHandler(  # type: ignore
+            batch_size=1,
+            flush_interval=0,
+            max_queue_bytes=1024,
+            min_backoff=0.1,
+            max_backoff=1,
+            flush_timeout=1,
+        )
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
 import logging
+import re
+import sys
 from io import StringIO
 from logging import StreamHandler
 
 from stlog.formatter import (
     DEFAULT_STLOG_HUMAN_FORMAT,
+    AnsiHumanFormatter,
     HumanFormatter,
+    JsonFormatter,
 )
 from stlog.handler import CustomRichHandler
 from stlog.output import (
@@ -28,6 +32,21 @@ def test_automatic_rich():
     assert isinstance(y.get_handler(), CustomRichHandler)
 
 
+def test_ansi():
+    x = make_stream_or_rich_stream_output(use_rich=None, use_ansi=True)
+    assert not isinstance(x, RichStreamOutput)
+    assert isinstance(x.formatter, AnsiHumanFormatter)
+    # (opt-in: no ANSI colors by default, even on a terminal)
+    stream = StringIO()
+    stream.isatty = lambda: True  # type: ignore
+    y = make_stream_or_rich_stream_output(stream=stream, use_rich=False, use_ansi=None)
+    assert type(y.formatter) is HumanFormatter
+    z = make_stream_or_rich_stream_output(
+        stream=stream, use_rich=False, not_rich_formatter=JsonFormatter()
+    )
+    assert isinstance(z.formatter, JsonFormatter)
+
+
 def test_custom_rich_handler():
     record = logging.LogRecord(
         name="test",
@@ -45,3 +64,95 @@ def test_custom_rich_handler():
         output.getvalue().encode("utf-8")
         == b"\xe2\x96\xb6 \x1b[2;36m2023-03-29T14:48:37Z\x1b[0m test \x1b[34m  INFO  \x1b[0m \x1b[1mTest message\x1b[0m\n"
     )
+
+
+def _emit_exception(h: CustomRichHandler, i: int, created: float = 0.0):
+    try:
+        raise ValueError(f"boom{i}")
+    except ValueError:
+        record = logging.LogRecord(
+            name="test",
+            level=logging.ERROR,
+            pathname="",
+            lineno=0,
+            msg="error",
+            args=(),
+            exc_info=sys.exc_info(),
+        )
+    record.created = created
+    h.emit(record)
+
+
+def test_custom_rich_handler_repeated_tracebacks():
+    output = StringIO()
+    h = CustomRichHandler(stream=output, force_terminal=True)
+    for i in range(3):
+        _emit_exception(h, i)
+    res = output.getvalue()
+    # no deduplication by default (but cached renderings)
+    assert res.count("Traceback") == 3
+    assert "boom2" in res
+    assert "same traceback" not in res
+    output = StringIO()
+    h = CustomRichHandler(stream=output, force_terminal=True, traceback_dedup_window=60)
+    for i, created in enumerate((0, 10, 20, 70)):
+        _emit_exception(h, i, created)
+    res = output.getvalue()
+    assert res.count("Traceback") == 2
+    assert res.count("(traceback #1)") == 2
+    assert "same traceback as #1, repeated 1 times in 60s: ValueError: boom1" in res
+    assert "same traceback as #1, repeated 2 times in 60s: ValueError: boom2" in res
+    assert "boom3" in res
+
+
+def test_custom_rich_handler_tracebacks_chained_cause():
+    output = StringIO()
+    h = CustomRichHandler(stream=output, force_terminal=True)
+    for i in range(2):
+        try:
+            try:
+                raise ValueError(f"host-{i} refused")
+            except ValueError as e:
+                raise RuntimeError("request failed") from e
+        except RuntimeError:
+            record = logging.LogRecord(
+                name="test",
+                level=logging.ERROR,
+                pathname="",
+                lineno=0,
+                msg="error",
+                args=(),
+                exc_info=sys.exc_info(),
+            )
+        h.emit(record)
+    res = re.sub(r"\x1b\[[0-9;]*m", "", output.getvalue())
+    # (same fingerprint and top level message but not the same cause)
+    assert res.count("host-0 refused") == 1
+    assert res.count("host-1 refused") == 1
+
+
+def test_custom_rich_handler_tracebacks_show_locals(monkeypatch):
+    monkeypatch.setattr("stlog.base.RICH_DUMP_EXCEPTION_ON_CONSOLE_SHOW_LOCALS", True)
+    monkeypatch.setattr(
+        "stlog.handler.RICH_DUMP_EXCEPTION_ON_CONSOLE_SHOW_LOCALS", True
+    )
+    output = StringIO()
+    h = CustomRichHandler(stream=output, force_terminal=True)
+    for local_value in ("first_local", "second_local"):  # noqa: B007
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord(
+                name="test",
+                level=logging.ERROR,
+                pathname="",
+                lineno=0,
+                msg="error",
+                args=(),
+                exc_info=sys.exc_info(),
+            )
+        h.emit(record)
+    res = output.getvalue()
+    # (not cached => the locals of each occurrence)
+    assert "'first_local'" in res
+    assert "'second_local'" in res
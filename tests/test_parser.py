@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+import logging
+import random
+
+import pytest
+
+from stlog.base import STLOG_EXTRA_KEY, logfmt_format_string
+from stlog.formatter import JsonFormatter, LogFmtFormatter
+from stlog.parser import (
+    IncrementalParser,
+    JsonParser,
+    LogFmtParser,
+    logfmt_parse_string,
+    parse_logfmt,
+    parse_logfmt_pairs,
+)
+
+# (property based) round-trip tests with random strings on a hostile alphabet
+ALPHABET = 'ab1_-.:, ="\\\n\r\t=é€😀'
+EXAMPLES = 500
+
+
+def _random_string(rnd: random.Random) -> str:
+    return "".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(0, 12)))
+
+
+def _random_chunks(rnd: random.Random, data: bytes) -> list[bytes]:
+    res: list[bytes] = []
+    pos = 0
+    while pos < len(data):
+        size = rnd.randint(1, 20)
+        res.append(data[pos : pos + size])
+        pos += size
+    return res
+
+
+def test_logfmt_parse_string():
+    assert logfmt_parse_string("foo") == "foo"
+    assert logfmt_parse_string('""') == ""
+    assert logfmt_parse_string('"foo \\"bar\\"\\nC:\\\\foo"') == 'foo "bar"\nC:\\foo'
+    # unknown escape sequences are kept
+    assert logfmt_parse_string('"C:\\foo\\"') == "C:\\foo\\"
+
+
+def test_parse_logfmt():
+    line = 'a=1 b="x y" c= d e="\\"" f="\\\\" g="é"'
+    assert parse_logfmt_pairs(line) == [
+        ("a", "1"),
+        ("b", "x y"),
+        ("c", ""),
+        ("d", ""),
+        ("e", '"'),
+        ("f", "\\"),
+        ("g", "é"),
+    ]
+    assert parse_logfmt(line)["f"] == "\\"
+
+
+def test_logfmt_roundtrip_property():
+    rnd = random.Random(42)
+    for _ in range(EXAMPLES):
+        values = {f"k{i}": _random_string(rnd) for i in range(rnd.randint(1, 5))}
+        line = " ".join(f"{k}={logfmt_format_string(v)}" for k, v in values.items())
+        for v in values.values():
+            assert logfmt_parse_string(logfmt_format_string(v)) == v
+        assert parse_logfmt(line) == values, line
+
+
+def test_logfmt_formatter_roundtrip_property():
+    rnd = random.Random(43)
+    formatter = LogFmtFormatter()
+    for _ in range(EXAMPLES):
+        message = _random_string(rnd)
+        extras = {f"k{i}": _random_string(rnd) for i in range(rnd.randint(0, 3))}
+        record = logging.makeLogRecord(
+            {
+                "name": "foo",
+                "levelname": "INFO",
+                "msg": message,
+                STLOG_EXTRA_KEY: set(extras.keys()),
+                **extras,
+            }
+        )
+        line = formatter.format(record)
+        assert "\n" not in line
+        parsed = parse_logfmt(line)
+        assert parsed["message"] == message
+        for k, v in extras.items():
+            assert parsed[k] == v
+
+
+def test_logfmt_parser_incremental():
+    rnd = random.Random(44)
+    expected = [
+        {"message": _random_string(rnd), "key": _random_string(rnd)}
+        for _ in range(EXAMPLES)
+    ]
+    data = "".join(
+        f"message={logfmt_format_string(x['message'])} key={logfmt_format_string(x['key'])}\n"
+        for x in expected
+    ).encode("utf-8")
+    parser = LogFmtParser()
+    res = []
+    for chunk in _random_chunks(rnd, data[:-1]):  # the last line is not terminated
+        res.extend(parser.feed(chunk))
+    assert len(res) == EXAMPLES - 1
+    res.extend(parser.close())
+    assert res == expected
+    parser = LogFmtParser(as_tuples=True)
+    assert parser.feed("a=1 b=2\nc=") == [(("a", "1"), ("b", "2"))]
+    assert parser.feed('"3"\n') == [(("c", "3"),)]
+    assert parser.close() == []
+
+
+def test_json_parser_incremental():
+    rnd = random.Random(45)
+    formatter = JsonFormatter()
+    expected = []
+    lines = []
+    for _ in range(EXAMPLES):
+        message = _random_string(rnd)
+        record = logging.makeLogRecord(
+            {"name": "foo", "levelname": "INFO", "msg": message}
+        )
+        lines.append(formatter.format(record))
+        expected.append(message)
+    lines.insert(10, "not json")
+    lines.insert(20, "[1, 2]")
+    data = ("\n".join(lines) + "\n").encode("utf-8")
+    parser = JsonParser()
+    res = []
+    for chunk in _random_chunks(rnd, data):
+        res.extend(parser.feed(chunk))
+    res.extend(parser.close())
+    assert [x["message"] for x in res if isinstance(x, dict)] == expected
+    parser = JsonParser(as_tuples=True)
+    assert parser.feed(json.dumps({"a": 1}) + "\n") == [(("a", 1),)]
+
+
+def test_incremental_parser_is_abstract():
+    with pytest.raises(TypeError):
+        IncrementalParser()  # type: ignore
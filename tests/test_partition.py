@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import os
+import tempfile
+
+import pytest
+
+from stlog import LogContext, getLogger, setup, stats
+from stlog.base import StlogError
+from stlog.formatter import HumanFormatter, JsonFormatter
+from stlog.output import PartitionedFileOutput
+
+
+def _read(path: str) -> list[str]:
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+def test_partitioned_file_output():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output = PartitionedFileOutput(
+            filename=os.path.join(tmpdir, "{tenant}", "app.log"),
+            formatter=HumanFormatter(fmt="{message}"),
+            max_open_files=2,
+            stats=True,
+        )
+        setup(outputs=[output])
+        logger = getLogger("foo")
+        for tenant in ("a", "b", "a", "c", "b", "../etc"):
+            with LogContext.bind(tenant=tenant):
+                logger.info(f"message for {tenant}")
+        logger.info("no tenant")
+        logger.info("extra tenant", tenant="c")
+        file_pool = stats()["0:PartitionedFileOutput"]["file_pool"]
+        assert file_pool == {
+            "open_files": 2,
+            "max_open_files": 2,
+            "hits": 1,
+            "misses": 7,
+            "evictions": 5,
+        }
+        output.get_handler().close()
+        assert _read(os.path.join(tmpdir, "a", "app.log")) == ["message for a"] * 2
+        assert _read(os.path.join(tmpdir, "b", "app.log")) == ["message for b"] * 2
+        assert _read(os.path.join(tmpdir, "c", "app.log")) == [
+            "message for c",
+            "extra tenant",
+        ]
+        assert _read(os.path.join(tmpdir, "default", "app.log")) == ["no tenant"]
+        assert _read(os.path.join(tmpdir, "_.._etc", "app.log")) == [
+            "message for ../etc"
+        ]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="no fork")
+def test_partitioned_file_output_fork():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output = PartitionedFileOutput(
+            filename=os.path.join(tmpdir, "{tenant}.log"),
+            formatter=HumanFormatter(fmt="{message}"),
+            flush_interval=0,
+        )
+        setup(outputs=[output])
+        logger = getLogger("foo")
+        logger.info("parent", tenant="a")
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            logger.info("child", tenant="a")
+            output.get_handler().close()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        output.get_handler().close()
+        assert sorted(_read(os.path.join(tmpdir, "a.log"))) == ["child", "parent"]
+
+
+def test_partitioned_file_output_bad_parameters():
+    with pytest.raises(StlogError):
+        PartitionedFileOutput()
+    with pytest.raises(StlogError):
+        PartitionedFileOutput(filename="app.log")
+    with pytest.raises(StlogError):
+        PartitionedFileOutput(
+            filename="{tenant}.log", formatter=JsonFormatter(context_refs=True)
+        )
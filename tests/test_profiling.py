@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from stlog import getLogger, setup
+from stlog.adapter import StLogLoggerAdapter
+from stlog.base import StlogError
+from stlog.profiling import Profiler
+from tests.utils import UnitsTestsJsonOutput
+
+
+def test_profiler():
+    target_list: list[dict] = []
+    output = UnitsTestsJsonOutput(target_list=target_list)
+    setup(outputs=[output])
+    logger = getLogger("foo")
+    with Profiler(every=2) as profiler:
+        for i in range(10):
+            logger.info("message", i=i)
+    assert len(target_list) == 10
+    snapshot = profiler.snapshot()
+    assert set(snapshot.keys()) == {"adapter", "0:UnitsTestsJsonOutput"}
+    assert snapshot["adapter"]["adapter.process"]["count"] == 5
+    assert snapshot["adapter"]["adapter.level_check"]["count"] == 5
+    stages = snapshot["0:UnitsTestsJsonOutput"]
+    for stage in (
+        "handle",
+        "filters",
+        "filters.context_reinject",
+        "format",
+        "format.extras",
+        "format.time",
+        "format.json",
+        "write",
+    ):
+        assert stages[stage]["count"] == 5, stage
+    assert "format.json" in profiler.dump()
+    assert json.loads(profiler.dump(format="json")) == snapshot
+    # the instrumentation is removed
+    assert "isEnabledFor" not in vars(StLogLoggerAdapter)
+    assert "handle" not in vars(output.get_handler())
+    assert "format" not in vars(output.get_formatter_or_raise())
+    logger.info("not profiled")
+    assert profiler.snapshot() == snapshot
+
+
+def test_profiler_errors():
+    with pytest.raises(StlogError):
+        Profiler(every=0)
+    profiler = Profiler().start()
+    try:
+        with pytest.raises(StlogError):
+            profiler.start()
+        with pytest.raises(StlogError):
+            profiler.dump(format="foo")
+    finally:
+        profiler.stop()
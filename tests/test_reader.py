@@ -0,0 +1,332 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+
+import pytest
+
+from stlog import LogContext, getLogger, setup
+from stlog.__main__ import main
+from stlog.base import StlogError
+from stlog.formatter import JsonFormatter, LogFmtFormatter
+from stlog.output import FileOutput, RotatingFileOutput
+from stlog.reader import (
+    EntryFilter,
+    LogEntry,
+    follow_files,
+    get_rotated_paths,
+    iter_lines,
+    merge_files,
+    parse_line,
+    parse_logfmt_line,
+    parse_time,
+    read_files,
+)
+
+
+def test_parse_time():
+    assert parse_time("2023-03-29T14:48:37Z") == 1680101317.0
+    assert parse_time("2023-03-29T14:48:37.250Z") == 1680101317.25
+    assert parse_time("2023-03-29T14:48:37+00:00") == 1680101317.0
+    assert parse_time("2023-03-29T16:48:37+02:00") == 1680101317.0
+    assert parse_time("foo") is None
+    assert parse_time(None) is None
+
+
+def test_parse_logfmt_line():
+    assert parse_logfmt_line(
+        'time=2023-03-29T14:48:37Z level=INFO message="foo \\"bar\\"\\nbaz" empty="" none= flag'
+    ) == {
+        "time": "2023-03-29T14:48:37Z",
+        "level": "INFO",
+        "message": 'foo "bar"\nbaz',
+        "empty": "",
+        "none": "",
+        "flag": "",
+    }
+
+
+def test_parse_line():
+    entry = parse_line(
+        '{"time": "2023-03-29T14:48:37.000Z", "logger": "foo", "level": "WARNING", '
+        '"message": "bar", "source": {"lineno": 12}, "key": 123}'
+    )
+    assert entry == LogEntry(
+        time=1680101317.0,
+        level="WARNING",
+        logger="foo",
+        message="bar",
+        extras={"key": 123},
+        source={"lineno": 12},
+    )
+    assert parse_line("") is None
+    assert parse_line("{bad json") is None
+    entry = parse_line("logger=foo severity=error message=bar key=value")
+    assert entry is not None
+    assert entry.level == "ERROR"
+    assert entry.levelno == logging.ERROR
+    assert entry.extras == {"key": "value"}
+
+
+def test_entry_filter():
+    entry = LogEntry(
+        time=100.0, level="INFO", logger="foo.bar", extras={"key": "value", "b": True}
+    )
+    assert EntryFilter().match(entry)
+    assert EntryFilter(level="INFO").match(entry)
+    assert not EntryFilter(level="WARNING").match(entry)
+    assert EntryFilter(loggers=["foo"]).match(entry)
+    assert not EntryFilter(loggers=["fo"]).match(entry)
+    assert EntryFilter(since=100.0, until=101.0).match(entry)
+    assert not EntryFilter(until=100.0).match(entry)
+    assert EntryFilter(where={"key": "value", "b": "true"}).match(entry)
+    assert not EntryFilter(where={"key": "value2"}).match(entry)
+    assert not EntryFilter(where={"key": "value2"}).prefilter('{"key": "value"}')
+    with pytest.raises(StlogError):
+        EntryFilter(level="FOO")
+
+
+def test_to_log_record_without_process_and_thread():
+    record = LogEntry(message="foo").to_log_record()
+    assert record.process is None
+    assert record.processName is None
+    assert record.thread is None
+    assert record.threadName is None
+    record = LogEntry(message="foo", source={"process": 123}).to_log_record()
+    assert record.process == 123
+
+
+def test_iter_lines():
+    with tempfile.TemporaryFile() as f:
+        f.write("foo\nbär\n\nlast".encode())
+        f.seek(0)
+        assert list(iter_lines(f, chunk_size=2)) == ["foo", "bär", "", "last"]
+
+
+@pytest.mark.parametrize("formatter_class", [JsonFormatter, LogFmtFormatter])
+def test_read_files_roundtrip(formatter_class):
+    formatter = formatter_class()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "test.log")
+        setup(outputs=[FileOutput(filename=filename, formatter=formatter)])
+        getLogger("foo").info('message "quoted"\nnewline', key="value with space")
+        getLogger("bar").warning("warning")
+        entries = list(read_files([filename]))
+        assert len(entries) == 2
+        assert entries[0].logger == "foo"
+        assert entries[0].message == 'message "quoted"\nnewline'
+        assert entries[0].extras == {"key": "value with space"}
+        assert int(entries[0].time or 0) == 1680101317
+        record = entries[0].to_log_record()
+        assert record.getMessage() == 'message "quoted"\nnewline'
+        assert formatter.format(record) == open(filename).read().split("\n")[0]
+        entries = list(
+            read_files([filename], entry_filter=EntryFilter(level="WARNING"))
+        )
+        assert [x.logger for x in entries] == ["bar"]
+
+
+def test_read_files_context_refs():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "test.log")
+        output = RotatingFileOutput(
+            filename=filename,
+            formatter=JsonFormatter(context_refs=True),
+            max_bytes=400,
+            backup_count=10,
+        )
+        setup(outputs=[output])
+        LogContext.reset_context()
+        LogContext.add(service="svc", region="eu")
+        logger = getLogger("foo")
+        for i in range(10):
+            logger.info("message", i=i, region="us" if i == 5 else "eu")
+        LogContext.reset_context()
+        output.get_handler().close()
+        paths = get_rotated_paths(filename)
+        assert len(paths) > 2
+        entries: list[LogEntry] = []
+        for path in paths:
+            # each file is self-contained
+            entries.extend(read_files([path]))
+        assert len(entries) == 10
+        assert sorted(x.extras["i"] for x in entries) == list(range(10))
+        for entry in entries:
+            assert entry.extras["service"] == "svc"
+            assert entry.extras["region"] == ("us" if entry.extras["i"] == 5 else "eu")
+        entries = list(
+            read_files(paths, entry_filter=EntryFilter(where={"region": "us"}))
+        )
+        assert [x.extras["i"] for x in entries] == [5]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="no fork")
+def test_read_files_context_refs_several_processes():
+    # two processes appending (interleaved) to the same file
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "test.log")
+        output = FileOutput(
+            filename=filename, formatter=JsonFormatter(context_refs=True)
+        )
+        setup(outputs=[output])
+        logger = getLogger("foo")
+        to_parent_r, to_parent_w = os.pipe()
+        to_child_r, to_child_w = os.pipe()
+        LogContext.reset_context()
+        try:
+            LogContext.add(proc="parent")
+            logger.info("before fork")
+            pid = os.fork()
+            if pid == 0:  # pragma: no cover
+                LogContext.reset_context()
+                LogContext.add(proc="child")
+                logger.info("child1")
+                os.write(to_parent_w, b"x")
+                os.read(to_child_r, 1)
+                logger.info("child2")
+                output.get_handler().close()
+                os._exit(0)
+            os.read(to_parent_r, 1)
+            LogContext.reset_context()
+            LogContext.add(proc="parent2")
+            logger.info("parent")
+            os.write(to_child_w, b"x")
+            os.waitpid(pid, 0)
+        finally:
+            LogContext.reset_context()
+            for fd in (to_parent_r, to_parent_w, to_child_r, to_child_w):
+                os.close(fd)
+        output.get_handler().close()
+        entries = list(read_files([filename]))
+        assert {x.message: x.extras["proc"] for x in entries} == {
+            "before fork": "parent",
+            "child1": "child",
+            "parent": "parent2",
+            "child2": "child",
+        }
+
+
+def test_cli(capsys):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "test.log")
+        setup(outputs=[FileOutput(filename=filename, formatter=JsonFormatter())])
+        getLogger("foo").info("message1", request_id="1")
+        getLogger("foo").info("message2", request_id="2")
+        capsys.readouterr()
+        assert main(["--output", "json", "--where", "request_id=2", filename]) == 0
+        out = capsys.readouterr().out
+        assert json.loads(out)["message"] == "message2"
+        assert main(["--output", "human", filename]) == 0
+        out = capsys.readouterr().out
+        assert out == (
+            "2023-03-29T14:48:37Z foo [   INFO   ] message1 {request_id=1}\n"
+            "2023-03-29T14:48:37Z foo [   INFO   ] message2 {request_id=2}\n"
+        )
+        assert main(["--since", "bad", filename]) == 2
+        with pytest.raises(SystemExit) as e:
+            main(["--level", "FOO", filename])
+        assert e.value.code == 2
+        with pytest.raises(SystemExit) as e:
+            main([os.path.join(tmpdir, "missing.log")])
+        assert e.value.code == 2
+        assert "no such file" in capsys.readouterr().err
+
+
+def _json_line(time: str, message: str) -> str:
+    return json.dumps({"time": time, "level": "INFO", "message": message}) + "\n"
+
+
+def test_merge_files(capsys):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "app.log")
+        worker = os.path.join(tmpdir, "worker.log")
+        with open(path + ".2", "w") as f:
+            f.write(_json_line("2023-03-29T10:00:00Z", "a1"))
+        with open(path + ".1", "w") as f:
+            f.write(_json_line("2023-03-29T10:00:02Z", "a2"))
+            f.write("\n")
+        with open(path, "w") as f:
+            f.write(_json_line("2023-03-29T10:00:04Z", "a3"))
+            f.write(_json_line("2023-03-29T10:00:04Z", "a4"))
+        with open(worker, "w") as f:
+            f.write(_json_line("2023-03-29T10:00:01Z", "w1"))
+            f.write(_json_line("2023-03-29T10:00:04Z", "w2"))
+            f.write(_json_line("2023-03-29T10:00:05Z", "w3"))
+        paths = get_rotated_paths(path)
+        assert paths == [path + ".2", path + ".1", path]
+        entries = merge_files([*paths, worker])
+        assert [x.message for x in entries] == [
+            "a1",
+            "w1",
+            "a2",
+            "a3",
+            "a4",
+            "w2",
+            "w3",
+        ]
+        capsys.readouterr()
+        args = ["--output", "logfmt", "--merge", "--with-rotated", path, worker]
+        assert main(args) == 0
+        out = capsys.readouterr().out
+        assert [parse_logfmt_line(x)["message"] for x in out.splitlines()] == [
+            "a1",
+            "w1",
+            "a2",
+            "a3",
+            "a4",
+            "w2",
+            "w3",
+        ]
+
+
+def test_follow_files():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "app.log")
+        with open(path, "w") as f:
+            f.write(_json_line("2023-03-29T10:00:00Z", "m1"))
+        stop_event = threading.Event()
+        entries = follow_files(
+            [path], from_start=True, poll_interval=0.01, stop_event=stop_event
+        )
+        assert next(entries).message == "m1"
+        with open(path, "a") as f:
+            # partial line
+            f.write(_json_line("2023-03-29T10:00:01Z", "m2")[0:10])
+        with open(path, "a") as f:
+            f.write(_json_line("2023-03-29T10:00:01Z", "m2")[10:])
+        assert next(entries).message == "m2"
+        with open(path, "a") as f:
+            f.write(_json_line("2023-03-29T10:00:02Z", "m3"))
+        # rotation
+        os.rename(path, path + ".1")
+        with open(path, "w") as f:
+            f.write(_json_line("2023-03-29T10:00:03Z", "m4"))
+        assert next(entries).message == "m3"
+        assert next(entries).message == "m4"
+        stop_event.set()
+        assert list(entries) == []
+
+
+def test_follow_files_context_refs():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "app.log")
+        output = FileOutput(filename=path, formatter=JsonFormatter(context_refs=True))
+        setup(outputs=[output])
+        handler = output.get_handler()
+        stop_event = threading.Event()
+        entries = follow_files(
+            [path], from_start=True, poll_interval=0.01, stop_event=stop_event
+        )
+        with LogContext.bind(service="svc"):
+            logger = getLogger("foo")
+            logger.info("m1")
+            handler.flush()
+            assert next(entries).extras == {"service": "svc"}
+            logger.info("m2")  # (the context definition was read by the last poll)
+            handler.flush()
+            assert next(entries).extras == {"service": "svc"}
+        stop_event.set()
+        handler.close()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+from io import StringIO
+
+import pytest
+
+from stlog import LogContext, getLogger, setup
+from stlog.base import StlogError
+from stlog.formatter import JsonFormatter
+from stlog.output import Route, RoutingOutput, StreamOutput
+
+
+def _output() -> StreamOutput:
+    return StreamOutput(stream=StringIO(), formatter=JsonFormatter())
+
+
+def _messages(output: StreamOutput) -> list[str]:
+    assert isinstance(output.stream, StringIO)
+    return [json.loads(x)["message"] for x in output.stream.getvalue().splitlines()]
+
+
+def test_routing_output():
+    errors, db, tenant, default = _output(), _output(), _output(), _output()
+    output = RoutingOutput(
+        routes=[
+            Route(errors, min_level="ERROR"),
+            Route(db, loggers=["app.db"], max_level="INFO"),
+            Route(tenant, context={"tenant": ["acme", "foo"]}),
+            Route(errors, context={"tenant": "acme"}),  # (already routed to errors)
+        ],
+        default=default,
+    )
+    setup(outputs=[output])
+    getLogger("app.db.pool").info("db info")
+    getLogger("app.db").warning("db warning")
+    getLogger("app.dbx").info("dbx info")
+    getLogger("app").error("app error")
+    with LogContext.bind(tenant="acme"):
+        getLogger("app").info("acme info")
+        getLogger("app").error("acme error")
+    with LogContext.bind(tenant="bar"):
+        getLogger("app").info("bar info")
+    output.get_handler().close()
+    assert _messages(errors) == ["app error", "acme info", "acme error"]
+    assert _messages(db) == ["db info"]
+    assert _messages(tenant) == ["acme info", "acme error"]
+    assert _messages(default) == ["db warning", "dbx info", "bar info"]
+
+
+def test_routing_output_child_level_and_cache():
+    child = _output()
+    child.set_level("WARNING")
+    output = RoutingOutput(routes=[Route(child, loggers=["foo"])])
+    setup(outputs=[output])
+    handler = output.get_handler()
+    handler.cache_size = 2  # type: ignore
+    for name in ("foo", "foo.a", "foo.b", "bar"):
+        getLogger(name).info("info")
+        getLogger(name).warning(name)
+    assert len(handler._table) <= 2  # type: ignore
+    handler.close()
+    assert _messages(child) == ["foo", "foo.a", "foo.b"]
+
+
+def test_routing_output_bad_parameters():
+    with pytest.raises(StlogError):
+        RoutingOutput(routes=[Route(_output(), min_level="FOO")])
+    with pytest.raises(StlogError):
+        RoutingOutput(formatter=JsonFormatter())
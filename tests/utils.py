@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import io
 import json
 import logging
 from dataclasses import dataclass
@@ -45,3 +46,13 @@ class UnitsTestsJsonOutput(Output):
     def __post_init__(self):
         self.formatter = JsonFormatter()
         self.set_handler(JsonUnittestsHandler(target_list=self.target_list))
+
+
+class NullStream(io.StringIO):
+    """A text stream that drops everything (to measure stlog and not the I/O).
+
+    Note: also used by the benchmarks (`benchmarks/bench.py`).
+    """
+
+    def write(self, s: str) -> int:
+        return len(s)